@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Home Assistant service check against a local stub server (no real HA needed).
+
+Covers:
+  - keep-alive: repeated polls reuse the pooled connections
+  - lease expiry: an entity nobody renews stops being polled
+  - errors keep the last good value (HTTP 500, non-numeric state)
+
+Usage (from the repo root): python Testing/verify_home_assistant.py
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core import home_assistant
+from app.core.home_assistant import HomeAssistantService
+
+TOKEN = "test-token"
+ENTITY = "sensor.temperature"
+
+# What the stub returns for ENTITY: (HTTP status, state)
+stub_state = {"status": 200, "state": "21.5"}
+stub_requests = {}  # entity_id -> number of requests
+stub_connections = [0]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def setup(self):
+        super().setup()
+        stub_connections[0] += 1
+
+    def do_GET(self):
+        entity_id = self.path.rsplit("/", 1)[-1]
+        stub_requests[entity_id] = stub_requests.get(entity_id, 0) + 1
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            status, body = 401, {"message": "Unauthorized"}
+        elif entity_id == ENTITY and stub_state["status"] != 200:
+            status, body = stub_state["status"], {"message": "Error"}
+        else:
+            state = stub_state["state"] if entity_id == ENTITY else "1"
+            status, body = 200, {"state": state, "attributes": {"unit_of_measurement": "°C"}}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeStateManager:
+    def __init__(self):
+        self.data = {}
+
+    def set_data(self, key, value):
+        self.data[key] = value
+
+    def get_data(self, key):
+        return self.data.get(key)
+
+
+class FakeSettings:
+    def __init__(self, url):
+        self.settings = {"enabled": True, "url": url, "long_lived_token": TOKEN}
+
+    def get_setting(self, category):
+        return self.settings if category == "home_assistant" else None
+
+
+failures = []
+
+def check(name, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'}: {name}" + (f" ({detail})" if detail else ""))
+    if not ok:
+        failures.append(name)
+
+
+def main():
+    # Short intervals and leases so the run takes seconds
+    home_assistant.MIN_INTERVAL = 0.2
+    home_assistant.LEASE_SECONDS = 1.0
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    state = FakeStateManager()
+    service = HomeAssistantService(state, FakeSettings(url))
+    service.start()
+    try:
+        print("Testing keep-alive...")
+        for _ in range(8):  # Renewed like a scene would from update()
+            service.watch([ENTITY], interval=0.2)
+            time.sleep(0.25)
+        entry = service.get(ENTITY)
+        requests = stub_requests.get(ENTITY, 0)
+        check("value published", entry is not None and entry["value"] == 21.5, entry)
+        check("polled repeatedly", requests >= 4, f"{requests} requests")
+        check("connections reused", stub_connections[0] < requests, f"{stub_connections[0]} connections")
+
+        print("Testing errors keep the last good value...")
+        updated = entry["updated"]
+        stub_state["status"] = 500
+        entry = service.refresh(ENTITY).result(timeout=5)
+        check("HTTP error keeps value", entry["value"] == 21.5 and entry["error"] == "HTTP 500", entry)
+        stub_state.update(status=200, state="unavailable")
+        entry = service.refresh(ENTITY).result(timeout=5)
+        check("invalid data keeps value", entry["value"] == 21.5 and entry["state"] == "21.5"
+              and entry["error"] == "Invalid data", entry)
+        check("updated not advanced on error", entry["updated"] == updated)
+        stub_state["state"] = "22.0"
+        entry = service.refresh(ENTITY).result(timeout=5)
+        check("recovers", entry["value"] == 22.0 and entry["error"] is None, entry)
+
+        print("Testing lease expiry...")
+        service.watch(["sensor.other"], interval=0.2)
+        time.sleep(2.0)  # Nobody renews: both leases (1 s) lapse
+        check("expired entities unwatched", service.get_stats()["watched"] == {}, service.get_stats()["watched"])
+        before = dict(stub_requests)
+        time.sleep(1.0)
+        check("no polls after expiry", stub_requests == before, f"{before} -> {stub_requests}")
+    finally:
+        service.stop()
+        server.shutdown()
+
+    print(f"\n{len(failures)} failed" if failures else "\nAll checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""
+Headless scene benchmark.
+
+Loads every script in scenes/scripts through ScriptLoader and drives
+update()/draw() as fast as possible against the null matrix backend, with a fixed
+dt and no frame pacing. Reports frames/sec, per-frame latency percentiles,
+peak RSS and allocation churn per scene, writes the results as JSON and
+prints a comparison table against a saved baseline.
+
+Usage (from the repository root, on the target board):
+    python -m app.bench                          # all scripts
+    python -m app.bench nebula.py plasma.py      # selected scripts
+    python -m app.bench --save-baseline data/bench_baseline.json
+    python -m app.bench --baseline data/bench_baseline.json --fail-on-regression
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCRIPTS_DIR = "scenes/scripts"
+DEFAULT_OUTPUT = "bench_results.json"
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def _render_frame(scene, matrix, dt, batch_pixels=None):
+    scene.update(dt)
+    matrix.set_framebuffer_mode(getattr(scene, "use_framebuffer", False))
+    if batch_pixels is None:
+        batch_pixels = getattr(scene, "batch_pixels", False)
+    matrix.set_pixel_batching(batch_pixels)
+    matrix.clear()
+    scene.draw(matrix.canvas)
+    matrix.swap_canvas()
+
+
+def bench_scene(filename, scripts_dir=DEFAULT_SCRIPTS_DIR, frames=600, warmup=30, dt=1 / 60,
+                alloc_frames=60, batch_pixels=None):
+    """
+    Benchmark a single scene script. Returns a result dict (or {"error": ...}).
+    Runs in whatever process calls it; use run_benchmarks() for isolation.
+    batch_pixels overrides the scene's own batch_pixels flag (None = use the scene's).
+    """
+    # Imported lazily so a spawned worker only pays for what it uses
+    from app.core.matrix_driver import MatrixDriver
+    from app.core.state_manager import StateManager
+    from app.core.palette_manager import PaletteManager
+    from app.core.loaders.script_loader import ScriptLoader
+
+    # Null backend: frames land in a preallocated buffer, nothing distorts the timings
+    matrix = MatrixDriver(backend="null")
+    state_manager = StateManager()
+    state_manager._palette_manager = PaletteManager()
+    # Always in-process: we're measuring the scene itself
+    loader = ScriptLoader(matrix, state_manager, scripts_dir=scripts_dir, runtime="inprocess")
+
+    t0 = time.perf_counter_ns()
+    scene = loader.get_scene(filename)
+    setup_ns = time.perf_counter_ns() - t0
+    if scene is None:
+        return {"error": "failed to load scene"}
+
+    try:
+        if hasattr(scene, "enter"):
+            scene.enter(state_manager)
+
+        for _ in range(warmup):
+            _render_frame(scene, matrix, dt, batch_pixels)
+
+        # Timed pass: no tracing, just the clock
+        latencies = []
+        perf_counter_ns = time.perf_counter_ns
+        gc0_before = gc.get_stats()[0]["collections"]
+        blocks_before = sys.getallocatedblocks()
+        run_start = perf_counter_ns()
+        for _ in range(frames):
+            f0 = perf_counter_ns()
+            _render_frame(scene, matrix, dt, batch_pixels)
+            latencies.append(perf_counter_ns() - f0)
+        run_ns = perf_counter_ns() - run_start
+        gc0_collections = gc.get_stats()[0]["collections"] - gc0_before
+        net_blocks = sys.getallocatedblocks() - blocks_before
+
+        # Allocation pass: tracemalloc is slow, so it gets its own short run
+        tracemalloc.start()
+        traced_start, _ = tracemalloc.get_traced_memory()
+        for _ in range(alloc_frames):
+            _render_frame(scene, matrix, dt, batch_pixels)
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    except Exception as e:
+        logger.exception(f"Benchmark of {filename} failed: {e}")
+        return {"error": str(e)}
+    finally:
+        try:
+            scene.exit()
+        except Exception:
+            pass
+
+    latencies.sort()
+    return {
+        "frames": frames,
+        "setup_ms": round(setup_ns / 1e6, 2),
+        "fps": round(frames / (run_ns / 1e9), 1),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) / 1e6, 3),
+            "p50": round(_percentile(latencies, 50) / 1e6, 3),
+            "p95": round(_percentile(latencies, 95) / 1e6, 3),
+            "p99": round(_percentile(latencies, 99) / 1e6, 3),
+            "max": round(latencies[-1] / 1e6, 3),
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+        # Allocation churn: gen0 collections run every ~700 net container allocations
+        "gc_gen0_collections": gc0_collections,
+        # Blocks still allocated after the timed run (growing = leaking per frame)
+        "net_alloc_blocks": net_blocks,
+        "traced_peak_kb": round((traced_peak - traced_start) / 1024, 1),
+    }
+
+
+def run_benchmarks(filenames, isolate=True, **kwargs):
+    """
+    Benchmark each scene. With isolate=True every scene runs in a fresh
+    spawned process so peak RSS and module state are per-scene.
+    """
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for filename in filenames:
+        logger.info(f"Benchmarking {filename}...")
+        try:
+            if isolate:
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    results[filename] = pool.submit(bench_scene, filename, **kwargs).result()
+            else:
+                results[filename] = bench_scene(filename, **kwargs)
+        except Exception as e:
+            logger.error(f"Benchmark of {filename} crashed: {e}")
+            results[filename] = {"error": str(e)}
+    return results
+
+
+def compare(results, baseline, threshold_pct=10.0, realtime_fps=60.0):
+    """
+    Compare results against a baseline. Returns a list of row dicts with a
+    'status' of ok / error, or the problems found joined with "+"
+    (regression, below-realtime, or "regression+below-realtime").
+    """
+    rows = []
+    for filename, result in results.items():
+        row = {"scene": filename, "fps": None, "baseline_fps": None, "delta_pct": None, "status": "ok"}
+        if "error" in result:
+            row["status"] = "error"
+            rows.append(row)
+            continue
+
+        row["fps"] = result["fps"]
+        row["p95_ms"] = result["latency_ms"]["p95"]
+        row["peak_rss_mb"] = result["peak_rss_mb"]
+        row["gc_gen0_collections"] = result["gc_gen0_collections"]
+
+        problems = []
+        base = (baseline or {}).get(filename)
+        if base and "fps" in base and base["fps"]:
+            row["baseline_fps"] = base["fps"]
+            row["delta_pct"] = round((result["fps"] - base["fps"]) / base["fps"] * 100, 1)
+            if row["delta_pct"] < -threshold_pct:
+                problems.append("regression")
+
+        if result["fps"] < realtime_fps:
+            problems.append("below-realtime")
+        if problems:
+            row["status"] = "+".join(problems)
+        rows.append(row)
+    return rows
+
+
+def format_table(rows):
+    headers = ["scene", "fps", "base fps", "delta %", "p95 ms", "rss MB", "gc0", "status"]
+    lines = []
+    for row in rows:
+        lines.append([
+            row["scene"],
+            _fmt(row.get("fps")),
+            _fmt(row.get("baseline_fps")),
+            _fmt(row.get("delta_pct"), signed=True),
+            _fmt(row.get("p95_ms")),
+            _fmt(row.get("peak_rss_mb")),
+            _fmt(row.get("gc_gen0_collections")),
+            row["status"],
+        ])
+    widths = [max(len(str(c)) for c in col) for col in zip(headers, *lines)]
+    out = ["  ".join(h.ljust(w) for h, w in zip(headers, widths))]
+    out.append("  ".join("-" * w for w in widths))
+    for line in lines:
+        out.append("  ".join(str(c).ljust(w) for c, w in zip(line, widths)))
+    return "\n".join(out)
+
+
+def _fmt(value, signed=False):
+    if value is None:
+        return "-"
+    if signed and isinstance(value, (int, float)) and value > 0:
+        return f"+{value}"
+    return str(value)
+
+
+def _load_baseline(path):
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        # Accept either a full results file or a bare {scene: result} mapping
+        return data.get("scenes", data)
+    except FileNotFoundError:
+        logger.warning(f"Baseline {path} not found, skipping comparison")
+    except Exception as e:
+        logger.error(f"Failed to load baseline {path}: {e}")
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.bench", description="Headless scene benchmark")
+    parser.add_argument("scripts", nargs="*", help="Script filenames to benchmark (default: all)")
+    parser.add_argument("--scripts-dir", default=DEFAULT_SCRIPTS_DIR)
+    parser.add_argument("--frames", type=int, default=600, help="Timed frames per scene")
+    parser.add_argument("--warmup", type=int, default=30, help="Untimed frames before measuring")
+    parser.add_argument("--fps", type=float, default=60.0, help="Fixed dt = 1/fps passed to update()")
+    parser.add_argument("--alloc-frames", type=int, default=60, help="Frames traced for allocation stats")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write JSON results")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Also write these results as a baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="FPS drop (%%) counted as a regression")
+    parser.add_argument("--realtime-fps", type=float, default=60.0, help="FPS below which a scene is flagged")
+    parser.add_argument("--batch-pixels", choices=("on", "off"), help="Force SetPixel batching on/off (default: per scene)")
+    parser.add_argument("--in-process", action="store_true", help="Don't isolate scenes in subprocesses")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 on regressions, below-realtime scenes or errors")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+
+    filenames = args.scripts or sorted(f for f in os.listdir(args.scripts_dir) if f.endswith(".py"))
+    results = run_benchmarks(
+        filenames,
+        isolate=not args.in_process,
+        scripts_dir=args.scripts_dir,
+        frames=args.frames,
+        warmup=args.warmup,
+        dt=1.0 / args.fps,
+        alloc_frames=args.alloc_frames,
+        batch_pixels=None if args.batch_pixels is None else args.batch_pixels == "on",
+    )
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "frames": args.frames,
+            "dt": 1.0 / args.fps,
+            "batch_pixels": args.batch_pixels or "scene",
+        },
+        "scenes": results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=4)
+        logger.info(f"Wrote results to {path}")
+
+    baseline = _load_baseline(args.baseline) if args.baseline else None
+    rows = compare(results, baseline, threshold_pct=args.threshold, realtime_fps=args.realtime_fps)
+    print(format_table(rows))
+
+    failed = any(row["status"] != "ok" for row in rows)
+    return 1 if failed and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -73,7 +73,7 @@ class AppSettingsManager:
             self.settings[category][key] = value
             logger.info(f"Setting updated: {category}.{key} = {old_value} -> {value}")
             
-            # Persist immediately
+            # Persist (debounced on the background writer)
             return self._save()
     
     def update_category(self, category, values):
@@ -87,13 +87,13 @@ class AppSettingsManager:
             self.settings[category].update(values)
             logger.info(f"Settings category updated: {category}")
             
-            # Persist immediately
+            # Persist (debounced on the background writer)
             return self._save()
     
     def _save(self):
-        """Save settings to file"""
+        """Save settings to file (written on the background writer; failures show in its status)"""
         try:
-            FileOps.save_json(SETTINGS_FILE, self.settings)
+            FileOps.schedule_save_json(SETTINGS_FILE, self.settings)
             return True
         except Exception as e:
             logger.error(f"Failed to save settings: {e}")
@@ -1,6 +1,16 @@
 from abc import ABC, abstractmethod
 
 class BaseScene(ABC):
+    # Set to True to receive the NumPy-backed FrameBuffer in draw() instead of the
+    # hardware canvas. Write to `canvas.pixels` (a (height, width, 3) uint8 array);
+    # SetPixel/Fill/Clear/SetImage keep working on the same buffer.
+    use_framebuffer = False
+
+    # Set to True to batch per-pixel drawing: SetPixel/Fill/Clear on the canvas are
+    # recorded into an in-memory frame and sent to the matrix with one SetImage per
+    # frame. No other code changes needed; the preview is always exact.
+    batch_pixels = False
+
     def __init__(self, matrix, state_manager):
         self.matrix = matrix
         self.state_manager = state_manager
@@ -23,6 +33,16 @@ class BaseScene(ABC):
         """
         pass
 
+    def on_settings_changed(self, settings):
+        """
+        Called before update() when the global settings changed: on the first
+        frame after the scene becomes active, then whenever the settings
+        version changes. Re-derive anything computed from settings here
+        instead of re-reading them every frame.
+        :param settings: The current SettingsSnapshot (read-only mapping with a `version`).
+        """
+        pass
+
     def enter(self, state_manager):
         """Called when the scene becomes active."""
         pass
@@ -1,25 +1,32 @@
 import time
 import logging
 import threading
-import io
 from collections import deque
-from PIL import Image
+from app.core.frame_scheduler import FrameScheduler
+from app.core.frame_profiler import FrameProfiler
+from app.core.preview_encoder import PreviewEncoder
 
 logger = logging.getLogger(__name__)
 
 class Engine:
-    def __init__(self, matrix_driver, state_manager):
+    def __init__(self, matrix_driver, state_manager, scheduler=None):
         self.matrix = matrix_driver
         self.state_manager = state_manager
         self._running = False
         self._target_fps = 60  # Target 60 FPS for smoother animations
         self._frame_duration = 1.0 / self._target_fps
         
-        # Preview frame capture
-        self._preview_lock = threading.Lock()
-        self._latest_preview_frame = None  # PNG bytes
-        self._last_capture_time = 0
-        self._preview_capture_interval = 0.2  # Capture every 200ms (5 FPS)
+        # Frame pacing (absolute deadlines on the monotonic clock).
+        # Any object with wait()/reset()/get_stats() can be plugged in.
+        self._scheduler = scheduler or FrameScheduler.from_env(self._target_fps)
+        
+        # Preview frames: the render thread hands raw frames (tagged with the
+        # frame sequence number) to a background encoder, only while watched
+        self._frame_seq = 0
+        self.preview_encoder = PreviewEncoder(
+            self.matrix.width, self.matrix.height,
+            interval=0.2,  # Capture every 200ms (5 FPS)
+        )
         
         # FPS monitoring - use deque for O(1) append/pop performance
         self._frame_times = deque(maxlen=120)  # Track ~2 seconds at 60 FPS
@@ -27,37 +34,51 @@ class Engine:
         self._last_fps_log = 0  # Last time we logged FPS warning
         self._fps_log_interval = 5.0  # Only log FPS warnings every 5 seconds
         self._current_fps = 0.0  # Current calculated FPS
+        
+        # Per-phase frame timing for the active scene
+        self._profiler = FrameProfiler()
+        self._profiled_scene_key = None
 
     def start(self):
         """Starts the render loop in the current thread (blocking) or separate thread."""
         self._running = True
+        self.preview_encoder.start()
         logger.info("Engine started.")
         self._loop()
 
     def stop(self):
         self._running = False
+        self.preview_encoder.stop()
         logger.info("Engine stopping...")
 
     def _loop(self):
-        last_time = time.time()
+        scheduler = self._scheduler
+        scheduler.reset()
+        last_time_ns = time.perf_counter_ns()
         error_count = 0
         max_consecutive_errors = 10
+        # Scene and settings version it was last told about (on_settings_changed)
+        seen_scene, seen_version = None, None
         
         while self._running:
             try:
-                current_time = time.time()
-                dt = current_time - last_time
+                # Monotonic clock: immune to NTP / RTC wall-clock jumps
+                current_time_ns = time.perf_counter_ns()
+                current_time = current_time_ns / 1_000_000_000
+                dt = (current_time_ns - last_time_ns) / 1_000_000_000
                 # Cap delta time to prevent huge jumps (e.g., system sleep)
                 dt = min(dt, 1.0)
-                last_time = current_time
+                last_time_ns = current_time_ns
                 
-                # 1. Get Settings & Active Scene
+                # 1. Get Settings & Active Scene (swapping in a requested scene between frames)
                 try:
-                    settings = self.state_manager.get_settings()
+                    self.state_manager.apply_pending_scene()
+                    settings = self.state_manager.settings  # Immutable snapshot: no lock, no copy
                     scene = self.state_manager.active_scene
                 except Exception as e:
                     logger.error(f"Error getting state: {e}")
                     time.sleep(0.1)
+                    scheduler.reset()
                     continue
                 
                 # Speed Multiplier
@@ -70,20 +91,51 @@ class Engine:
                 
                 if scene:
                     try:
+                        perf_counter_ns = time.perf_counter_ns
+                        self._check_profiled_scene(scene)
+                        
+                        self._frame_seq += 1
+                        
                         # 2. Update Logic
+                        t_start = perf_counter_ns()
+                        if scene is not seen_scene or settings.version != seen_version:
+                            # New scene, or settings changed since it last heard
+                            seen_scene, seen_version = scene, settings.version
+                            on_settings_changed = getattr(scene, "on_settings_changed", None)
+                            if on_settings_changed:
+                                on_settings_changed(settings)
                         scene.update(scaled_dt)
+                        t_update = perf_counter_ns()
                         
                         # 3. Render
+                        # Scenes opting into the framebuffer draw into a NumPy buffer
+                        # that swap_canvas() flushes with a single SetImage
+                        self.matrix.set_framebuffer_mode(getattr(scene, "use_framebuffer", False))
+                        self.matrix.set_pixel_batching(getattr(scene, "batch_pixels", False))
+                        
                         # Clear canvas (optional, depends on scene optimization)
                         self.matrix.clear() 
+                        t_clear = perf_counter_ns()
                         
                         scene.draw(self.matrix.canvas)
+                        t_draw = perf_counter_ns()
                         
                         # 4. Capture preview frame BEFORE swap (capture what we just drew)
                         self._maybe_capture_preview()
+                        t_preview = perf_counter_ns()
                         
                         # 5. Swap Hardware Buffers
                         self.matrix.swap_canvas()
+                        t_swap = perf_counter_ns()
+                        
+                        self._profiler.record_frame({
+                            "update": t_update - t_start,
+                            "clear": t_clear - t_update,
+                            "draw": t_draw - t_clear,
+                            "preview": t_preview - t_draw,
+                            "swap": t_swap - t_preview,
+                            "total": t_swap - t_start,
+                        })
                         
                         # Reset error count on successful frame
                         error_count = 0
@@ -103,20 +155,21 @@ class Engine:
                         
                         # Prevent tight loop spamming errors
                         time.sleep(0.1)
+                        scheduler.reset()
                 else:
                     # No scene active, clear screen or show logo?
                     try:
+                        self.matrix.set_framebuffer_mode(False)
+                        self.matrix.set_pixel_batching(False)
                         self.matrix.clear()
                         self.matrix.swap_canvas()
                     except Exception as e:
                         logger.error(f"Error clearing matrix: {e}")
                     time.sleep(0.1)
+                    scheduler.reset()
 
-                # 5. Timing / Frame Cap
-                elapsed = time.time() - current_time
-                sleep_time = self._frame_duration - elapsed
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                # 5. Timing / Frame Cap (sleeps until the next absolute deadline)
+                scheduler.wait()
                 
                 # 6. FPS Monitoring
                 self._update_fps_tracking(current_time)
@@ -128,29 +181,33 @@ class Engine:
                 logger.critical(f"Critical error in engine loop: {e}", exc_info=True)
                 # Prevent complete crash, but log heavily
                 time.sleep(1)
+                scheduler.reset()
 
+    def _check_profiled_scene(self, scene):
+        """Start a fresh timing profile whenever the active scene (or playlist item) changes."""
+        sub_scene = getattr(scene, "current_scene_instance", None)
+        key = self._profiled_scene_key
+        if key is None or key[0] is not scene or key[1] is not sub_scene:
+            self._profiled_scene_key = (scene, sub_scene)
+            self._profiler.reset(self._scene_label(sub_scene or scene))
+    
+    @staticmethod
+    def _scene_label(scene):
+        return getattr(scene, "filename", None) or scene.__class__.__name__
+    
     def _maybe_capture_preview(self):
-        """Capture a preview frame if enough time has passed since last capture."""
-        current_time = time.time()
-        if current_time - self._last_capture_time >= self._preview_capture_interval:
-            try:
-                # Capture frame from matrix
-                img = self.matrix.capture_frame()
-                if img:
-                    # Convert to PNG bytes
-                    buffer = io.BytesIO()
-                    # Scale up for better visibility (e.g., 4x = 256x256)
-                    scaled = img.resize((img.width * 4, img.height * 4), Image.Resampling.NEAREST)
-                    scaled.save(buffer, format='PNG')
-                    png_bytes = buffer.getvalue()
-                    
-                    # Store latest frame (thread-safe)
-                    with self._preview_lock:
-                        self._latest_preview_frame = png_bytes
-                    
-                    self._last_capture_time = current_time
-            except Exception as e:
-                logger.debug(f"Failed to capture preview frame: {e}")
+        """Hand the frame just drawn to the preview encoder if someone is watching and one is due."""
+        encoder = self.preview_encoder
+        current_time = time.monotonic()
+        if not encoder.wants_frame(current_time):
+            return
+        try:
+            # Raw bytes only: upscaling and PNG encoding happen on the encoder thread
+            raw = self.matrix.capture_raw()
+            if raw:
+                encoder.submit(self._frame_seq, raw, current_time)
+        except Exception as e:
+            logger.debug(f"Failed to capture preview frame: {e}")
     
     def _update_fps_tracking(self, current_time):
         """Track frame times and calculate FPS, logging warnings if performance is poor."""
@@ -171,9 +228,11 @@ class Engine:
                 # Log warning if FPS is below 40 (adjusted for 60 FPS target)
                 if self._current_fps < 40.0:
                     if current_time - self._last_fps_log >= self._fps_log_interval:
+                        jitter = self.get_scheduler_stats().get("jitter_us") or {}
                         logger.warning(
                             f"⚠️  Low FPS detected: {self._current_fps:.1f} FPS "
-                            f"(target: {self._target_fps} FPS). "
+                            f"(target: {self._target_fps} FPS, "
+                            f"wake-up jitter p95: {jitter.get('p95', 'n/a')} µs). "
                             f"Check system load and performance optimizations."
                         )
                         self._last_fps_log = current_time
@@ -182,13 +241,38 @@ class Engine:
         """Get the current calculated FPS."""
         return self._current_fps
     
-    def get_preview_frame(self):
+    def get_scheduler_stats(self):
+        """Get frame pacing statistics (deadline misses, wake-up jitter)."""
+        try:
+            return self._scheduler.get_stats()
+        except Exception as e:
+            logger.debug(f"Failed to read scheduler stats: {e}")
+            return {}
+    
+    def get_perf_stats(self):
+        """Get per-phase frame timing percentiles for the active scene."""
+        stats = self._profiler.snapshot()
+        stats["fps"] = round(self._current_fps, 1)
+        stats["target_fps"] = self._target_fps
+        stats["preview"] = self.preview_encoder.get_stats()
+        return stats
+    
+    def get_phase_totals(self):
+        """Per-phase (frames, total us) for the active scene (see FrameProfiler.totals)."""
+        return self._profiler.totals()
+    
+    def get_preview_frame(self, wait=0.0):
         """
         Get the latest captured preview frame as PNG bytes.
         Returns bytes or None if no frame available.
+        Preview capture only runs while it is being requested, so pass a short
+        `wait` (seconds) to block for a fresh frame after an idle period.
         """
-        with self._preview_lock:
-            return self._latest_preview_frame
+        return self.preview_encoder.get_png(wait)[1]
+    
+    def get_preview_png(self, wait=0.0):
+        """Latest preview frame as (frame_seq, png_bytes), or (None, None)."""
+        return self.preview_encoder.get_png(wait)
     
     def run_threaded(self):
         thread = threading.Thread(target=self.start, daemon=True)
@@ -0,0 +1,200 @@
+import threading
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+# Frame phases recorded by the engine, in render order
+PHASES = ("update", "clear", "draw", "preview", "swap", "total")
+
+
+class RingBuffer:
+    """Fixed-size ring of integer samples (no allocation after construction)."""
+
+    def __init__(self, capacity=600):
+        self._data = array('q', [0]) * capacity
+        self._capacity = capacity
+        self._index = 0
+        self._count = 0
+
+    def append(self, value):
+        self._data[self._index] = value
+        self._index = (self._index + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def values(self):
+        """Samples currently in the ring (oldest first)."""
+        if self._count < self._capacity:
+            return self._data[:self._count].tolist()
+        return (self._data[self._index:] + self._data[:self._index]).tolist()
+
+    def clear(self):
+        self._index = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+
+class HdrHistogram:
+    """
+    Log-linear histogram in the style of HdrHistogram.
+
+    Values below 2**sub_bucket_bits are counted exactly; above that, every
+    power of two is split into 2**(sub_bucket_bits - 1) linear sub-buckets, so
+    the relative error stays below 1 / 2**(sub_bucket_bits - 1) across the
+    whole range with a small, fixed number of buckets.
+    """
+
+    def __init__(self, sub_bucket_bits=6, max_value=1 << 32):
+        self._bits = sub_bucket_bits
+        self._sub_count = 1 << sub_bucket_bits
+        self._half = self._sub_count >> 1
+        self._max_value = max_value
+        self._counts = [0] * (self._index_of(max_value) + 1)
+        self.clear()
+
+    def clear(self):
+        for i in range(len(self._counts)):
+            self._counts[i] = 0
+        self.total_count = 0
+        self.total_sum = 0
+        self.max = 0
+
+    def _index_of(self, value):
+        if value < self._sub_count:
+            return value
+        shift = value.bit_length() - self._bits
+        return self._sub_count + (shift - 1) * self._half + ((value >> shift) - self._half)
+
+    def _highest_equivalent(self, index):
+        """Largest value that lands in the bucket at `index`."""
+        if index < self._sub_count:
+            return index
+        k = index - self._sub_count
+        shift = k // self._half + 1
+        mantissa = k % self._half + self._half
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        elif value > self._max_value:
+            value = self._max_value
+        self._counts[self._index_of(value)] += 1
+        self.total_count += 1
+        self.total_sum += value
+        if value > self.max:
+            self.max = value
+
+    def value_at_percentile(self, pct):
+        if self.total_count == 0:
+            return 0
+        target = max(1, int(round(pct / 100 * self.total_count)))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total_sum / self.total_count if self.total_count else 0
+
+
+class FrameProfiler:
+    """
+    Per-phase frame timing for the active scene.
+
+    The engine calls record_frame() once per frame with the duration of each
+    phase in nanoseconds. Recent frames are kept in ring buffers (exact
+    percentiles over the last `window` frames) and all frames since the scene
+    became active go into HDR histograms (microsecond resolution).
+    """
+
+    def __init__(self, window=600):
+        self._lock = threading.Lock()
+        self._rings = {phase: RingBuffer(window) for phase in PHASES}
+        self._histograms = {phase: HdrHistogram() for phase in PHASES}
+        self._scene_label = None
+        self._frames = 0
+
+    def reset(self, scene_label=None):
+        """Start a fresh profile (called by the engine when the active scene changes)."""
+        with self._lock:
+            for phase in PHASES:
+                self._rings[phase].clear()
+                self._histograms[phase].clear()
+            self._scene_label = scene_label
+            self._frames = 0
+
+    def record_frame(self, durations_ns):
+        """
+        Record one frame. `durations_ns` maps phase name -> duration in ns;
+        missing phases are skipped.
+        """
+        with self._lock:
+            for phase, duration in durations_ns.items():
+                ring = self._rings.get(phase)
+                if ring is None:
+                    continue
+                ring.append(duration)
+                # Histograms work in microseconds to keep the bucket range small
+                self._histograms[phase].record(duration // 1000)
+            self._frames += 1
+
+    def totals(self):
+        """
+        {phase: (frames, total duration in us)} since the scene became active.
+        Cheap: samplers diff two calls to get the mean over an interval.
+        """
+        with self._lock:
+            return {phase: (hist.total_count, hist.total_sum) for phase, hist in self._histograms.items()}
+
+    def snapshot(self):
+        """
+        Per-phase p50/p95/p99/max/mean in milliseconds.
+        'recent' covers the ring-buffer window, the top-level values cover every
+        frame since the scene became active.
+        """
+        with self._lock:
+            phases = {}
+            for phase in PHASES:
+                hist = self._histograms[phase]
+                recent = sorted(self._rings[phase].values())
+                phases[phase] = {
+                    "count": hist.total_count,
+                    "mean_ms": _us_to_ms(hist.mean()),
+                    "p50_ms": _us_to_ms(hist.value_at_percentile(50)),
+                    "p95_ms": _us_to_ms(hist.value_at_percentile(95)),
+                    "p99_ms": _us_to_ms(hist.value_at_percentile(99)),
+                    "max_ms": _us_to_ms(hist.max),
+                    "recent": {
+                        "count": len(recent),
+                        "p50_ms": _ns_to_ms(_nearest_rank(recent, 50)),
+                        "p95_ms": _ns_to_ms(_nearest_rank(recent, 95)),
+                        "p99_ms": _ns_to_ms(_nearest_rank(recent, 99)),
+                        "max_ms": _ns_to_ms(recent[-1] if recent else 0),
+                    },
+                }
+            return {
+                "scene": self._scene_label,
+                "frames": self._frames,
+                "phases": phases,
+            }
+
+
+def _nearest_rank(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def _us_to_ms(value):
+    return round(value / 1000, 3)
+
+
+def _ns_to_ms(value):
+    return round(value / 1_000_000, 3)
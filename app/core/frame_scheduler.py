@@ -0,0 +1,184 @@
+import os
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Frame pacing policies
+POLICY_CATCH_UP = "catch_up"  # Render late frames back-to-back until we're on schedule again
+POLICY_SKIP = "skip"          # Drop missed deadlines and realign to the next future slot
+
+NS_PER_SEC = 1_000_000_000
+
+
+class FrameScheduler:
+    """
+    Paces the render loop against absolute deadlines on the monotonic
+    perf_counter_ns() clock, so wall-clock jumps (NTP, RTC sync) and sleep
+    overshoot don't accumulate into drift.
+
+    Deadlines are advanced by exactly one frame period per frame. Sleeping is
+    done with time.sleep() until `spin_ns` before the deadline, then the last
+    stretch is busy-waited (hybrid sleep-then-spin). Set spin_ns=0 for a pure
+    sleep scheduler on boards where burning a core is not acceptable.
+    """
+
+    def __init__(self, target_fps=60, policy=POLICY_SKIP, spin_ns=1_000_000,
+                 max_catch_up_frames=3, jitter_window=240):
+        if policy not in (POLICY_CATCH_UP, POLICY_SKIP):
+            raise ValueError(f"Unknown frame scheduler policy: {policy}")
+
+        self.policy = policy
+        self.spin_ns = max(0, int(spin_ns))
+        self.max_catch_up_frames = max(1, int(max_catch_up_frames))
+        self.set_target_fps(target_fps)
+
+        # Lateness of each wake-up relative to its deadline (ns), for jitter stats
+        self._lateness = deque(maxlen=jitter_window)
+        self._next_deadline = None
+
+        # Counters
+        self._frames = 0
+        self._missed = 0     # Deadlines we were already past when wait() was called
+        self._skipped = 0    # Frame slots dropped by the skip policy
+        self._resyncs = 0    # Catch-up backlog exceeded max_catch_up_frames
+
+    @classmethod
+    def from_env(cls, target_fps=60):
+        """
+        Build a scheduler tuned via environment variables:
+          MATRIX_FRAME_POLICY   - "skip" (default) or "catch_up"
+          MATRIX_FRAME_SPIN_US  - busy-wait window before each deadline (default 1000, 0 = sleep only)
+        """
+        policy = os.environ.get("MATRIX_FRAME_POLICY", POLICY_SKIP).strip().lower()
+        if policy not in (POLICY_CATCH_UP, POLICY_SKIP):
+            logger.warning(f"Unknown MATRIX_FRAME_POLICY '{policy}', using '{POLICY_SKIP}'")
+            policy = POLICY_SKIP
+
+        try:
+            spin_us = int(os.environ.get("MATRIX_FRAME_SPIN_US", 1000))
+        except ValueError:
+            logger.warning("Invalid MATRIX_FRAME_SPIN_US, using 1000")
+            spin_us = 1000
+
+        return cls(target_fps=target_fps, policy=policy, spin_ns=spin_us * 1000)
+
+    @property
+    def target_fps(self):
+        return self._target_fps
+
+    @property
+    def period_ns(self):
+        return self._period_ns
+
+    def set_target_fps(self, target_fps):
+        """Change the frame rate. Takes effect from the next deadline."""
+        if target_fps <= 0:
+            raise ValueError("target_fps must be positive")
+        self._target_fps = target_fps
+        self._period_ns = int(NS_PER_SEC / target_fps)
+
+    def reset(self, now_ns=None):
+        """
+        Realign the schedule to start from now.
+        Call this after deliberate pauses (error back-off, idle sleeps) so they
+        aren't counted as missed frames or trigger a catch-up burst.
+        """
+        if now_ns is None:
+            now_ns = time.perf_counter_ns()
+        self._next_deadline = now_ns + self._period_ns
+
+    def wait(self):
+        """
+        Block until the next frame deadline and return the wake-up time (ns).
+        """
+        if self._next_deadline is None:
+            self.reset()
+
+        deadline = self._next_deadline
+        now = time.perf_counter_ns()
+
+        if now < deadline:
+            now = self._sleep_until(deadline)
+            self._lateness.append(now - deadline)
+            self._next_deadline = deadline + self._period_ns
+        else:
+            # We're already late for this slot
+            self._missed += 1
+            self._lateness.append(now - deadline)
+            self._advance_late(deadline, now)
+
+        self._frames += 1
+        return now
+
+    def _sleep_until(self, deadline):
+        """Sleep coarsely, then spin for the last `spin_ns` nanoseconds."""
+        perf_counter_ns = time.perf_counter_ns
+        remaining = deadline - perf_counter_ns()
+        coarse = remaining - self.spin_ns
+        if coarse > 0:
+            time.sleep(coarse / NS_PER_SEC)
+
+        now = perf_counter_ns()
+        if self.spin_ns:
+            while now < deadline:
+                now = perf_counter_ns()
+        elif now < deadline:
+            # Pure sleep mode: one more short sleep if we woke up early
+            time.sleep((deadline - now) / NS_PER_SEC)
+            now = perf_counter_ns()
+        return now
+
+    def _advance_late(self, deadline, now):
+        period = self._period_ns
+        behind = (now - deadline) // period  # Whole periods we're behind
+
+        if self.policy == POLICY_SKIP:
+            # Jump to the first deadline in the future, dropping the missed slots
+            self._skipped += behind
+            self._next_deadline = deadline + (behind + 1) * period
+        else:
+            # Keep the original schedule so missed frames are rendered back-to-back,
+            # but don't let the backlog grow without bound after a long stall
+            if behind >= self.max_catch_up_frames:
+                self._resyncs += 1
+                self._next_deadline = now + period
+            else:
+                self._next_deadline = deadline + period
+
+    def get_stats(self):
+        """
+        Scheduler statistics for tuning per board.
+        Jitter is the lateness of wake-ups versus their deadline, in microseconds.
+        """
+        samples = sorted(self._lateness)
+        stats = {
+            "target_fps": self._target_fps,
+            "policy": self.policy,
+            "mode": "hybrid" if self.spin_ns else "sleep",
+            "spin_us": self.spin_ns / 1000,
+            "frames": self._frames,
+            "missed_deadlines": self._missed,
+            "skipped_frames": self._skipped,
+            "resyncs": self._resyncs,
+            "jitter_us": None,
+        }
+        if samples:
+            stats["jitter_us"] = {
+                "mean": round(sum(samples) / len(samples) / 1000, 1),
+                "p50": round(_percentile(samples, 50) / 1000, 1),
+                "p95": round(_percentile(samples, 95) / 1000, 1),
+                "p99": round(_percentile(samples, 99) / 1000, 1),
+                "max": round(samples[-1] / 1000, 1),
+                "samples": len(samples),
+            }
+        return stats
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
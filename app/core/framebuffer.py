@@ -0,0 +1,96 @@
+import logging
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class FrameBuffer:
+    """
+    In-memory RGB frame that scenes draw into instead of the hardware canvas.
+
+    The pixels live in a single bytearray (row-major, 3 bytes per pixel) that
+    is also exposed as a writable (height, width, 3) uint8 ndarray, so scenes
+    can render with slicing and vector ops:
+
+        canvas.pixels[:, :] = (5, 5, 15)
+        canvas.pixels[y0:y1, x0:x1] = colors
+
+    The canvas-style calls (SetPixel, Fill, Clear, SetImage) work on the same
+    memory, so legacy per-pixel code keeps working. The driver pushes the
+    whole buffer to the hardware canvas with one SetImage per frame.
+    """
+
+    def __init__(self, width, height, buffer=None):
+        self.width = width
+        self.height = height
+        size = width * height * 3
+        if buffer is None:
+            buffer = bytearray(size)
+        elif len(buffer) != size:
+            raise ValueError(f"Buffer size {len(buffer)} does not match {width}x{height} RGB")
+        self.buffer = buffer
+        self.pixels = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+        self._black = bytes(size)
+
+    def SetPixel(self, x, y, r, g, b):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = (y * self.width + x) * 3
+            buffer = self.buffer
+            try:
+                buffer[i] = r
+                buffer[i + 1] = g
+                buffer[i + 2] = b
+            except (ValueError, TypeError):
+                # Out-of-range or float components: clamp like the C bindings would saturate
+                buffer[i] = _clamp(r)
+                buffer[i + 1] = _clamp(g)
+                buffer[i + 2] = _clamp(b)
+
+    def GetPixel(self, x, y):
+        i = (y * self.width + x) * 3
+        return tuple(self.buffer[i:i + 3])
+
+    def Fill(self, r, g, b):
+        self.pixels[:, :] = (_clamp(r), _clamp(g), _clamp(b))
+
+    def Clear(self):
+        self.buffer[:] = self._black
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        # Fast path: full-frame image, one memcpy
+        if image.size == (self.width, self.height) and offset_x == 0 and offset_y == 0:
+            self.buffer[:] = image.tobytes()
+            return
+
+        # General path: clip to the frame and paste the visible region
+        left = max(0, -offset_x)
+        top = max(0, -offset_y)
+        right = min(image.width, self.width - offset_x)
+        bottom = min(image.height, self.height - offset_y)
+        if right <= left or bottom <= top:
+            return
+        region = np.asarray(image.crop((left, top, right, bottom)))
+        self.pixels[offset_y + top:offset_y + bottom, offset_x + left:offset_x + right] = region
+
+    def as_image(self):
+        """
+        PIL image of the buffer for SetImage. Pillow stores RGB as 4 bytes per
+        pixel, so this is a single C-level conversion rather than a shared view;
+        use to_image() when you need an explicit snapshot.
+        """
+        return Image.frombuffer('RGB', (self.width, self.height), self.buffer, 'raw', 'RGB', 0, 1)
+
+    def to_image(self):
+        """Snapshot of the current frame as an independent PIL image."""
+        return Image.frombytes('RGB', (self.width, self.height), bytes(self.buffer))
+
+    def tobytes(self):
+        return bytes(self.buffer)
+
+
+def _clamp(value):
+    return max(0, min(255, int(value)))
@@ -0,0 +1,349 @@
+"""
+Home Assistant sensor fetching for scenes.
+
+Scenes never talk to Home Assistant themselves: they call watch() with the
+entities they show (from update(), every frame is fine) and read the
+latest values from StateManager.external_data under data_key(entity_id).
+A single asyncio loop on its own thread polls every watched entity at the
+shortest interval any scene asked for, over a small pool of keep-alive
+HTTP connections, and publishes the results:
+
+    external_data["ha.sensor.x"] = {
+        "state": "21.5", "value": 21.5, "unit": "°C",
+        "updated": <time of the last successful fetch, or None>,
+        "checked": <time of the last attempt>,
+        "error": None or "Auth failed" / "Sensor not found" / "HTTP 500" /
+                 "Connection error" / "Invalid data" / "HA not configured",
+    }
+
+A failed fetch keeps the last good value (so a hiccup doesn't blank the
+display) and sets "error". Requests for an entity already being fetched
+join the in-flight request instead of issuing another one. Watches are
+leases: an entity nobody has renewed for a while stops being polled.
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DATA_PREFIX = "ha."
+REQUEST_TIMEOUT = 5.0
+POOL_SIZE = 4
+MIN_INTERVAL = 1.0
+# An entity is dropped when no scene renewed its watch for this long (or 3 intervals, if longer)
+LEASE_SECONDS = 30.0
+SCHEDULER_TICK = 0.25
+
+
+def data_key(entity_id):
+    """The external_data key an entity's value is published under."""
+    return f"{DATA_PREFIX}{entity_id}"
+
+
+class FetchError(Exception):
+    """A fetch failed; str() is the short message published to scenes."""
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP(S) connections to one Home Assistant instance."""
+
+    def __init__(self, base_url, token, size=POOL_SIZE):
+        parsed = urllib.parse.urlsplit(base_url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"Invalid Home Assistant URL: {base_url}")
+        self.key = (base_url, token)
+        self._connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._base_path = parsed.path.rstrip("/")
+        self._headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+        self._size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _connect(self):
+        self.connections_opened += 1
+        return self._connection_class(self._host, self._port, timeout=REQUEST_TIMEOUT)
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self._size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def get_json(self, path):
+        """Blocking GET (run it in an executor). Returns the decoded JSON body."""
+        conn, reused = self._acquire()
+        try:
+            try:
+                status, body = self._request(conn, path)
+            except (ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection: retry once on a fresh one
+                conn.close()
+                conn = self._connect()
+                status, body = self._request(conn, path)
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise FetchError("Connection error") from e
+        self._release(conn)
+
+        if status == 401:
+            raise FetchError("Auth failed")
+        if status == 404:
+            raise FetchError("Sensor not found")
+        if status != 200:
+            raise FetchError(f"HTTP {status}")
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise FetchError("Invalid data") from e
+
+    def _request(self, conn, path):
+        self.requests += 1
+        conn.request("GET", self._base_path + path, headers=self._headers)
+        response = conn.getresponse()
+        # Always drain the body, or the connection can't be reused
+        return response.status, response.read()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class HomeAssistantService:
+    """
+    Polls watched Home Assistant entities in the background and publishes
+    them to StateManager.external_data. Connection settings are read from
+    AppSettingsManager ("home_assistant" category) on every poll, so
+    changes in the settings page apply without a restart.
+    """
+
+    def __init__(self, state_manager, app_settings_manager):
+        self.state_manager = state_manager
+        self.app_settings_manager = app_settings_manager
+        self._watches = {}     # entity_id -> {"interval": s, "expires": monotonic}
+        self._next_due = {}    # entity_id -> monotonic time of the next poll
+        self._inflight = {}    # entity_id -> asyncio.Future (loop thread only)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="ha-fetch")
+        self._loop = None
+        self._thread = None
+        self._stopping = None
+        self.fetches = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    # --- scene side (any thread) ---
+
+    def watch(self, entity_ids, interval=10.0):
+        """Keep `entity_ids` polled at least every `interval` seconds. Renew it (cheap) or it lapses."""
+        interval = max(MIN_INTERVAL, float(interval))
+        now = time.monotonic()
+        expires = now + max(LEASE_SECONDS, interval * 3)
+        with self._lock:
+            for entity_id in entity_ids:
+                watch = self._watches.get(entity_id)
+                if watch is None:
+                    self._watches[entity_id] = {"interval": interval, "expires": expires}
+                    self._next_due[entity_id] = now  # New entity: fetch right away
+                else:
+                    if watch["expires"] < now:
+                        # The lease lapsed: the interval is no longer shared with the old watcher
+                        watch["interval"] = interval
+                    else:
+                        watch["interval"] = min(watch["interval"], interval)
+                    watch["expires"] = max(watch["expires"], expires)
+
+    def get(self, entity_id):
+        """The published entry for an entity, or None before its first fetch."""
+        return self.state_manager.get_data(data_key(entity_id))
+
+    def refresh(self, entity_id):
+        """Fetch an entity now (from any thread). Returns a concurrent future with the entry."""
+        if self._loop is None:
+            raise RuntimeError("Home Assistant service is not running")
+        return asyncio.run_coroutine_threadsafe(self.fetch(entity_id), self._loop)
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="home-assistant", daemon=True)
+        self._thread.start()
+        ready.wait(timeout=5.0)
+
+    def stop(self):
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout=REQUEST_TIMEOUT + 1.0)
+            self._thread = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._pool is not None:
+            self._pool.close()
+
+    def _run(self, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._stopping = asyncio.Event()
+        ready.set()
+        try:
+            loop.run_until_complete(self._poll_forever())
+        finally:
+            loop.close()
+            self._loop = None
+
+    # --- loop side ---
+
+    async def _poll_forever(self):
+        logger.info("Home Assistant service started")
+        while not self._stopping.is_set():
+            try:
+                self._poll_due()
+            except Exception as e:
+                logger.error(f"Home Assistant poll failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), SCHEDULER_TICK)
+            except asyncio.TimeoutError:
+                pass
+        for future in list(self._inflight.values()):
+            future.cancel()
+
+    def _poll_due(self):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for entity_id, watch in list(self._watches.items()):
+                if watch["expires"] < now:
+                    del self._watches[entity_id]
+                    self._next_due.pop(entity_id, None)
+                    logger.debug(f"Stopped polling {entity_id} (no longer watched)")
+                    continue
+                if now >= self._next_due.get(entity_id, now):
+                    self._next_due[entity_id] = now + watch["interval"]
+                    due.append(entity_id)
+        for entity_id in due:
+            if entity_id not in self._inflight:
+                asyncio.ensure_future(self.fetch(entity_id))
+
+    async def fetch(self, entity_id):
+        """Fetch and publish one entity. Concurrent calls for the same entity share one request."""
+        inflight = self._inflight.get(entity_id)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[entity_id] = future
+        try:
+            entry = await self._fetch_entry(entity_id)
+            self.state_manager.set_data(data_key(entity_id), entry)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved: nobody may be waiting on it
+            raise
+        finally:
+            del self._inflight[entity_id]
+
+    async def _fetch_entry(self, entity_id):
+        previous = self.get(entity_id) or {}
+        entry = {
+            "state": previous.get("state"),
+            "value": previous.get("value"),
+            "unit": previous.get("unit"),
+            "updated": previous.get("updated"),
+            "checked": time.time(),
+            "error": None,
+        }
+        pool = self._get_pool()
+        if pool is None:
+            entry["error"] = "HA not configured"
+            return entry
+
+        self.fetches += 1
+        loop = asyncio.get_running_loop()
+        try:
+            data = await loop.run_in_executor(self._executor, pool.get_json, f"/api/states/{entity_id}")
+        except FetchError as e:
+            self.failures += 1
+            entry["error"] = str(e)
+            logger.warning(f"Home Assistant fetch of {entity_id} failed: {e}")
+            return entry
+        except Exception as e:
+            self.failures += 1
+            entry["error"] = "Fetch error"
+            logger.error(f"Error fetching {entity_id} from Home Assistant: {e}")
+            return entry
+
+        state = data.get("state") if isinstance(data, dict) else None
+        attributes = data.get("attributes", {}) if isinstance(data, dict) else {}
+        try:
+            value = float(state)
+        except (TypeError, ValueError):
+            # e.g. "unavailable" while HA restarts: keep the last good value, like a failed fetch
+            entry["error"] = "Invalid data"
+            logger.warning(f"Home Assistant returned a non-numeric state for {entity_id}: {state!r}")
+            return entry
+        entry["state"] = state
+        entry["value"] = value
+        entry["unit"] = attributes.get("unit_of_measurement", "")
+        entry["updated"] = entry["checked"]
+        return entry
+
+    def _get_pool(self):
+        settings = self.app_settings_manager.get_setting("home_assistant") or {}
+        url = (settings.get("url") or "").strip().rstrip("/")
+        token = (settings.get("long_lived_token") or "").strip()
+        if not settings.get("enabled") or not url or not token:
+            return None
+        if self._pool is None or self._pool.key != (url, token):
+            if self._pool is not None:
+                self._pool.close()
+            try:
+                self._pool = _ConnectionPool(url, token)
+            except ValueError as e:
+                logger.error(str(e))
+                self._pool = None
+                return None
+        return self._pool
+
+    def get_stats(self):
+        with self._lock:
+            watched = {entity_id: watch["interval"] for entity_id, watch in self._watches.items()}
+        pool = self._pool
+        return {
+            "running": self._thread is not None,
+            "watched": watched,
+            "fetches": self.fetches,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "requests": pool.requests if pool else 0,
+            "connections_opened": pool.connections_opened if pool else 0,
+        }
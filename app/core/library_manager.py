@@ -10,6 +10,7 @@ class LibraryManager:
     def __init__(self, data_file="data/library.json"):
         self.data_file = data_file
         self.library = self._load()
+        self._listeners = []  # callback(*filenames) after metadata changes
         self.ensure_thumbnails_dir()
 
     def _load(self):
@@ -18,7 +19,18 @@ class LibraryManager:
         return FileOps.load_json(self.data_file) or {}
 
     def _save(self):
-        FileOps.save_json(self.data_file, self.library)
+        FileOps.schedule_save_json(self.data_file, self.library)
+
+    def add_listener(self, callback):
+        """Register callback(*filenames), called whenever metadata of those scenes changes."""
+        self._listeners.append(callback)
+
+    def _notify(self, *filenames):
+        for callback in self._listeners:
+            try:
+                callback(*filenames)
+            except Exception as e:
+                logger.error(f"Library listener failed: {e}")
 
     def ensure_thumbnails_dir(self):
          path = os.path.join("scenes", "thumbnails")
@@ -36,6 +48,7 @@ class LibraryManager:
             self.library[filename][k] = v
             
         self._save()
+        self._notify(filename)
         return self.library[filename]
 
     def rename_entry(self, old_filename, new_filename):
@@ -46,6 +59,7 @@ class LibraryManager:
         if old_filename in self.library:
             self.library[new_filename] = self.library.pop(old_filename)
             self._save()
+            self._notify(old_filename, new_filename)
             return True
         return False
         
@@ -53,6 +67,7 @@ class LibraryManager:
         if filename in self.library:
             del self.library[filename]
             self._save()
+            self._notify(filename)
             return True
         return False
     
@@ -78,6 +93,7 @@ class LibraryManager:
             
             image.save(thumb_path, "PNG")
             logger.info(f"Saved thumbnail for {filename}")
+            self._notify(filename)
             return True
         except Exception as e:
             logger.error(f"Failed to save thumbnail for {filename}: {e}")
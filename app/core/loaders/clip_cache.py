@@ -0,0 +1,154 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+BUDGET_ENV = "MATRIX_CLIP_CACHE_MB"
+DEFAULT_BUDGET_MB = 64
+
+
+class ClipCache:
+    """
+    Process-wide LRU of loaded ClipData, bounded by a byte budget.
+
+    Entries are keyed by (path, size) and validated against the source's
+    mtime/size on every lookup, so an edited clip is reloaded. ClipData is
+    immutable: every scene playing a clip shares the same instance. Evicting
+    an entry only drops the cache's reference; scenes still playing it keep
+    it alive.
+    """
+
+    def __init__(self, compiler, budget_bytes=DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.compiler = compiler
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # (path, size) -> (source_stamp, clip)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}  # (path, size) -> Event, dedupes concurrent loads
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, compiler):
+        """Budget from MATRIX_CLIP_CACHE_MB (default 64, 0 disables caching)."""
+        try:
+            budget_mb = float(os.environ.get(BUDGET_ENV, DEFAULT_BUDGET_MB))
+        except ValueError:
+            logger.warning(f"Invalid {BUDGET_ENV}, using {DEFAULT_BUDGET_MB} MB")
+            budget_mb = DEFAULT_BUDGET_MB
+        return cls(compiler, int(max(0.0, budget_mb) * 1024 * 1024))
+
+    def get(self, filepath, size, compile=True):
+        """
+        Shared ClipData for `filepath` at `size`, loading it on a miss. None if
+        it can't be loaded. With compile=False a miss only checks the on-disk
+        clip cache and never decodes the source (see StreamingClip).
+        """
+        key = (os.path.abspath(filepath), tuple(size))
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == stamp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                pending = self._loading.get(key)
+                if pending is None:
+                    # We load it; anyone else asking meanwhile waits for us
+                    self.misses += 1
+                    pending = self._loading[key] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            if compile:
+                clip = self.compiler.load(filepath, size)
+            else:
+                clip = self.compiler.lookup(filepath, size)
+            if clip is not None:
+                self._store(key, stamp, clip)
+            return clip
+        finally:
+            with self._lock:
+                del self._loading[key]
+            pending.set()
+
+    def peek(self, filepath, size):
+        """In-memory hit only: never hashes, decodes or touches the disk cache. None on a miss."""
+        key = (os.path.abspath(filepath), tuple(size))
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == (st.st_mtime_ns, st.st_size):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def adopt(self, filepath, size, frames, durations_ms):
+        """Compile frames decoded elsewhere (a streaming clip's first loop) and cache the result."""
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        clip = self.compiler.compile_frames(filepath, size, frames, durations_ms)
+        if clip is not None:
+            self._store((os.path.abspath(filepath), tuple(size)), (st.st_mtime_ns, st.st_size), clip)
+        return clip
+
+    def _store(self, key, stamp, clip):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1].nbytes
+            if clip.nbytes > self.budget_bytes:
+                # Larger than the whole budget: hand it out uncached
+                return
+            self._entries[key] = (stamp, clip)
+            self._bytes += clip.nbytes
+            while self._bytes > self.budget_bytes and self._entries:
+                evicted_key, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+                logger.debug(f"Evicted clip {os.path.basename(evicted_key[0])} from cache")
+
+    def invalidate(self, filepath=None):
+        """Drop one clip (all sizes), or everything when filepath is None."""
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            path = os.path.abspath(filepath)
+            for key in [k for k in self._entries if k[0] == path]:
+                self._bytes -= self._entries.pop(key)[1].nbytes
+
+    def purge(self, filepath):
+        """A clip is being deleted: drop it from memory and delete its compiled cache files."""
+        self.invalidate(filepath)
+        self.compiler.forget(filepath)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
@@ -0,0 +1,435 @@
+"""
+Clip compiler: decodes a clip once into a compact, palette-indexed cache file.
+
+Cache file layout (little-endian), version CACHE_VERSION:
+    header         MAGIC, version, width, height, frame_count, palette_count, pool_size
+    durations      frame_count x uint32 (milliseconds, runs of identical frames merged)
+    frame palette  frame_count x uint16 (index of the palette each frame uses,
+                   RGB_FRAME for a frame stored in full RGB)
+    palette table  palette_count x (uint32 first entry, uint32 entry count) into the pool
+    palette pool   pool_size x RGB
+    index planes   one (width * height) byte plane per indexed frame, in frame order
+    rgb frames     one (width * height * 3) byte frame per RGB_FRAME frame, in frame order
+
+Every frame with at most 256 colors gets its own exact palette (identical
+palettes are stored once). A frame with more colors is kept in full RGB
+rather than quantized, so compiling a clip never changes what it shows.
+
+Files live in CACHE_DIR, named after the SHA-1 of the source file and the
+target size, so an edited clip (new hash), a different matrix size or a
+format change (new version) simply misses and gets recompiled. Cache files
+are written to a temp file and renamed into place, and read back with mmap:
+loading a compiled clip costs a stat and a page-table mapping.
+
+Files of older cache versions are deleted when the compiler starts.
+Entries of a source that changed are deleted when it is rehashed, forget()
+deletes those of a clip being removed, and prune() drops entries no current
+source maps to (changes made while the server was down).
+"""
+import os
+import glob
+import mmap
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+import numpy as np
+from PIL import Image, ImageSequence
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "data/cache/clips"
+CACHE_VERSION = 3
+MAGIC = b"MXCLIP"
+HEADER = struct.Struct('<6sHHHIII')
+PALETTE_ENTRY = struct.Struct('<II')
+DEFAULT_DURATION_MS = 100
+MAX_COLORS = 256
+# frame_palette value of a frame stored in full RGB (too many colors to index exactly)
+RGB_FRAME = 0xFFFF
+
+
+class ClipData:
+    """
+    Decoded clip: 1-byte-per-pixel index planes, the palette(s) they index
+    and a duration table, plus full RGB for frames with too many colors.
+    Indexed frames are expanded to RGB with one vectorized palette lookup at
+    draw time. Immutable, so scenes can share one instance.
+    """
+
+    def __init__(self, width, height, durations_ms, planes, palettes, frame_palette, rgb_frames=None, buffer=None, source=None):
+        self.width = width
+        self.height = height
+        self.frame_count = len(durations_ms)
+        self.durations = [ms / 1000.0 for ms in durations_ms]  # in seconds
+        self.total_duration = sum(self.durations)
+        self.planes = planes  # (indexed frames, height, width) uint8
+        self.palettes = palettes  # list of (entries, 3) uint8
+        self.frame_palette = frame_palette
+        if rgb_frames is None:
+            rgb_frames = np.zeros((0, height, width, 3), dtype=np.uint8)
+        self.rgb_frames = rgb_frames  # (RGB frames, height, width, 3) uint8
+        # Frame index -> its slot in planes (indexed) or rgb_frames (RGB_FRAME)
+        self._slots = []
+        counts = {True: 0, False: 0}
+        for palette in frame_palette:
+            is_rgb = palette == RGB_FRAME
+            self._slots.append(counts[is_rgb])
+            counts[is_rgb] += 1
+        self.source = source
+        self._buffer = buffer  # Keeps the mmap alive while the arrays view it
+
+    def __len__(self):
+        return self.frame_count
+
+    @property
+    def nbytes(self):
+        return self.planes.nbytes + self.rgb_frames.nbytes + sum(p.nbytes for p in self.palettes)
+
+    def render_into(self, index, pixels):
+        """Expand frame `index` straight into `pixels`, a (height, width, 3) uint8 array."""
+        palette = self.frame_palette[index]
+        if palette == RGB_FRAME:
+            pixels[...] = self.rgb_frames[self._slots[index]]
+            return
+        np.take(self.palettes[palette], self.planes[self._slots[index]], axis=0, out=pixels, mode='clip')
+
+    def frame_rgb(self, index):
+        """Frame `index` as a (height, width, 3) uint8 array."""
+        palette = self.frame_palette[index]
+        if palette == RGB_FRAME:
+            return self.rgb_frames[self._slots[index]]
+        return self.palettes[palette][self.planes[self._slots[index]]]
+
+    def frame_bytes(self, index):
+        """Raw RGB bytes of frame `index`."""
+        return self.frame_rgb(index).tobytes()
+
+    def frame_image(self, index):
+        """Frame `index` as a PIL image."""
+        return Image.fromarray(self.frame_rgb(index), 'RGB')
+
+
+class ClipCompiler:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        # Source hashes memoized per (path, mtime, size): no rehash on every activation
+        self._hashes = {}
+        self._lock = threading.Lock()
+        self._remove_old_versions()
+
+    def load(self, filepath, size):
+        """
+        Compiled ClipData for `filepath` at `size` (width, height), compiling
+        it first if there is no valid cache entry. Returns None if the source
+        can't be decoded.
+        """
+        clip = self.lookup(filepath, size)
+        if clip is not None:
+            return clip
+
+        logger.info(f"Compiling clip {os.path.basename(filepath)} ({size[0]}x{size[1]})...")
+        try:
+            frames, durations_ms = decode_gif(filepath, size)
+        except Exception as e:
+            logger.error(f"Failed to decode clip {filepath}: {e}")
+            return None
+        return self.compile_frames(filepath, size, frames, durations_ms)
+
+    def lookup(self, filepath, size):
+        """ClipData from an existing valid cache file, or None (never compiles)."""
+        try:
+            digest = self.source_hash(filepath)
+        except OSError as e:
+            logger.error(f"Failed to read clip {filepath}: {e}")
+            return None
+        clip = self._open_cache(self.cache_path(digest, size), size, filepath)
+        if clip is not None:
+            logger.debug(f"Clip cache hit for {os.path.basename(filepath)}")
+        return clip
+
+    def compile_frames(self, filepath, size, frames, durations_ms):
+        """
+        Index, cache and load already-decoded RGB frames of `filepath`
+        (e.g. collected by a streaming clip). Returns ClipData or None.
+        """
+        if not frames:
+            logger.error(f"Clip {filepath} has no frames")
+            return None
+        try:
+            cache_path = self.cache_path(self.source_hash(filepath), size)
+        except OSError as e:
+            logger.error(f"Failed to read clip {filepath}: {e}")
+            return None
+
+        data = serialize_clip(size, *index_frames(frames, durations_ms, size))
+        if self._write_atomic(cache_path, data):
+            clip = self._open_cache(cache_path, size, filepath)
+            if clip is not None:
+                return clip
+
+        # Cache not writable (read-only data dir, disk full): serve from memory
+        return parse_clip(data, size, source=filepath)
+
+    def source_hash(self, filepath):
+        path = os.path.abspath(filepath)
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with self._lock:
+            self._hashes[path] = (key, digest)
+        if cached and cached[1] != digest:
+            # The source was edited or replaced: its old entries can never hit again
+            self._remove_entries(cached[1])
+        return digest
+
+    def forget(self, filepath):
+        """Delete the cache entries (all sizes) of a source that is about to be removed."""
+        path = os.path.abspath(filepath)
+        try:
+            digest = self.source_hash(path)
+        except OSError:
+            with self._lock:
+                cached = self._hashes.get(path)
+            digest = cached[1] if cached else None
+        with self._lock:
+            self._hashes.pop(path, None)
+        if digest:
+            self._remove_entries(digest)
+
+    def prune(self, source_paths):
+        """
+        Delete cache entries that none of `source_paths` (every current clip)
+        maps to. Hashes each source once (memoized for later loads). Returns
+        the number of files removed.
+        """
+        digests = set()
+        for filepath in source_paths:
+            try:
+                digests.add(self.source_hash(filepath))
+            except OSError:
+                pass
+        removed = 0
+        for cache_path in glob.glob(os.path.join(self.cache_dir, "*.clip")):
+            if os.path.basename(cache_path).split("_", 1)[0] not in digests:
+                removed += self._remove(cache_path)
+        if removed:
+            logger.info(f"Removed {removed} stale clip cache file(s)")
+        return removed
+
+    def _remove_old_versions(self):
+        # Files of an older CACHE_VERSION can never be read again (v1 stored raw RGB frames)
+        current = f".v{CACHE_VERSION}.clip"
+        stale = [path for path in glob.glob(os.path.join(self.cache_dir, "*.clip")) if not path.endswith(current)]
+        removed = sum(self._remove(path) for path in stale)
+        if removed:
+            logger.info(f"Removed {removed} clip cache file(s) from older cache versions")
+
+    def _remove_entries(self, digest):
+        with self._lock:
+            # Identical content under another name shares the entries
+            if any(entry[1] == digest for entry in self._hashes.values()):
+                return
+        for cache_path in glob.glob(os.path.join(self.cache_dir, f"{digest}_*.clip")):
+            self._remove(cache_path)
+
+    @staticmethod
+    def _remove(cache_path):
+        try:
+            os.remove(cache_path)
+            logger.debug(f"Removed clip cache {cache_path}")
+            return 1
+        except OSError as e:
+            logger.warning(f"Failed to remove clip cache {cache_path}: {e}")
+            return 0
+
+    def cache_path(self, digest, size):
+        return os.path.join(self.cache_dir, f"{digest}_{size[0]}x{size[1]}.v{CACHE_VERSION}.clip")
+
+    def _open_cache(self, cache_path, size, source):
+        try:
+            with open(cache_path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # Missing, or empty file (mmap refuses zero length)
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to open clip cache {cache_path}: {e}")
+            return None
+
+        try:
+            return parse_clip(buffer, size, source=source)
+        except (struct.error, ValueError) as e:
+            logger.warning(f"Discarding invalid clip cache {cache_path}: {e}")
+            buffer.close()
+            return None
+
+    def _write_atomic(self, cache_path, data):
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            os.chmod(tmp_path, 0o644)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, cache_path)
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to write clip cache {cache_path}: {e}")
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return False
+
+
+def decode_gif(filepath, size):
+    """
+    Decode a GIF into full RGB frames at `size`.
+    Returns (list of frame bytes, list of durations in ms).
+    """
+    frames = []
+    durations_ms = []
+    for frame, duration in iter_gif_frames(filepath, size):
+        frames.append(frame)
+        durations_ms.append(duration)
+    return frames, durations_ms
+
+
+def iter_gif_frames(filepath, size):
+    """Yield (RGB frame bytes at `size`, duration in ms) one frame at a time."""
+    with Image.open(filepath) as im:
+        # Some optimized GIFs store only the changed pixels on a transparent
+        # background: composite every frame onto a persistent canvas
+        canvas = Image.new('RGBA', im.size, (0, 0, 0, 0))
+        for frame in ImageSequence.Iterator(im):
+            frame_rgba = frame.convert('RGBA')
+            canvas.paste(frame_rgba, (0, 0), frame_rgba)
+
+            # Resize high quality, keeping 'canvas' at source resolution for the next frame
+            final_frame = canvas.resize(size, Image.Resampling.LANCZOS)
+
+            # Flatten alpha onto black (the matrix has no alpha)
+            bg = Image.new('RGB', size, (0, 0, 0))
+            bg.paste(final_frame, (0, 0), final_frame)
+
+            # Handle missing/invalid 0 duration
+            duration = frame.info.get('duration', DEFAULT_DURATION_MS) or DEFAULT_DURATION_MS
+            yield bg.tobytes(), int(duration)
+
+
+def index_frames(frames, durations_ms, size):
+    """
+    Convert full RGB frames to palette-indexed form, one frame at a time
+    (peak memory is the output plus a single frame's working arrays).
+
+    Runs of identical consecutive frames are merged into one frame with the
+    summed duration. Each frame with at most 256 colors gets an exact
+    palette (shared with earlier frames that have the same colors); a frame
+    with more stays in full RGB.
+    Returns (planes, palettes, frame_palette, durations_ms, rgb_frames).
+    """
+    width, height = size
+    planes = []
+    rgb_frames = []
+    palettes = []
+    palette_slots = {}  # palette bytes -> index in palettes
+    frame_palette = []
+    merged = []
+    previous = None
+    for frame, duration in zip(frames, durations_ms):
+        if previous is not None and frame == previous:
+            merged[-1] += duration
+            continue
+        previous = frame
+        merged.append(duration)
+
+        rgb = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 3)
+        # Pack each pixel into one uint32 so colors compare cheaply
+        packed = (rgb[..., 0].astype(np.uint32) << 16) | (rgb[..., 1].astype(np.uint32) << 8) | rgb[..., 2]
+        colors, inverse = np.unique(packed, return_inverse=True)
+        if len(colors) > MAX_COLORS or len(palettes) >= RGB_FRAME:
+            # Indexing would lose colors (or the palette table is full): keep it exact
+            frame_palette.append(RGB_FRAME)
+            rgb_frames.append(rgb)
+            continue
+
+        # Exact: the index plane is just each pixel's position in the frame's color table
+        palette = np.stack([(colors >> 16) & 0xFF, (colors >> 8) & 0xFF, colors & 0xFF], axis=1).astype(np.uint8)
+        key = palette.tobytes()
+        slot = palette_slots.get(key)
+        if slot is None:
+            slot = palette_slots[key] = len(palettes)
+            palettes.append(palette)
+        frame_palette.append(slot)
+        planes.append(inverse.reshape(height, width).astype(np.uint8))
+    return planes, palettes, frame_palette, merged, rgb_frames
+
+
+def serialize_clip(size, planes, palettes, frame_palette, durations_ms, rgb_frames=()):
+    pool_size = sum(len(p) for p in palettes)
+    parts = [
+        HEADER.pack(MAGIC, CACHE_VERSION, size[0], size[1], len(durations_ms), len(palettes), pool_size),
+        struct.pack(f'<{len(durations_ms)}I', *durations_ms),
+        struct.pack(f'<{len(frame_palette)}H', *frame_palette),
+    ]
+    start = 0
+    for palette in palettes:
+        parts.append(PALETTE_ENTRY.pack(start, len(palette)))
+        start += len(palette)
+    parts.extend(np.ascontiguousarray(p, dtype=np.uint8).tobytes() for p in palettes)
+    parts.extend(np.ascontiguousarray(plane, dtype=np.uint8).tobytes() for plane in planes)
+    parts.extend(np.ascontiguousarray(frame, dtype=np.uint8).tobytes() for frame in rgb_frames)
+    return b''.join(parts)
+
+
+def parse_clip(buffer, size, source=None):
+    """
+    ClipData viewing a serialized clip (bytes or mmap) without copying the
+    planes or palettes. Raises ValueError/struct.error if the data is invalid.
+    """
+    magic, version, width, height, frame_count, palette_count, pool_size = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != CACHE_VERSION:
+        raise ValueError("unknown format or version")
+    if (width, height) != tuple(size):
+        raise ValueError("size mismatch")
+    offset = HEADER.size
+    durations_ms = struct.unpack_from(f'<{frame_count}I', buffer, offset)
+    offset += 4 * frame_count
+    frame_palette = struct.unpack_from(f'<{frame_count}H', buffer, offset)
+    offset += 2 * frame_count
+    table = [PALETTE_ENTRY.unpack_from(buffer, offset + i * PALETTE_ENTRY.size) for i in range(palette_count)]
+    offset += PALETTE_ENTRY.size * palette_count
+    planes_offset = offset + pool_size * 3
+    rgb_count = sum(1 for p in frame_palette if p == RGB_FRAME)
+    indexed_count = frame_count - rgb_count
+    rgb_offset = planes_offset + indexed_count * width * height
+    # Validate everything before creating array views of the buffer
+    if len(buffer) != rgb_offset + rgb_count * width * height * 3:
+        raise ValueError("truncated or oversized file")
+    if frame_count == 0 or any(p >= palette_count and p != RGB_FRAME for p in frame_palette):
+        raise ValueError("invalid frame table")
+    if any(start + length > pool_size for start, length in table):
+        raise ValueError("invalid palette table")
+    pool = np.frombuffer(buffer, dtype=np.uint8, count=pool_size * 3, offset=offset).reshape(pool_size, 3)
+    planes = np.frombuffer(buffer, dtype=np.uint8, count=indexed_count * width * height, offset=planes_offset)
+    rgb_frames = np.frombuffer(buffer, dtype=np.uint8, count=rgb_count * width * height * 3, offset=rgb_offset)
+    palettes = [pool[start:start + length] for start, length in table]
+    return ClipData(
+        width, height, durations_ms, planes.reshape(indexed_count, height, width),
+        palettes, frame_palette, rgb_frames=rgb_frames.reshape(rgb_count, height, width, 3),
+        buffer=buffer, source=source,
+    )
@@ -1,90 +1,95 @@
 import os
 import logging
-from PIL import Image, ImageSequence
+import zipfile
+import threading
+from functools import partial
+from PIL import Image
 from app.core.base_scene import BaseScene
+from app.core.framebuffer import FrameBuffer
+from app.core.loaders.clip_compiler import ClipCompiler
+from app.core.loaders.clip_cache import ClipCache
+from app.core.loaders.clip_stream import StreamingClip, stream_threshold_bytes
+from app.core.loaders.zip_sequence import ZipSequence, READ_AHEAD_FRAMES
 
 logger = logging.getLogger(__name__)
 
 class GifScene(BaseScene):
-    def __init__(self, matrix, state_manager, filepath):
+    """
+    Plays a clip compiled by ClipCompiler: palette-indexed frames are read
+    straight from the memory-mapped cache file and expanded into the
+    framebuffer with one vectorized lookup per frame (frames with more than
+    256 colors are stored in RGB and copied as-is).
+    The ClipData comes from the shared ClipCache, so every scene (and every
+    playlist pass) playing the same clip uses the same frames.
+    
+    Large clips that aren't compiled yet play in streaming mode instead:
+    a StreamingClip decodes frames in the background, and once its first
+    loop has been compiled the scene switches to the cached ClipData.
+    """
+    
+    use_framebuffer = True
+    
+    def __init__(self, matrix, state_manager, filepath, cache=None, stream=None):
         super().__init__(matrix, state_manager)
         self.filepath = filepath
-        self.frames = []
+        self.clip = None
+        self.stream = None
         self.frame_durations = [] # in seconds
         self.total_duration = 0
         self.current_frame_index = 0
         self.elapsed_time = 0
         self.loaded = False
         
-        self._load_gif()
+        # Streaming mode: current decoded frame (rgb bytes) and its duration
+        self._stream_frame = None
+        self._stream_duration = 0
+        
+        self._load_gif(cache or get_clip_cache(), stream)
 
-    def _load_gif(self):
-        try:
-            with Image.open(self.filepath) as im:
-                # 1. Determine target size
-                target_size = (self.width, self.height)
-                
-                # 2. Iterate frames with persistent canvas for correct disposal/transparency
-                # Some optimized GIFs store only the changed pixels on a transparent background
-                # We interpret this by compositing onto a persistent canvas
-                
-                # Start with a black background or transparent? 
-                # For matrix, black (0,0,0) is usually best base.
-                canvas = Image.new('RGBA', im.size, (0, 0, 0, 0))
-                
-                for frame in ImageSequence.Iterator(im):
-                    # Handle Frame Disposal (Simplification: most modern GIFs usually work with simple over-composite)
-                    # Ideally we'd respect 'disposal' method from frame.info, but 
-                    # standard compositing works for 95% of 'optimized' GIFs.
-                    
-                    # Composite this frame onto persistent canvas
-                    # frame.convert('RGBA') ensures we handle transparency mask in frame
-                    frame_rgba = frame.convert('RGBA')
-                    
-                    # Paste current frame over canvas
-                    # If frame has transparency, it will show canvas underneath
-                    # Note: We create a NEW image for the step to avoid mutating previous frames in the list
-                    # if we were strictly following disposal logic, but here "canvas" tracks the state.
-                    
-                    # For simple "replace" vs "combine" disposal, proper logic is hard.
-                    # But Python's ImageSequence usually gives us the delta frame.
-                    # The robust way:
-                    # 1. Create copy of current canvas
-                    # 2. Paste new frame on top
-                    # 3. Use that as new canvas AND as the frame to append
-                    
-                    canvas.paste(frame_rgba, (0, 0), frame_rgba)
-                    
-                    # Now we have the full frame image in 'canvas'
-                    
-                    # 3. Resize High Quality
-                    # We must copy() because resize returns a new image, and we want to keep 'canvas' 
-                    # at original resolution for next frame composition
-                    final_frame = canvas.resize(target_size, Image.Resampling.LANCZOS)
-                    
-                    # 4. Convert to RGB (Matrix doesn't use Alpha)
-                    # Create black background to flatten alpha
-                    bg = Image.new('RGB', target_size, (0, 0, 0))
-                    bg.paste(final_frame, (0, 0), final_frame)
-                    
-                    self.frames.append(bg)
-                    
-                    # Duration
-                    duration = frame.info.get('duration', 100) # ms
-                    # Handle invalid 0 duration
-                    if duration == 0: duration = 100
-                    
-                    duration_sec = duration / 1000.0
-                    self.frame_durations.append(duration_sec)
-                    self.total_duration += duration_sec
-                
-                self.loaded = True
-                logger.info(f"Loaded GIF {os.path.basename(self.filepath)} with {len(self.frames)} frames using High-Quality render.")
-        except Exception as e:
-            logger.error(f"Failed to load GIF {self.filepath}: {e}")
+    def _load_gif(self, cache, stream):
+        size = (self.width, self.height)
+        if stream is None:
+            # Stream only big sources that would otherwise be decoded up front
+            try:
+                stream = os.path.getsize(self.filepath) >= stream_threshold_bytes()
+            except OSError:
+                stream = False
+        
+        # Decoding/compositing/resizing only happens the first time a clip is
+        # used at this size; afterwards this is a cache hit (or maps the cached frames).
+        # Streaming clips only check memory here: the stream thread checks the disk cache.
+        clip = cache.peek(self.filepath, size) if stream else cache.get(self.filepath, size)
+        if clip is not None:
+            self._use_clip(clip)
+        elif stream:
+            self.stream = StreamingClip(
+                self.filepath, size, cache=cache, collect_limit_bytes=_collect_limit_bytes(cache),
+            )
+            self.loaded = True
+            logger.info(f"Streaming GIF {os.path.basename(self.filepath)} while it compiles.")
+
+    def _use_clip(self, clip):
+        self.clip = clip
+        self.frame_durations = clip.durations
+        self.total_duration = clip.total_duration
+        self.current_frame_index = 0
+        self.loaded = True
+        logger.info(f"Loaded GIF {os.path.basename(self.filepath)} with {len(clip)} frames.")
+
+    def enter(self, state_manager):
+        if self.stream is not None:
+            self.stream.start()
+
+    def exit(self):
+        if self.stream is not None:
+            self.stream.stop()
 
     def update(self, dt):
-        if not self.loaded or not self.frames:
+        if not self.loaded:
+            return
+        
+        if self.stream is not None:
+            self._update_stream(dt)
             return
 
         self.elapsed_time += dt
@@ -94,14 +99,100 @@ class GifScene(BaseScene):
         
         if self.elapsed_time >= current_duration:
             self.elapsed_time -= current_duration
-            self.current_frame_index = (self.current_frame_index + 1) % len(self.frames)
+            self.current_frame_index = (self.current_frame_index + 1) % len(self.clip)
+
+    def _update_stream(self, dt):
+        stream = self.stream
+        stream.start()  # No-op once running; covers callers that skip enter()
+        self.elapsed_time += dt
+        if self._stream_frame is not None and self.elapsed_time < self._stream_duration:
+            return
+        
+        frame = stream.next_frame()
+        if frame is not None:
+            if self._stream_frame is not None:
+                self.elapsed_time -= self._stream_duration
+            else:
+                self.elapsed_time = 0
+            self._stream_frame, self._stream_duration = frame[0], frame[1] / 1000.0
+        elif stream.compiled is not None:
+            # First loop played out and compiled: continue from the cached clip at frame 0
+            self.stream = None
+            self._stream_frame = None
+            self.elapsed_time = 0
+            self._use_clip(stream.compiled)
+        # Otherwise the decoder is behind: keep showing the current frame
 
     def draw(self, canvas):
-        if not self.loaded or not self.frames:
+        if not self.loaded:
             return
-            
-        img = self.frames[self.current_frame_index]
-        canvas.SetImage(img)
+        
+        if self.stream is not None:
+            if self._stream_frame is None:
+                return
+            if isinstance(canvas, FrameBuffer):
+                canvas.buffer[:] = self._stream_frame
+            else:
+                canvas.SetImage(Image.frombytes('RGB', (self.width, self.height), self._stream_frame))
+            return
+        
+        if isinstance(canvas, FrameBuffer):
+            # Palette lookup from the mapped index plane directly into the framebuffer
+            self.clip.render_into(self.current_frame_index, canvas.pixels)
+        else:
+            canvas.SetImage(self.clip.frame_image(self.current_frame_index))
+
+
+class ImageSequenceScene(GifScene):
+    """
+    Plays a zipped image sequence (see zip_sequence). Frames are read from the
+    archive on demand by a StreamingClip whose ring is the read-ahead window;
+    sequences are never compiled, so they keep full colour at any length.
+    """
+
+    def _load_gif(self, cache, stream):
+        try:
+            sequence = ZipSequence(self.filepath)
+        except (OSError, zipfile.BadZipFile) as e:
+            logger.error(f"Failed to open image sequence {self.filepath}: {e}")
+            return
+        if not sequence.frames:
+            logger.error(f"Image sequence {self.filepath} has no frames")
+            return
+
+        self.stream = StreamingClip(
+            self.filepath, (self.width, self.height),
+            ring_frames=READ_AHEAD_FRAMES, frames=partial(sequence.iter_frames, (self.width, self.height)),
+        )
+        self.loaded = True
+        logger.info(f"Loaded image sequence {os.path.basename(self.filepath)} with {len(sequence)} frames.")
+
+
+def _collect_limit_bytes(cache):
+    """
+    How much RGB a streaming clip may hold while collecting its first loop:
+    enough for a clip that fits the cache budget (indexed frames are 1/3 the
+    size of RGB), but never more than a quarter of the available memory.
+    """
+    limit = cache.budget_bytes * 3
+    try:
+        import psutil
+        limit = min(limit, psutil.virtual_memory().available // 4)
+    except Exception:
+        pass
+    return limit
+
+
+_clip_cache = None
+_clip_cache_lock = threading.Lock()
+
+def get_clip_cache():
+    """The process-wide ClipCache (budget from MATRIX_CLIP_CACHE_MB)."""
+    global _clip_cache
+    with _clip_cache_lock:
+        if _clip_cache is None:
+            _clip_cache = ClipCache.from_env(ClipCompiler())
+        return _clip_cache
 
 
 class ClipLoader:
@@ -109,13 +200,24 @@ class ClipLoader:
         self.matrix = matrix
         self.state_manager = state_manager
         self.clips_dir = clips_dir
+        self.cache = get_clip_cache()
         
         if not os.path.exists(self.clips_dir):
             os.makedirs(self.clips_dir)
 
+    def start_cache_prune(self):
+        """Delete compiled cache files of clips that no longer exist, on a background thread."""
+        def prune():
+            sources = [os.path.join(self.clips_dir, f) for f in self.list_available_clips() if f.lower().endswith('.gif')]
+            try:
+                self.cache.compiler.prune(sources)
+            except Exception as e:
+                logger.error(f"Clip cache prune failed: {e}")
+        threading.Thread(target=prune, name="clip-cache-prune", daemon=True).start()
+
     def list_available_clips(self):
         # Scan for supported extensions
-        exts = ['.gif']
+        exts = ['.gif', '.zip']
         files = [f for f in os.listdir(self.clips_dir) if any(f.lower().endswith(ext) for ext in exts)]
         return files
 
@@ -125,9 +227,16 @@ class ClipLoader:
             return None
             
         if filename.lower().endswith('.gif'):
-            scene = GifScene(self.matrix, self.state_manager, filepath)
+            scene = GifScene(self.matrix, self.state_manager, filepath, self.cache)
             # Important: used by status UI + thumbnails lookup
             scene.filename = filename
             return scene
+
+        if filename.lower().endswith('.zip'):
+            scene = ImageSequenceScene(self.matrix, self.state_manager, filepath)
+            if not scene.loaded:
+                return None
+            scene.filename = filename
+            return scene
             
         return None
@@ -0,0 +1,127 @@
+import os
+import queue
+import logging
+import threading
+from functools import partial
+from app.core.loaders.clip_compiler import iter_gif_frames
+
+logger = logging.getLogger(__name__)
+
+STREAM_THRESHOLD_ENV = "MATRIX_CLIP_STREAM_MB"
+DEFAULT_STREAM_THRESHOLD_MB = 1.0
+DEFAULT_RING_FRAMES = 32
+
+
+def stream_threshold_bytes():
+    """Source size from which uncached clips stream instead of decoding up front (MATRIX_CLIP_STREAM_MB)."""
+    try:
+        threshold_mb = float(os.environ.get(STREAM_THRESHOLD_ENV, DEFAULT_STREAM_THRESHOLD_MB))
+    except ValueError:
+        threshold_mb = DEFAULT_STREAM_THRESHOLD_MB
+    return int(threshold_mb * 1024 * 1024)
+
+
+class StreamingClip:
+    """
+    Decodes a clip incrementally on a background thread into a bounded ring
+    of ready frames, so playback can start as soon as the first frame exists.
+
+    The thread first checks the on-disk clip cache (hashing a large source
+    can take a while, so that happens here and not on the caller's thread);
+    on a hit `compiled` is set straight away. Otherwise, during the first
+    loop the decoded frames are also collected. When the
+    loop completes they are handed to the ClipCache (compiled and cached),
+    and `compiled` is set so the scene can switch to the cached ClipData.
+    If collecting would exceed `collect_limit_bytes` (memory is tight, or the
+    clip is bigger than the cache budget) collection stops and the clip
+    simply keeps streaming, decoding the file again on every loop.
+
+    `frames` is a callable returning one loop's (rgb_bytes, duration_ms)
+    iterator (GIF decoding by default). Without a cache the clip streams
+    forever, e.g. zipped image sequences, which are never compiled.
+    """
+
+    def __init__(self, filepath, size, cache=None, ring_frames=DEFAULT_RING_FRAMES, collect_limit_bytes=None, frames=None):
+        self.filepath = filepath
+        self.size = size
+        self.cache = cache
+        self._frames = frames or partial(iter_gif_frames, filepath, size)
+        self.collect_limit_bytes = collect_limit_bytes
+        self.compiled = None  # ClipData once the first loop has been compiled
+        self.loops = 0
+        self.underruns = 0
+        self._ring = queue.Queue(maxsize=ring_frames)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name=f"clip-stream:{os.path.basename(self.filepath)}", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        # Unblock a decoder waiting for room in the ring
+        try:
+            while True:
+                self._ring.get_nowait()
+        except queue.Empty:
+            pass
+
+    def next_frame(self):
+        """Next decoded (rgb_bytes, duration_ms), or None if the decoder hasn't caught up."""
+        try:
+            return self._ring.get_nowait()
+        except queue.Empty:
+            self.underruns += 1
+            return None
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._ring.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        frame_size = self.size[0] * self.size[1] * 3
+        collect = self.cache is not None
+        frames, durations_ms = [], []
+        try:
+            if collect:
+                self.compiled = self.cache.get(self.filepath, self.size, compile=False)
+                if self.compiled is not None:
+                    return
+
+            while not self._stop.is_set():
+                count = 0
+                for frame, duration in self._frames():
+                    if collect:
+                        if self.collect_limit_bytes is not None and (len(frames) + 1) * frame_size > self.collect_limit_bytes:
+                            logger.info(f"Clip {os.path.basename(self.filepath)} too large to cache, streaming it")
+                            collect = False
+                            frames, durations_ms = [], []
+                        else:
+                            frames.append(frame)
+                            durations_ms.append(duration)
+                    if not self._put((frame, duration)):
+                        return
+                    count += 1
+                if count == 0:
+                    logger.error(f"Clip {self.filepath} has no frames")
+                    return
+                self.loops += 1
+
+                if collect:
+                    # First loop done: compile it so this (and every later) play comes from the cache
+                    self.compiled = self.cache.adopt(self.filepath, self.size, frames, durations_ms)
+                    frames, durations_ms = [], []
+                    if self.compiled is not None:
+                        return
+                    collect = False
+        except Exception as e:
+            logger.error(f"Streaming decode of {self.filepath} failed: {e}")
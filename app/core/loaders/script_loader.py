@@ -2,16 +2,29 @@ import importlib.util
 import os
 import sys
 import logging
+import time
 import inspect
+import threading
 from app.core.base_scene import BaseScene
+from app.core import scene_runtime
 
 logger = logging.getLogger(__name__)
 
 class ScriptLoader:
-    def __init__(self, matrix, state_manager, scripts_dir="scenes/scripts"):
+    def __init__(self, matrix, state_manager, scripts_dir="scenes/scripts", runtime=None):
         self.matrix = matrix
         self.state_manager = state_manager
         self.scripts_dir = scripts_dir
+        # "inprocess": scenes run in the render thread; "process": each in its own child process
+        self.runtime = runtime or scene_runtime.runtime_mode()
+        if self.runtime == scene_runtime.RUNTIME_PROCESS and not scene_runtime.process_runtime_available():
+            logger.warning("Process scene runtime unavailable (no shared memory support), running scenes in-process")
+            self.runtime = scene_runtime.RUNTIME_INPROCESS
+        # filename -> ((mtime_ns, size), scene class): compiled modules reused until the file changes
+        self._modules = {}
+        # filename -> last load/instantiation failure, cleared by a successful load
+        self._errors = {}
+        self._lock = threading.Lock()
         
         # Ensure directory exists
         if not os.path.exists(self.scripts_dir):
@@ -20,13 +33,34 @@ class ScriptLoader:
 
     def load_script(self, filename):
         """
-        Loads a python script and returns an instance of the class inheriting from BaseScene.
+        Loads a python script and returns the class inheriting from BaseScene.
+        Compiled modules are cached per (path, mtime, size): an unchanged
+        script is only executed once, an edited one is reloaded on next use.
         """
         file_path = os.path.join(self.scripts_dir, filename)
-        if not os.path.exists(file_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
             logger.error(f"Script file not found: {file_path}")
             return None
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            cached = self._modules.get(filename)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            error = self._errors.get(filename)
+            if error is not None and error["stamp"] == stamp:
+                # Same broken source as last time: don't re-execute it on every activation
+                return cached[1] if cached is not None else None
 
+        scene_class = self._compile(filename, file_path, stamp)
+        if scene_class is None and cached is not None:
+            logger.warning(f"Keeping previous version of {filename} until the error is fixed")
+            return cached[1]
+        return scene_class
+
+    def _compile(self, filename, file_path, stamp):
         module_name = filename.replace(".py", "")
         
         try:
@@ -39,30 +73,163 @@ class ScriptLoader:
             # Find the Scene class
             for name, obj in inspect.getmembers(module):
                 if inspect.isclass(obj) and issubclass(obj, BaseScene) and obj is not BaseScene:
+                    with self._lock:
+                        self._modules[filename] = (stamp, obj)
+                        self._errors.pop(filename, None)
                     return obj # Return the Class itself
             
             logger.warning(f"No subclass of BaseScene found in {filename}")
+            self._record_error(filename, stamp, "load", "No subclass of BaseScene found")
             return None
 
         except Exception as e:
             logger.exception(f"Failed to load script {filename}: {e}")
+            self._record_error(filename, stamp, "load", _describe_error(e))
             return None
 
+    def _record_error(self, filename, stamp, phase, message):
+        with self._lock:
+            self._errors[filename] = {"stamp": stamp, "phase": phase, "error": message, "time": time.time()}
+
     def get_scene(self, filename):
         """
         Instantiates a fresh scene object from the filename.
         """
+        if self.runtime == scene_runtime.RUNTIME_PROCESS:
+            return self._get_process_scene(filename)
+        return self._get_inprocess_scene(filename)
+
+    def _get_inprocess_scene(self, filename):
         SceneClass = self.load_script(filename)
         if SceneClass:
             try:
                 instance = SceneClass(self.matrix, self.state_manager)
                 instance.filename = filename
+                with self._lock:
+                    error = self._errors.get(filename)
+                    if error is not None and error["phase"] == "instantiate":
+                        del self._errors[filename]
                 return instance
             except Exception as e:
                  logger.error(f"Failed to instantiate {filename}: {e}")
+                 with self._lock:
+                     stamp = self._modules.get(filename, (None,))[0]
+                 self._record_error(filename, stamp, "instantiate", _describe_error(e))
                  return None
         return None
 
+    def _check_source(self, filename):
+        """
+        Process runtime: syntax-check a script without executing it (the child
+        process does that). Returns its (mtime_ns, size) stamp, or None if it
+        is missing or doesn't compile (error recorded).
+        """
+        file_path = os.path.join(self.scripts_dir, filename)
+        try:
+            st = os.stat(file_path)
+            with open(file_path, 'rb') as f:
+                source = f.read()
+        except OSError:
+            logger.error(f"Script file not found: {file_path}")
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        try:
+            compile(source, file_path, 'exec')
+        except (SyntaxError, ValueError) as e:
+            logger.error(f"Failed to load script {filename}: {e}")
+            self._record_error(filename, stamp, "load", _describe_error(e))
+            return None
+        return stamp
+
+    def _get_process_scene(self, filename):
+        stamp = self._check_source(filename)
+        if stamp is None:
+            return None
+        file_path = os.path.join(self.scripts_dir, filename)
+        on_error = lambda message: self._record_error(filename, stamp, "load", message)
+        try:
+            instance = scene_runtime.ProcessScene(self.matrix, self.state_manager, filename, file_path, on_error=on_error)
+        except Exception as e:
+            # Can't start a child (no /dev/shm, process limit, ...): run this one in-process
+            logger.error(f"Failed to start scene process for {filename}, running it in-process: {e}")
+            return self._get_inprocess_scene(filename)
+
+        # Wait for the child to import and construct the scene, so load errors
+        # surface here just like in-process (we're on an activation thread)
+        if not instance.wait_ready() and instance.error:
+            instance.exit()
+            return None
+        with self._lock:
+            self._errors.pop(filename, None)
+        instance.filename = filename
+        return instance
+
+    def get_load_errors(self):
+        """Scripts whose last load (or instantiation) failed: {filename: {phase, error, time}}."""
+        with self._lock:
+            return {
+                filename: {key: value for key, value in error.items() if key != "stamp"}
+                for filename, error in self._errors.items()
+            }
+
+    def invalidate(self, filename=None):
+        """Forget cached modules (one script, or all): the next load re-executes the source."""
+        with self._lock:
+            if filename is None:
+                self._modules.clear()
+                self._errors.clear()
+            else:
+                self._modules.pop(filename, None)
+                self._errors.pop(filename, None)
+
+    def on_file_changed(self, filename):
+        """
+        FileWatcher callback: reload a changed script right away (so errors are
+        reported without waiting for an activation) and hot-swap it if it is
+        the active scene. Deleted scripts are dropped from the cache.
+        """
+        if not filename.endswith(".py"):
+            return
+        file_path = os.path.join(self.scripts_dir, filename)
+        if not os.path.exists(file_path):
+            self.invalidate(filename)
+            logger.info(f"Script removed: {filename}")
+            return
+
+        if self.runtime == scene_runtime.RUNTIME_PROCESS:
+            # Nothing to compile here: restart the active scene's process on the new source
+            active = self.state_manager.get_active_scene()
+            if isinstance(active, scene_runtime.ProcessScene) and active.filename == filename:
+                scene = self.get_scene(filename)
+                if scene is not None:
+                    logger.info(f"Hot-swapping active scene {filename}")
+                    self.state_manager.request_scene(scene)
+            else:
+                self._check_source(filename)
+            return
+
+        with self._lock:
+            cached = self._modules.get(filename)
+        scene_class = self.load_script(filename)
+        if scene_class is None or (cached is not None and scene_class is cached[1]):
+            # Failed (error recorded, previous version kept) or unchanged
+            return
+        logger.info(f"Reloaded script {filename}")
+
+        active = self.state_manager.get_active_scene()
+        if cached is not None and type(active) is cached[1] and getattr(active, "filename", None) == filename:
+            scene = self.get_scene(filename)
+            if scene is not None:
+                logger.info(f"Hot-swapping active scene {filename}")
+                self.state_manager.request_scene(scene)
+
     def list_available_scripts(self):
         files = [f for f in os.listdir(self.scripts_dir) if f.endswith(".py")]
         return files
+
+
+def _describe_error(e):
+    """One-line error description, with the line number for syntax errors."""
+    if isinstance(e, SyntaxError) and e.lineno:
+        return f"{type(e).__name__}: {e.msg} (line {e.lineno})"
+    return f"{type(e).__name__}: {e}"
@@ -0,0 +1,148 @@
+"""
+Zipped image-sequence clips.
+
+A .zip of PNG/JPEG (or any other Pillow-readable) frames plays as a clip.
+Frames are full images, read and decoded straight from the archive one at
+a time; nothing is unpacked to disk and only the read-ahead window of the
+playing StreamingClip is held in memory. Unlike GIFs, frames keep their
+full colour (no 256-colour palette).
+
+Without a manifest, every image in the archive is a frame, in natural
+filename order (frame2.png before frame10.png), each shown for
+DEFAULT_DURATION_MS. An optional manifest.json at the archive root
+overrides that:
+
+    {
+        "fps": 30,                      # or "duration_ms": 33, default for every frame
+        "frames": [                     # optional explicit order (and per-frame timing)
+            "intro.png",
+            {"file": "hold.png", "duration_ms": 500}
+        ]
+    }
+"""
+import io
+import contextlib
+import os
+import re
+import json
+import zipfile
+import logging
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+DEFAULT_DURATION_MS = 100
+READ_AHEAD_FRAMES = 16
+# Refuse absurd members (a "frame" this large is not meant for a 64x64 matrix)
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+
+class ZipSequence:
+    """The frame list (member names and durations) of a zipped image sequence."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.frames = []  # [(member name, duration_ms)]
+        with zipfile.ZipFile(filepath) as archive:
+            self._read_index(archive)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _read_index(self, archive):
+        members = {
+            info.filename: info for info in archive.infolist()
+            if not info.is_dir() and _is_frame_name(info.filename)
+        }
+
+        manifest = {}
+        if MANIFEST_NAME in archive.namelist():
+            try:
+                manifest = json.loads(archive.read(MANIFEST_NAME))
+                if not isinstance(manifest, dict):
+                    raise ValueError("manifest must be a JSON object")
+            except ValueError as e:
+                logger.warning(f"Ignoring invalid {MANIFEST_NAME} in {os.path.basename(self.filepath)}: {e}")
+                manifest = {}
+
+        default_ms = _default_duration(manifest)
+        entries = manifest.get("frames")
+        if isinstance(entries, list):
+            for entry in entries:
+                name, duration = entry, default_ms
+                if isinstance(entry, dict):
+                    name = entry.get("file")
+                    duration = _positive_int(entry.get("duration_ms"), default_ms)
+                if not isinstance(name, str) or name not in members:
+                    logger.warning(f"Manifest frame {name!r} not found in {os.path.basename(self.filepath)}")
+                    continue
+                self.frames.append((name, duration))
+        else:
+            for name in sorted(members, key=_natural_key):
+                self.frames.append((name, default_ms))
+
+        oversized = [name for name, _ in self.frames if members[name].file_size > MAX_FRAME_BYTES]
+        if oversized:
+            logger.warning(f"Skipping {len(oversized)} oversized frames in {os.path.basename(self.filepath)}")
+            self.frames = [frame for frame in self.frames if frame[0] not in oversized]
+
+    def iter_frames(self, size):
+        """Yield (RGB frame bytes at `size`, duration in ms), reading each frame from the archive on demand."""
+        with zipfile.ZipFile(self.filepath) as archive:
+            for name, duration in self.frames:
+                try:
+                    data = archive.read(name)
+                    yield _decode_frame(data, size), duration
+                except Exception as e:
+                    # One corrupt frame shouldn't stop the clip
+                    logger.warning(f"Skipping frame {name} of {os.path.basename(self.filepath)}: {e}")
+
+    def first_frame(self, size):
+        """The first frame as a PIL image at `size` (thumbnails), or None."""
+        # closing(): returning mid-iteration must still close the generator's archive
+        with contextlib.closing(self.iter_frames(size)) as frames:
+            for frame, _ in frames:
+                return Image.frombytes('RGB', size, frame)
+        return None
+
+
+def _decode_frame(data, size):
+    with Image.open(io.BytesIO(data)) as im:
+        # JPEG can decode at a reduced scale directly, much cheaper than a full decode + resize
+        im.draft('RGB', size)
+        frame = im.convert('RGBA')
+    if frame.size != size:
+        frame = frame.resize(size, Image.Resampling.LANCZOS)
+    # Flatten alpha onto black (the matrix has no alpha)
+    bg = Image.new('RGB', size, (0, 0, 0))
+    bg.paste(frame, (0, 0), frame)
+    return bg.tobytes()
+
+
+def _is_frame_name(name):
+    base = os.path.basename(name)
+    # Skip macOS resource forks and hidden files
+    if name.startswith('__MACOSX/') or base.startswith('.'):
+        return False
+    return base.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def _default_duration(manifest):
+    fps = manifest.get("fps")
+    if isinstance(fps, (int, float)) and fps > 0:
+        return max(1, round(1000 / fps))
+    return _positive_int(manifest.get("duration_ms"), DEFAULT_DURATION_MS)
@@ -1,29 +1,64 @@
 import logging
+import os
 import sys
 import threading
 from PIL import Image
+from app.core.framebuffer import FrameBuffer
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Try to import the real hardware library
-try:
-    from rgbmatrix import RGBMatrix, RGBMatrixOptions
-    from rgbmatrix import graphics
-    EMULATED = False
-    logger.info("Loaded real rgbmatrix hardware driver.")
-except ImportError:
+# Backend selection: "auto" (hardware, then emulator), "hardware", "emulator" or "null"
+BACKEND_ENV = "MATRIX_BACKEND"
+BACKENDS = ("auto", "hardware", "emulator", "null")
+
+
+def _load_backend(name):
+    """
+    Import the requested matrix backend.
+    Returns (backend_name, RGBMatrix, RGBMatrixOptions, graphics).
+    """
+    if name == "null":
+        from app.core.null_matrix import NullMatrix, NullMatrixOptions, graphics
+        logger.info("Loaded null (in-memory) matrix backend.")
+        return "null", NullMatrix, NullMatrixOptions, graphics
+
+    if name in ("auto", "hardware"):
+        # Try to import the real hardware library
+        try:
+            from rgbmatrix import RGBMatrix, RGBMatrixOptions
+            from rgbmatrix import graphics
+            logger.info("Loaded real rgbmatrix hardware driver.")
+            return "hardware", RGBMatrix, RGBMatrixOptions, graphics
+        except ImportError:
+            if name == "hardware":
+                raise
+            
     # Fallback to the emulator
     try:
         from RGBMatrixEmulator import RGBMatrix, RGBMatrixOptions, graphics
-        EMULATED = True
-        logger.warning("rgbmatrix not found. Loaded RGBMatrixEmulator.")
     except ImportError:
-        logger.error("Neither rgbmatrix nor RGBMatrixEmulator found. Exiting.")
-        sys.exit(1)
+        if name == "emulator":
+            raise
+        raise ImportError("Neither rgbmatrix nor RGBMatrixEmulator found")
+    if name == "auto":
+        logger.warning("rgbmatrix not found. Loaded RGBMatrixEmulator.")
+    return "emulator", RGBMatrix, RGBMatrixOptions, graphics
+
 
 class MatrixDriver:
-    def __init__(self, width=64, height=64, chain=1, parallel=1, brightness=100):
+    def __init__(self, width=64, height=64, chain=1, parallel=1, brightness=100, backend=None):
+        backend = (backend or os.environ.get(BACKEND_ENV, "auto")).strip().lower()
+        if backend not in BACKENDS:
+            logger.warning(f"Unknown {BACKEND_ENV} '{backend}', using auto-detection.")
+            backend = "auto"
+        try:
+            self.backend, RGBMatrix, RGBMatrixOptions, self.graphics = _load_backend(backend)
+        except ImportError as e:
+            logger.error(f"Failed to load matrix backend '{backend}': {e}. "
+                         f"Set {BACKEND_ENV}=null to run without matrix hardware. Exiting.")
+            sys.exit(1)
+        
         self.options = RGBMatrixOptions()
         self.options.rows = height
         self.options.cols = width
@@ -78,6 +113,15 @@ class MatrixDriver:
         # Wrap canvas to intercept SetImage calls
         self._canvas = self._CanvasWrapper(self._raw_canvas, self)
         
+        # NumPy-backed framebuffer for scenes that opt in (use_framebuffer = True).
+        # In framebuffer mode, `canvas` returns the FrameBuffer and swap_canvas()
+        # pushes it to the hardware canvas with a single SetImage call.
+        self.framebuffer = FrameBuffer(self.width, self.height)
+        self._framebuffer_mode = False
+        
+        # Pixel batching: the canvas wrapper records into the same framebuffer (batch_pixels = True)
+        self._batching = False
+        
     @property
     def width(self):
         return self.matrix.width
@@ -88,63 +132,115 @@ class MatrixDriver:
         
     @property
     def canvas(self):
-        """Exposes the current canvas for drawing."""
+        """Exposes the current canvas for drawing (the FrameBuffer in framebuffer mode)."""
+        if self._framebuffer_mode:
+            return self.framebuffer
         return self._canvas
     
+    @property
+    def framebuffer_mode(self):
+        return self._framebuffer_mode
+    
+    def set_framebuffer_mode(self, enabled):
+        """
+        Switch between drawing on the hardware canvas and drawing into the framebuffer.
+        Called by the engine each frame based on the active scene's use_framebuffer flag.
+        """
+        self._framebuffer_mode = bool(enabled)
+    
+    @property
+    def pixel_batching(self):
+        return self._batching
+    
+    def set_pixel_batching(self, enabled):
+        """
+        Record SetPixel/Fill/Clear/SetImage calls on the canvas into the framebuffer
+        instead of forwarding each one to the C extension; swap_canvas() flushes the
+        frame with a single SetImage. Called by the engine each frame based on the
+        active scene's batch_pixels flag.
+        """
+        enabled = bool(enabled)
+        if enabled != self._batching:
+            self._batching = enabled
+            self._canvas = self._CanvasWrapper(self._raw_canvas, self, self.framebuffer if enabled else None)
+    
     class _CanvasWrapper:
-        """Wrapper around the real canvas that intercepts drawing calls to update shadow buffer."""
-        def __init__(self, real_canvas, matrix_driver):
+        """
+        Wrapper around the real canvas handed to scenes.
+        
+        The hot drawing calls are bound directly as instance attributes, so a
+        SetPixel costs the same as calling the real canvas (no per-call proxy
+        dispatch). SetImage is intercepted to keep the shadow buffer for preview
+        capture. When a framebuffer is given (pixel batching), SetPixel/Fill/
+        Clear/SetImage are recorded into it instead of reaching the hardware canvas.
+        Everything else is delegated to the real canvas.
+        """
+        _OWN_ATTRIBUTES = ('_real_canvas', '_matrix_driver', 'SetPixel', 'Fill', 'Clear', 'SetImage')
+        
+        def __init__(self, real_canvas, matrix_driver, framebuffer=None):
             object.__setattr__(self, '_real_canvas', real_canvas)
             object.__setattr__(self, '_matrix_driver', matrix_driver)
+            if framebuffer is not None:
+                target = framebuffer
+                object.__setattr__(self, 'SetImage', framebuffer.SetImage)
+            else:
+                target = real_canvas
+            for name in ('SetPixel', 'Fill', 'Clear'):
+                method = getattr(target, name, None)
+                if method is not None:
+                    object.__setattr__(self, name, method)
         
-        def __getattribute__(self, name):
-            # Handle our own attributes and intercepted methods
-            # NOTE: We only intercept SetImage now. Others delegate to real canvas.
-            if name in ('_real_canvas', '_matrix_driver', 'SetImage'):
-                return object.__getattribute__(self, name)
-            
-            # For all other attributes, delegate to real canvas
-            real_canvas = object.__getattribute__(self, '_real_canvas')
-            return getattr(real_canvas, name)
+        def __getattr__(self, name):
+            # Only called for attributes not found on the wrapper: delegate to real canvas
+            return getattr(object.__getattribute__(self, '_real_canvas'), name)
+        
+        def __setattr__(self, name, value):
+            if name in self._OWN_ATTRIBUTES:
+                object.__setattr__(self, name, value)
+            else:
+                setattr(self._real_canvas, name, value)
         
         def SetImage(self, img, *args, **kwargs):
             """Intercept SetImage to update shadow buffer."""
-            real_canvas = object.__getattribute__(self, '_real_canvas')
-            matrix_driver = object.__getattribute__(self, '_matrix_driver')
-            result = real_canvas.SetImage(img, *args, **kwargs)
+            result = self._real_canvas.SetImage(img, *args, **kwargs)
             # Only update shadow buffer if we are actually tracking it (optimization)
             # For now, we update it because SetImage is usually once per frame
-            matrix_driver.update_shadow_from_image(img)
+            self._matrix_driver.update_shadow_from_image(img)
             return result
         
-        # NOTE: We do NOT intercept SetPixel, Fill, or Clear anymore.
+        # NOTE: Without batching we do NOT intercept SetPixel, Fill, or Clear.
         # The overhead of a Python function call + lock + PIL update PER PIXEL is too high (kills FPS).
         # Scenes using SetPixel will rely on valid canvas readback or might not show in preview perfectly.
+        # Scenes that set batch_pixels = True get an exact preview from the framebuffer instead.
 
 
     def clear(self):
         """Clears the current canvas."""
-        self._canvas.Clear()  # Wrapper handles shadow buffer update
+        self.canvas.Clear()  # Wrapper handles shadow buffer update
 
     def fill(self, r, g, b):
         """Fills the entire canvas with a solid color."""
-        self._canvas.Fill(r, g, b)  # Wrapper handles shadow buffer update
+        self.canvas.Fill(r, g, b)  # Wrapper handles shadow buffer update
 
     def set_pixel(self, x, y, r, g, b):
         """Sets a single pixel on the canvas."""
-        self._canvas.SetPixel(x, y, r, g, b)  # Wrapper handles shadow buffer update
+        self.canvas.SetPixel(x, y, r, g, b)  # Wrapper handles shadow buffer update
 
     def draw_text(self, font, x, y, color, text):
         """Helper to draw text using the graphics module."""
         # Note: graphics.DrawText draws directly to the canvas
-        return graphics.DrawText(self._canvas, font, x, y, color, text)
+        return self.graphics.DrawText(self._canvas, font, x, y, color, text)
 
     def swap_canvas(self):
         """Updates the display with the current canvas and returns a new one."""
+        if self._framebuffer_mode or self._batching:
+            # Single bulk flush of the whole frame
+            self._raw_canvas.SetImage(self.framebuffer.as_image())
+        
         # Swap the underlying raw canvas
         self._raw_canvas = self.matrix.SwapOnVSync(self._raw_canvas)
         # Re-wrap the new canvas
-        self._canvas = self._CanvasWrapper(self._raw_canvas, self)
+        self._canvas = self._CanvasWrapper(self._raw_canvas, self, self.framebuffer if self._batching else None)
         return self._canvas
     
     def set_brightness(self, brightness):
@@ -197,6 +293,11 @@ class MatrixDriver:
         Returns a PIL Image object (64x64 RGB) or None if capture fails.
         """
         try:
+            # The framebuffer is authoritative whenever the scene draws into it
+            # (directly or through pixel batching): no GetPixel readback needed
+            if self._framebuffer_mode or self._batching:
+                return self.framebuffer.to_image()
+            
             # First, check if the shadow buffer is actively being updated (e.g. by SetImage)
             # We can't know for sure, but we can assume if it's not black, it's valid.
             # However, with SetPixel changes, the shadow buffer might stay black or stale.
@@ -250,6 +351,21 @@ class MatrixDriver:
             logger.error(f"Error capturing frame: {e}")
             return None
     
+    def capture_raw(self):
+        """
+        Capture the current canvas as raw RGB bytes (width * height * 3), or None.
+        Cheap when the scene draws into the framebuffer (a single bytes copy);
+        otherwise falls back to capture_frame().
+        """
+        if self._framebuffer_mode or self._batching:
+            return self.framebuffer.tobytes()
+        img = self.capture_frame()
+        if img is None:
+            return None
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return img.tobytes()
+    
     def update_shadow_from_image(self, img):
         """
         Update the shadow buffer from a PIL Image (used by SetImage calls).
@@ -0,0 +1,157 @@
+"""
+Null (in-memory) matrix backend.
+
+Implements the subset of the hzeller rgbmatrix API that MatrixDriver and the
+scenes use, storing each canvas in a preallocated bytearray. Nothing is
+displayed, so there is no rendering or event-loop overhead: use it for
+benchmarks, tests and headless verification (MATRIX_BACKEND=null).
+"""
+import logging
+from types import SimpleNamespace
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class NullMatrixOptions:
+    """Attribute bag mirroring RGBMatrixOptions. Only the geometry is used."""
+
+    def __init__(self):
+        self.rows = 32
+        self.cols = 32
+        self.chain_length = 1
+        self.parallel = 1
+        self.brightness = 100
+
+
+class NullCanvas:
+    """Frame canvas backed by a preallocated RGB bytearray (row-major, 3 bytes per pixel)."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.brightness = 100
+        self.buffer = bytearray(width * height * 3)
+        self._black = bytes(len(self.buffer))
+
+    def SetPixel(self, x, y, r, g, b):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = (y * self.width + x) * 3
+            buffer = self.buffer
+            try:
+                buffer[i] = r
+                buffer[i + 1] = g
+                buffer[i + 2] = b
+            except (ValueError, TypeError):
+                # Out-of-range or float components: clamp like the hardware bindings and FrameBuffer
+                buffer[i] = _clamp(r)
+                buffer[i + 1] = _clamp(g)
+                buffer[i + 2] = _clamp(b)
+
+    def GetPixel(self, x, y):
+        i = (y * self.width + x) * 3
+        return tuple(self.buffer[i:i + 3])
+
+    def Fill(self, r, g, b):
+        self.buffer[:] = bytes((_clamp(r), _clamp(g), _clamp(b))) * (self.width * self.height)
+
+    def Clear(self):
+        self.buffer[:] = self._black
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        # Fast path: full-frame image, one memcpy
+        if image.size == (self.width, self.height) and offset_x == 0 and offset_y == 0:
+            self.buffer[:] = image.tobytes()
+            return
+
+        # General path: clip to the canvas and copy row by row
+        left = max(0, -offset_x)
+        top = max(0, -offset_y)
+        right = min(image.width, self.width - offset_x)
+        bottom = min(image.height, self.height - offset_y)
+        if right <= left or bottom <= top:
+            return
+        data = image.crop((left, top, right, bottom)).tobytes()
+        row_bytes = (right - left) * 3
+        for row in range(bottom - top):
+            dst = ((offset_y + top + row) * self.width + offset_x + left) * 3
+            self.buffer[dst:dst + row_bytes] = data[row * row_bytes:(row + 1) * row_bytes]
+
+    def ToImage(self):
+        return Image.frombytes('RGB', (self.width, self.height), bytes(self.buffer))
+
+
+class NullMatrix:
+    """Stand-in for rgbmatrix.RGBMatrix with double-buffered in-memory canvases."""
+
+    def __init__(self, options=None):
+        options = options or NullMatrixOptions()
+        self.width = options.cols * options.chain_length
+        self.height = options.rows * options.parallel
+        self.brightness = getattr(options, "brightness", 100)
+        self.frames_swapped = 0
+
+        # The canvas currently "on screen"
+        self._front = NullCanvas(self.width, self.height)
+
+    def CreateFrameCanvas(self):
+        return NullCanvas(self.width, self.height)
+
+    def SwapOnVSync(self, canvas, framerate_fraction=1):
+        """Show `canvas` and hand back the previously displayed one for reuse."""
+        previous = self._front
+        self._front = canvas
+        self.frames_swapped += 1
+        return previous
+
+    def SetPixel(self, x, y, r, g, b):
+        self._front.SetPixel(x, y, r, g, b)
+
+    def Fill(self, r, g, b):
+        self._front.Fill(r, g, b)
+
+    def Clear(self):
+        self._front.Clear()
+
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        self._front.SetImage(image, offset_x, offset_y, unsafe)
+
+    def get_displayed_frame(self):
+        """Bytes of the frame currently 'on screen' (for tests and verification)."""
+        return bytes(self._front.buffer)
+
+
+class _Color:
+    def __init__(self, red=0, green=0, blue=0):
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+
+class _Font:
+    def __init__(self):
+        self.height = 0
+        self.baseline = 0
+
+    def LoadFont(self, path):
+        pass
+
+    def CharacterWidth(self, char):
+        return 0
+
+
+# Text and shape helpers are no-ops: nothing is displayed on this backend
+graphics = SimpleNamespace(
+    Color=_Color,
+    Font=_Font,
+    DrawText=lambda canvas, font, x, y, color, text: 0,
+    DrawLine=lambda canvas, x1, y1, x2, y2, color: None,
+    DrawCircle=lambda canvas, x, y, r, color: None,
+)
+
+
+def _clamp(value):
+    return max(0, min(255, int(value)))
@@ -1,6 +1,7 @@
 import json
 import os
 import logging
+import numpy as np
 from app.utils.file_ops import FileOps
 
 logger = logging.getLogger(__name__)
@@ -51,19 +52,80 @@ DEFAULT_PALETTES = {
     }
 }
 
+def parse_hex_colors(hex_colors):
+    """["#RRGGBB", ...] -> [(r, g, b), ...], skipping malformed entries."""
+    colors = []
+    for hex_color in hex_colors:
+        try:
+            value = hex_color.lstrip("#")
+            colors.append((int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)))
+        except (ValueError, IndexError, AttributeError):
+            logger.warning(f"Invalid color format in palette: {hex_color}")
+    return colors
+
+
+class PaletteLUT:
+    """
+    A palette compiled into gradient lookup tables: entry i of an N-entry
+    table is the palette colour at i / (N - 1), interpolated linearly
+    between the evenly spaced colour stops. Tables are built on first use
+    per size and are read-only; map a scalar field in 0..1 to colours with
+    one lookup (see map()).
+    """
+
+    def __init__(self, palette_id, colors, version):
+        self.palette_id = palette_id
+        self.colors = colors    # [(r, g, b)] stops, parsed once
+        self.version = version  # PaletteManager.version this was compiled from
+        self._arrays = {}
+        self._bytes = {}
+
+    def array(self, size=256):
+        """(size, 3) uint8 table."""
+        table = self._arrays.get(size)
+        if table is None:
+            stops = np.asarray(self.colors, dtype=np.float64)
+            positions = np.linspace(0.0, 1.0, len(stops)) if len(stops) > 1 else np.zeros(1)
+            x = np.linspace(0.0, 1.0, size)
+            table = np.empty((size, 3), dtype=np.uint8)
+            for channel in range(3):
+                table[:, channel] = np.rint(np.interp(x, positions, stops[:, channel]))
+            table.flags.writeable = False
+            self._arrays[size] = table
+        return table
+
+    def bytes(self, size=256):
+        """The same table as packed RGB bytes (3 * size)."""
+        data = self._bytes.get(size)
+        if data is None:
+            data = self._bytes[size] = self.array(size).tobytes()
+        return data
+
+    def map(self, values, size=256, out=None):
+        """Colours for `values` (array of floats in 0..1, clipped): shape values.shape + (3,)."""
+        table = self.array(size)
+        index = np.clip(values, 0.0, 1.0) * (size - 1) + 0.5
+        return np.take(table, index.astype(np.intp), axis=0, out=out)
+
+
 class PaletteManager:
     def __init__(self):
         self.custom_palettes = {}
+        # Bumped on every palette change: compiled LUTs of an older version are stale
+        self.version = 0
+        self._luts = {}
         self.load_palettes()
 
     def load_palettes(self):
         """Load custom palettes from disk."""
         self.custom_palettes = FileOps.load_json(DATA_FILE, {})
+        self._invalidate()
         logger.info(f"Loaded {len(self.custom_palettes)} custom palettes")
 
     def save_palettes(self):
         """Save custom palettes to disk."""
         try:
+            # Written synchronously: scene processes reload palettes from disk
             FileOps.save_json(DATA_FILE, self.custom_palettes)
         except Exception as e:
             logger.error(f"Failed to save palettes: {e}")
@@ -89,6 +151,23 @@ class PaletteManager:
             return DEFAULT_PALETTES[palette_id]
         return self.custom_palettes.get(palette_id)
 
+    def get_lut(self, palette_id):
+        """The compiled PaletteLUT for a palette (cached until palettes change), or None."""
+        luts = self._luts
+        lut = luts.get(palette_id)
+        if lut is None:
+            palette = self.get_palette(palette_id)
+            colors = parse_hex_colors(palette.get("colors", [])) if palette else []
+            if not colors:
+                return None
+            lut = luts[palette_id] = PaletteLUT(palette_id, colors, self.version)
+        return lut
+
+    def _invalidate(self):
+        # Swap in a fresh cache (readers holding the old dict never see it half-cleared)
+        self.version += 1
+        self._luts = {}
+
     def save_palette(self, palette_id, data):
         """Create or update a custom palette."""
         # Ensure ID in data matches
@@ -108,6 +187,7 @@ class PaletteManager:
                 raise ValueError(f"Invalid color format: {color}. Colors must be hex strings (e.g., #FF0000)")
         
         self.custom_palettes[palette_id] = data
+        self._invalidate()
         self.save_palettes()
         return data
 
@@ -118,6 +198,7 @@ class PaletteManager:
         
         if palette_id in self.custom_palettes:
             del self.custom_palettes[palette_id]
+            self._invalidate()
             self.save_palettes()
             return True
         return False
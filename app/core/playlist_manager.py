@@ -20,7 +20,7 @@ class PlaylistManager:
     def save_playlists(self):
         """Save playlists to disk."""
         try:
-            FileOps.save_json(DATA_FILE, self.playlists)
+            FileOps.schedule_save_json(DATA_FILE, self.playlists)
         except Exception as e:
             logger.error(f"Failed to save playlists: {e}")
 
@@ -0,0 +1,214 @@
+import io
+import time
+import logging
+import threading
+from PIL import Image
+from app.core.preview_stream import StreamFrame
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewEncoder:
+    """
+    Encodes preview frames off the render thread.
+
+    The render thread only hands over raw RGB bytes tagged with its frame
+    sequence number (submit()), and only when wants_frame() says someone is
+    watching. A background thread turns the latest raw frame into an
+    upscaled PNG. Consumers call get_png(); each call keeps the preview
+    "watched" for `idle_timeout` seconds, after which the render thread stops
+    handing frames over and the encoder goes idle.
+
+    Streaming clients subscribe() instead: while any are connected, every
+    rendered frame is handed over and fanned out to them as a StreamFrame.
+    """
+
+    def __init__(self, width, height, scale=4, interval=0.2, idle_timeout=2.0):
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.interval = interval  # Min seconds between handoffs (5 FPS default)
+        self.idle_timeout = idle_timeout
+
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        # Latest raw frame from the render thread
+        self._raw_seq = None
+        self._raw = None
+        self._last_submit = 0.0
+
+        # Latest encoded frame, plus the seqs the encoder has picked up / finished
+        # (a frame that fails to encode still counts as done)
+        self._png_seq = None
+        self._png = None
+        self._attempted_seq = None
+        self._done_seq = None
+
+        # Consumers: preview is watched until this monotonic time
+        self._watched_until = 0.0
+
+        # Streaming clients (copy-on-write tuple, read lock-free by the render thread)
+        self._subscribers = ()
+        self._last_stream_seq = None
+        self._last_stream_raw = None
+
+        self.frames_submitted = 0
+        self.frames_encoded = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="preview-encoder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    # --- Render thread side -------------------------------------------------
+
+    def wants_frame(self, now):
+        """Cheap check for the render thread: is a handoff due at monotonic time `now`?"""
+        if self._subscribers:
+            # Streaming runs at the full engine frame rate
+            return True
+        return now < self._watched_until and now - self._last_submit >= self.interval
+
+    def submit(self, seq, raw, now=None):
+        """Hand over a raw RGB frame (bytes, width*height*3). Never blocks on encoding."""
+        with self._cond:
+            self._raw_seq = seq
+            self._raw = raw
+            self._last_submit = time.monotonic() if now is None else now
+            self.frames_submitted += 1
+            self._cond.notify_all()
+
+    # --- Consumer side ------------------------------------------------------
+
+    def request(self):
+        """Mark the preview as watched so the render thread starts handing frames over."""
+        until = time.monotonic() + self.idle_timeout
+        if until > self._watched_until:
+            self._watched_until = until
+
+    def get_png(self, wait=0.0):
+        """
+        Latest preview as (seq, png_bytes), or (None, None) if no frame is available.
+        With wait > 0, blocks up to `wait` seconds until the latest handed-over
+        frame is encoded. If the preview was idle, the frame left over from the
+        last watch is stale, so it waits for a newer one.
+        """
+        was_idle = time.monotonic() >= self._watched_until
+        self.request()
+        with self._cond:
+            if wait > 0:
+                min_seq = (self._raw_seq or 0) + 1 if was_idle else None
+                deadline = time.monotonic() + wait
+                while self._running and self._pending(min_seq):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            return self._png_seq, self._png
+
+    def _pending(self, min_seq):
+        if self._raw is None or self._done_seq != self._raw_seq:
+            return True
+        return min_seq is not None and self._done_seq < min_seq
+
+    def subscribe(self, subscriber):
+        """Register a StreamSubscriber; it gets every frame until unsubscribe()."""
+        with self._cond:
+            self._subscribers = self._subscribers + (subscriber,)
+        logger.info(f"Preview stream client connected ({subscriber.kind}, {len(self._subscribers)} total)")
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber (idempotent)."""
+        subscriber.close()
+        with self._cond:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+            if not self._subscribers:
+                # Next client starts from a keyframe; drop the reference to the old frame
+                self._last_stream_seq = None
+                self._last_stream_raw = None
+        logger.info(f"Preview stream client disconnected ({len(self._subscribers)} left)")
+
+    def get_raw(self):
+        """Latest raw frame as (seq, bytes), or (None, None)."""
+        with self._cond:
+            return self._raw_seq, self._raw
+
+    def get_stats(self):
+        return {
+            "watched": time.monotonic() < self._watched_until,
+            "seq": self._png_seq,
+            "frames_submitted": self.frames_submitted,
+            "frames_encoded": self.frames_encoded,
+            "stream_clients": [
+                {"kind": s.kind, "frames": s.frames_offered, "dropped": s.frames_dropped}
+                for s in self._subscribers
+            ],
+        }
+
+    # --- Encoder thread -----------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and (self._raw is None or self._raw_seq == self._attempted_seq):
+                    self._cond.wait()
+                if not self._running:
+                    return
+                seq, raw = self._raw_seq, self._raw
+                self._attempted_seq = seq
+                subscribers = self._subscribers
+
+            if subscribers:
+                self._publish(seq, raw, subscribers)
+
+            # PNG only while someone polls for it
+            png = None
+            if time.monotonic() < self._watched_until:
+                try:
+                    png = self._encode(raw)
+                except Exception as e:
+                    logger.debug(f"Failed to encode preview frame: {e}")
+
+            with self._cond:
+                if png is not None:
+                    self._png_seq, self._png = seq, png
+                    self.frames_encoded += 1
+                self._done_seq = seq
+                self._cond.notify_all()
+
+    def _publish(self, seq, raw, subscribers):
+        """Fan one frame out to every streaming client (encoded once, shared)."""
+        frame = StreamFrame(
+            seq, raw, self.width, self.height,
+            prev_seq=self._last_stream_seq, prev_raw=self._last_stream_raw,
+            scale=self.scale,
+        )
+        self._last_stream_seq, self._last_stream_raw = seq, raw
+        try:
+            frame.prepare({s.kind for s in subscribers})
+        except Exception as e:
+            logger.debug(f"Failed to encode stream frame: {e}")
+            return
+        now = time.monotonic()
+        for subscriber in subscribers:
+            subscriber.offer(frame, now)
+
+    def _encode(self, raw):
+        img = Image.frombytes('RGB', (self.width, self.height), raw)
+        # Scale up for better visibility (e.g., 4x = 256x256)
+        if self.scale != 1:
+            img = img.resize((self.width * self.scale, self.height * self.scale), Image.Resampling.NEAREST)
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
@@ -0,0 +1,157 @@
+"""
+Live preview streaming.
+
+The preview encoder thread wraps every raw frame it picks up in a
+StreamFrame and offers it to each StreamSubscriber. Encodings (keyframe,
+XOR delta, JPEG) are computed once per frame and shared by every client.
+Each subscriber keeps only the newest frame it hasn't sent yet (latest
+wins): a slow client drops frames instead of building a backlog, and
+gets a keyframe whenever it skipped one.
+
+WebSocket message format (binary, little-endian):
+    keyframe: b'K' + uint32 seq + uint16 width + uint16 height + raw RGB (width*height*3)
+    delta:    b'D' + uint32 seq + uint32 base_seq + zlib(XOR of raw RGB with frame base_seq)
+"""
+import io
+import time
+import zlib
+import struct
+import asyncio
+import logging
+import threading
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+KEYFRAME_HEADER = struct.Struct('<cIHH')
+DELTA_HEADER = struct.Struct('<cII')
+
+KIND_WEBSOCKET = "ws"
+KIND_MJPEG = "mjpeg"
+
+
+class StreamFrame:
+    """One preview frame plus its lazily computed (and cached) stream encodings."""
+
+    def __init__(self, seq, raw, width, height, prev_seq=None, prev_raw=None, scale=4, jpeg_quality=85):
+        self.seq = seq
+        self.raw = raw
+        self.width = width
+        self.height = height
+        self.prev_seq = prev_seq
+        self._prev_raw = prev_raw
+        self._scale = scale
+        self._jpeg_quality = jpeg_quality
+        self._keyframe = None
+        self._delta = None
+        self._delta_done = False
+        self._jpeg = None
+
+    def prepare(self, kinds):
+        """Encode up front (on the encoder thread) what the current subscribers need."""
+        if KIND_WEBSOCKET in kinds:
+            self.keyframe()
+            self.delta()
+        if KIND_MJPEG in kinds:
+            self.jpeg()
+
+    def keyframe(self):
+        if self._keyframe is None:
+            self._keyframe = KEYFRAME_HEADER.pack(b'K', self.seq, self.width, self.height) + self.raw
+        return self._keyframe
+
+    def delta(self):
+        """XOR delta against the previous frame, or None if there is none or it wouldn't be smaller."""
+        if not self._delta_done:
+            if self._prev_raw is not None and len(self._prev_raw) == len(self.raw):
+                diff = np.bitwise_xor(
+                    np.frombuffer(self.raw, dtype=np.uint8),
+                    np.frombuffer(self._prev_raw, dtype=np.uint8),
+                )
+                # Static areas XOR to zero runs, which zlib collapses to almost nothing
+                payload = zlib.compress(diff.tobytes(), 1)
+                message = DELTA_HEADER.pack(b'D', self.seq, self.prev_seq) + payload
+                if len(message) < len(self.keyframe()):
+                    self._delta = message
+            self._prev_raw = None  # Only needed once
+            self._delta_done = True
+        return self._delta
+
+    def message_after(self, last_sent_seq):
+        """The WebSocket message for a client whose last received frame is `last_sent_seq`."""
+        if last_sent_seq is not None and last_sent_seq == self.prev_seq:
+            delta = self.delta()
+            if delta is not None:
+                return delta
+        return self.keyframe()
+
+    def jpeg(self):
+        if self._jpeg is None:
+            img = Image.frombytes('RGB', (self.width, self.height), self.raw)
+            if self._scale != 1:
+                img = img.resize((self.width * self._scale, self.height * self._scale), Image.Resampling.NEAREST)
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=self._jpeg_quality)
+            self._jpeg = buffer.getvalue()
+        return self._jpeg
+
+
+class StreamSubscriber:
+    """
+    One streaming client. offer() is called from the encoder thread; the
+    client's asyncio task awaits next(). Holds at most one pending frame.
+    """
+
+    def __init__(self, kind=KIND_WEBSOCKET, max_fps=None, loop=None):
+        self.kind = kind
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.frames_offered = 0
+        self.frames_dropped = 0
+        self._loop = loop or asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self._lock = threading.Lock()
+        self._pending = None
+        self._last_offer = 0.0
+        self._closed = False
+
+    def offer(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        if self.min_interval and now - self._last_offer < self.min_interval:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            if self._pending is not None:
+                # Client hasn't taken the previous frame yet: latest wins
+                self.frames_dropped += 1
+            self._pending = frame
+            self._last_offer = now
+            self.frames_offered += 1
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            self._closed = True
+
+    async def next(self):
+        """Wait for and take the newest pending frame. Returns None once closed."""
+        while True:
+            await self._event.wait()
+            self._event.clear()
+            with self._lock:
+                if self._closed:
+                    return None
+                frame, self._pending = self._pending, None
+            if frame is not None:
+                return frame
+
+    def close(self):
+        """Stop taking frames and wake a pending next() (from any thread)."""
+        with self._lock:
+            self._closed = True
+            self._pending = None
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass  # Event loop already closed (shutdown)
@@ -0,0 +1,196 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+PREPARING = "preparing"    # Script/clip being loaded and instantiated
+PENDING = "pending"        # Built; waiting for the engine's next frame boundary
+ACTIVE = "active"          # Live on the matrix
+FAILED = "failed"
+SUPERSEDED = "superseded"  # A newer activation (or set_scene) replaced it first
+
+FINISHED_STATES = (ACTIVE, FAILED, SUPERSEDED)
+MAX_FINISHED_JOBS = 50
+
+
+class ActivationJob:
+    def __init__(self, filename):
+        self.id = uuid.uuid4().hex[:12]
+        self.filename = filename
+        self.status = QUEUED
+        self.error = None
+        self.created = time.time()
+        self.updated = self.created
+        self.scene = None
+        self.on_live = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters = []  # Callbacks waking wait_async() callers
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def wait(self, timeout):
+        """Block until the job finished (or timeout). Returns True if it did."""
+        return self._done.wait(timeout)
+
+    async def wait_async(self, timeout):
+        """Like wait(), for the event loop: no thread is held while waiting."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            # Called from the thread that finished the job
+            try:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+            except RuntimeError:
+                pass  # Event loop already closed
+        with self._lock:
+            if self._done.is_set():
+                return True
+            self._waiters.append(wake)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                if wake in self._waiters:
+                    self._waiters.remove(wake)
+
+    def _set(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.updated = time.time()
+        if status in FINISHED_STATES:
+            self.scene = None  # The state manager holds it from here
+            with self._lock:
+                self._done.set()
+                waiters, self._waiters = self._waiters, []
+            for wake in waiters:
+                wake()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+class SceneActivator:
+    """
+    Activates scenes as background jobs. Loading the script or clip and
+    constructing the scene happen on a worker thread; the built scene is
+    handed to StateManager.request_scene() and the engine swaps it in at the
+    next frame boundary. Jobs run one at a time in submission order, and a
+    job that a newer one has already replaced is skipped without loading.
+    """
+
+    def __init__(self, script_loader, clip_loader, state_manager):
+        self.script_loader = script_loader
+        self.clip_loader = clip_loader
+        self.state_manager = state_manager
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scene-activate")
+        self._jobs = OrderedDict()  # id -> ActivationJob, oldest first
+        self._latest_id = None
+        self._lock = threading.Lock()
+
+    def submit(self, filename, on_live=None):
+        """Start activating `filename`. on_live(scene) is called once it is on the matrix."""
+        job = ActivationJob(filename)
+        job.on_live = on_live
+        with self._lock:
+            self._jobs[job.id] = job
+            self._latest_id = job.id
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _prune(self):
+        # Keep every unfinished job, and the most recent finished ones
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        if self._latest_id != job.id:
+            job._set(SUPERSEDED)
+            return
+
+        job._set(PREPARING)
+        try:
+            scene_instance, error = self._load(job.filename)
+        except Exception as e:
+            logger.error(f"Unexpected error activating scene {job.filename}: {e}")
+            job._set(FAILED, f"Internal error: {e}")
+            return
+
+        if not scene_instance:
+            job._set(FAILED, error)
+            return
+
+        job.scene = scene_instance
+        job._set(PENDING)
+        self.state_manager.request_scene(scene_instance, lambda applied: self._applied(job, scene_instance, applied))
+
+    def _load(self, filename):
+        """Build the scene. Returns (scene, None) or (None, error message)."""
+        scene_instance = None
+
+        # Scripts first (compiled modules are cached by the ScriptLoader)
+        if os.path.exists(os.path.join(self.script_loader.scripts_dir, filename)):
+            try:
+                scene_instance = self.script_loader.get_scene(filename)
+            except Exception as e:
+                logger.debug(f"Failed to load as script {filename}: {e}")
+            if not scene_instance:
+                error = self.script_loader.get_load_errors().get(filename)
+                if error:
+                    return None, f"Failed to {error['phase']} {filename}: {error['error']}"
+
+        # If script loading failed, try as clip
+        if not scene_instance:
+            try:
+                scene_instance = self.clip_loader.load_clip(filename)
+            except Exception as e:
+                logger.debug(f"Failed to load as clip {filename}: {e}")
+
+        if not scene_instance:
+            return None, f"Scene '{filename}' not found or could not be loaded"
+        return scene_instance, None
+
+    def _applied(self, job, scene_instance, applied):
+        # Runs on the engine thread (or whoever superseded the request, after the
+        # superseded scene was exited): keep it short
+        if not applied:
+            job._set(SUPERSEDED)
+            return
+
+        job._set(ACTIVE)
+        logger.info(f"Activated scene: {job.filename}")
+        if job.on_live is not None:
+            try:
+                job.on_live(scene_instance)
+            except Exception as e:
+                logger.error(f"Error in on_live callback for {job.filename}: {e}")
@@ -0,0 +1,147 @@
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SORT_KEYS = ("name", "filename", "type", "mtime", "size")
+THUMBNAILS_DIR = os.path.join("scenes", "thumbnails")
+
+
+class SceneCatalog:
+    """
+    In-memory index of every script and clip: display name, type, file
+    stats, and whether a thumbnail exists. Built once from the scene
+    directories, then kept current incrementally: file watchers and the
+    routers that add/rename/delete files call update(), LibraryManager
+    notifies metadata changes.
+
+    Every change bumps `version` (used for the listing ETag). Sorted views
+    are built lazily once per version, so listing a page costs O(page)
+    rather than a directory scan plus a metadata lookup per item.
+    """
+
+    def __init__(self, script_loader, clip_loader, library_manager, thumbnails_dir=THUMBNAILS_DIR):
+        self.script_loader = script_loader
+        self.clip_loader = clip_loader
+        self.library_manager = library_manager
+        self.thumbnails_dir = thumbnails_dir
+        self.version = 0
+        self._entries = {}  # filename -> entry dict
+        self._views = {}    # (type, sort, descending) -> sorted entries, valid for self.version
+        self._lock = threading.Lock()
+        library_manager.add_listener(self.update)
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the whole index from disk."""
+        entries = {}
+        for filename in self.script_loader.list_available_scripts():
+            entry = self._build_entry(filename)
+            if entry:
+                entries[filename] = entry
+        for filename in self.clip_loader.list_available_clips():
+            entry = self._build_entry(filename)
+            if entry:
+                entries[filename] = entry
+        with self._lock:
+            self._entries = entries
+            self._changed()
+        logger.info(f"Scene catalog indexed {len(entries)} scenes")
+
+    def update(self, *filenames):
+        """Re-index the given scene files (added, changed, renamed or deleted)."""
+        with self._lock:
+            changed = False
+            for filename in filenames:
+                entry = self._build_entry(filename)
+                if entry is None:
+                    changed |= self._entries.pop(filename, None) is not None
+                elif self._entries.get(filename) != entry:
+                    self._entries[filename] = entry
+                    changed = True
+            if changed:
+                self._changed()
+
+    def on_thumbnail_changed(self, thumb_filename):
+        """FileWatcher callback for the thumbnails dir ("<scene filename>.png")."""
+        if thumb_filename.endswith(".png"):
+            self.update(thumb_filename[:-len(".png")])
+
+    def get(self, filename):
+        with self._lock:
+            entry = self._entries.get(filename)
+            return dict(entry) if entry else None
+
+    def list(self, scene_type=None, query=None, sort="name", descending=False, offset=0, limit=None):
+        """
+        One page of scenes. Returns (items, total). `scene_type` is "script",
+        "live" or "clip"; `query` matches display name or filename
+        (case-insensitive, a linear scan of the indexed names).
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        with self._lock:
+            view = self._view(scene_type, sort, descending)
+        if query:
+            needle = query.lower()
+            view = [entry for entry in view if needle in entry["_search"]]
+        end = None if limit is None else offset + limit
+        page = [_public(entry) for entry in view[offset:end]]
+        return page, len(view)
+
+    def _view(self, scene_type, sort, descending):
+        # Caller holds the lock
+        key = (scene_type, sort, descending)
+        view = self._views.get(key)
+        if view is None:
+            entries = self._entries.values()
+            if scene_type:
+                entries = [entry for entry in entries if entry["type"] == scene_type]
+            # Filename as tie-breaker keeps pages stable
+            view = sorted(entries, key=lambda entry: (entry[sort], entry["filename"]), reverse=descending)
+            self._views[key] = view
+        return view
+
+    def _changed(self):
+        # Caller holds the lock
+        self.version += 1
+        self._views = {}
+
+    def _build_entry(self, filename):
+        """Index entry for a scene file, or None if it doesn't exist (any more)."""
+        if filename.endswith(".py"):
+            path = os.path.join(self.script_loader.scripts_dir, filename)
+            kind = "script"
+        else:
+            path = os.path.join(self.clip_loader.clips_dir, filename)
+            kind = "clip"
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+
+        meta = self.library_manager.get_metadata(filename)
+        if kind == "script":
+            default_name = filename.replace(".py", "").replace("_", " ").title()
+            # Check if scene has a custom type (e.g., "live" for Home Assistant animations)
+            scene_type = meta.get("type", "script")
+        else:
+            # For clips, default clean name is filename without ext
+            default_name = os.path.splitext(filename)[0].replace("_", " ").title()
+            scene_type = "clip"
+        name = meta.get("title", default_name)
+
+        return {
+            "filename": filename,
+            "name": name,
+            "type": scene_type,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "has_thumbnail": os.path.exists(os.path.join(self.thumbnails_dir, f"{filename}.png")),
+            "_search": f"{name}\n{filename}".lower(),
+        }
+
+
+def _public(entry):
+    return {key: value for key, value in entry.items() if not key.startswith("_")}
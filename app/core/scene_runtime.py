@@ -0,0 +1,593 @@
+"""
+Subprocess scene runtime.
+
+With MATRIX_SCENE_RUNTIME=process, script scenes run in a child process
+instead of the render thread. The child owns the scene (update + draw at
+the target frame rate) and draws straight into one half of a
+double-buffered framebuffer in shared memory; publishing a frame flips the
+halves under a seqlock. In the server process a ProcessScene stands in for
+the scene: its draw() is a single copy of the newest published frame.
+
+The child runs at a lower CPU priority, with an address-space limit and an
+optional CPU-time limit (RLIMIT_CPU). If it crashes, hits a limit, or stops
+publishing frames (runaway loop), it is killed and restarted with backoff.
+The default runtime ("inprocess") runs scenes in the render thread as
+before; the process runtime also falls back to it when child processes or
+shared memory are unavailable.
+
+Shared memory layout:
+    header (HEADER_SIZE bytes): uint32 seq, uint32 front, uint64 frames, float64 last frame time
+    frame 0, frame 1:           width * height * 3 bytes RGB each
+
+seq is odd while the front index is being switched; a reader that sees it
+change while copying retries, since the writer may already be drawing into
+the half it was reading.
+"""
+import gc
+import os
+import sys
+import time
+import struct
+import signal
+import logging
+import weakref
+import multiprocessing
+import numpy as np
+from app.core.base_scene import BaseScene
+from app.core.framebuffer import FrameBuffer
+from app.core.state_manager import StateManager
+from app.core.home_assistant import LEASE_SECONDS
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: no cover - Python < 3.8
+    shared_memory = None
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_ENV = "MATRIX_SCENE_RUNTIME"
+CPU_LIMIT_ENV = "MATRIX_SCENE_CPU_SECONDS"
+MEMORY_LIMIT_ENV = "MATRIX_SCENE_MEMORY_MB"
+RUNTIME_INPROCESS = "inprocess"
+RUNTIME_PROCESS = "process"
+
+HEADER = struct.Struct('<IIQd')
+HEADER_SIZE = 64
+TARGET_FPS = 60
+STATE_PUSH_INTERVAL = 0.25
+MAX_CONSECUTIVE_ERRORS = 10
+MAX_RESTART_DELAY = 10.0
+# A child that ran this long without trouble resets the restart backoff
+HEALTHY_RUN_SECONDS = 30.0
+
+
+def runtime_mode():
+    """The configured scene runtime (MATRIX_SCENE_RUNTIME), "inprocess" unless set to "process"."""
+    mode = os.environ.get(RUNTIME_ENV, RUNTIME_INPROCESS).strip().lower()
+    if mode not in (RUNTIME_INPROCESS, RUNTIME_PROCESS):
+        logger.warning(f"Unknown {RUNTIME_ENV}={mode!r}, using {RUNTIME_INPROCESS}")
+        return RUNTIME_INPROCESS
+    return mode
+
+
+def process_runtime_available():
+    return shared_memory is not None
+
+
+class RuntimeLimits:
+    """Resource limits for scene child processes."""
+
+    def __init__(self, cpu_seconds=0, memory_mb=512, nice=10, stall_timeout=5.0, startup_timeout=20.0):
+        self.cpu_seconds = cpu_seconds          # RLIMIT_CPU; 0 = unlimited (the child is restarted when hit)
+        self.memory_mb = memory_mb              # RLIMIT_AS; 0 = unlimited
+        self.nice = nice                        # Added niceness: the render loop and HTTP server come first
+        self.stall_timeout = stall_timeout      # No new frame for this long: kill and restart
+        self.startup_timeout = startup_timeout  # Same, before the first frame (imports, constructor)
+
+    @classmethod
+    def from_env(cls):
+        limits = cls()
+        for env, attr in ((CPU_LIMIT_ENV, "cpu_seconds"), (MEMORY_LIMIT_ENV, "memory_mb")):
+            if env in os.environ:
+                try:
+                    setattr(limits, attr, max(0, int(os.environ[env])))
+                except ValueError:
+                    logger.warning(f"Invalid {env}, using {getattr(limits, attr)}")
+        return limits
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class SharedFrames:
+    """Double-buffered RGB frames in shared memory, published under a seqlock."""
+
+    def __init__(self, width, height, name=None):
+        self.width = width
+        self.height = height
+        self.frame_size = width * height * 3
+        size = HEADER_SIZE + 2 * self.frame_size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        buf = self.shm.buf
+        self._frames = [
+            FrameBuffer(width, height, buffer=buf[HEADER_SIZE + i * self.frame_size:HEADER_SIZE + (i + 1) * self.frame_size])
+            for i in range(2)
+        ]
+
+    def header(self):
+        """(seq, front, frames, last_frame_time)"""
+        return HEADER.unpack_from(self.shm.buf, 0)
+
+    # --- writer (child) ---
+
+    def back(self):
+        """The half not being shown: draw the next frame here."""
+        return self._frames[1 - self.header()[1]]
+
+    def publish(self, now):
+        seq, front, frames, _ = self.header()
+        HEADER.pack_into(self.shm.buf, 0, seq + 1, front, frames, now)
+        HEADER.pack_into(self.shm.buf, 0, seq + 2, 1 - front, frames + 1, now)
+
+    # --- reader (server) ---
+
+    def read_into(self, pixels):
+        """Copy the newest published frame into `pixels`. Returns its seq, or None (no consistent frame yet)."""
+        for _ in range(3):
+            seq, front, _, _ = HEADER.unpack_from(self.shm.buf, 0)
+            if seq == 0:
+                return None
+            if seq & 1:
+                continue
+            np.copyto(pixels, self._frames[front].pixels)
+            if HEADER.unpack_from(self.shm.buf, 0)[0] == seq:
+                return seq
+        return None
+
+    def close(self):
+        # Drop our views first: SharedMemory.close() refuses while they exist
+        self._frames = []
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _mp_context():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        # Children fork from a clean, single-threaded server process with our
+        # modules already imported: fast restarts, no inherited server threads
+        ctx = multiprocessing.get_context("forkserver")
+        preload = ["app.core.scene_runtime"]
+        main_spec = getattr(sys.modules.get("__main__"), "__spec__", None)
+        if main_spec is not None and main_spec.name and not main_spec.name.endswith("__main__"):
+            preload.append(main_spec.name)
+        ctx.set_forkserver_preload(preload)
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+_context = None
+
+
+def _get_context():
+    global _context
+    if _context is None:
+        _context = _mp_context()
+    return _context
+
+
+class _Child:
+    """The running child process of a ProcessScene (kept apart so the finalizer doesn't reference the scene)."""
+
+    def __init__(self):
+        self.process = None
+        self.conn = None
+
+    def stop(self, timeout=1.0):
+        process, conn, self.process, self.conn = self.process, self.conn, None, None
+        if conn is not None:
+            try:
+                conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+        if process is not None:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join(timeout)
+        if conn is not None:
+            conn.close()
+
+
+def _cleanup(child, frames):
+    child.stop()
+    frames.close()
+    frames.unlink()
+
+
+class ProcessScene(BaseScene):
+    """
+    Stands in for a script scene that runs in a child process. update()
+    supervises the child (state pushes, watchdog, restarts); draw() copies
+    the newest frame out of shared memory.
+    """
+
+    use_framebuffer = True
+
+    def __init__(self, matrix, state_manager, filename, file_path, limits=None, on_error=None):
+        super().__init__(matrix, state_manager)
+        self.filename = filename
+        self.file_path = file_path
+        self.limits = limits or RuntimeLimits.from_env()
+        self.on_error = on_error  # on_error(message) for load errors reported by the child
+        self.error = None
+        self.restarts = 0
+        self.frames = SharedFrames(self.width, self.height)
+        self._child = _Child()
+        self._finalizer = weakref.finalize(self, _cleanup, self._child, self.frames)
+        self._failures = 0
+        self._started_at = 0.0
+        self._restart_at = None
+        self._last_progress = 0.0
+        self._last_frames = 0
+        self._ready = False
+        self._last_push = 0.0
+        self._pushed_state = None
+        # Start right away: the child imports and constructs while we are being activated
+        self._spawn()
+
+    def __repr__(self):
+        return f"<ProcessScene {self.filename}>"
+
+    def _state_snapshot(self):
+        # The palette version makes the child reload palettes edited since it started
+        palette_manager = getattr(self.state_manager, '_palette_manager', None)
+        palette_version = palette_manager.version if palette_manager else None
+        return self.state_manager.settings, self.state_manager.get_data(), palette_version
+
+    def _spawn(self):
+        ctx = _get_context()
+        parent_conn, child_conn = ctx.Pipe()
+        state = self._state_snapshot()
+        process = ctx.Process(
+            target=_child_main,
+            args=(child_conn, self.frames.name, self.file_path, self.filename,
+                  self.width, self.height, state, self.limits.to_dict()),
+            name=f"scene:{self.filename}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self._child.process = process
+        self._child.conn = parent_conn
+        self._pushed_state = state
+        now = time.monotonic()
+        self._started_at = now
+        self._last_progress = now
+        self._last_frames = self.frames.header()[2]
+        self._ready = False
+        self._restart_at = None
+        logger.info(f"Started scene process for {self.filename} (pid {process.pid})")
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until the child has constructed the scene. False if it failed
+        to load (self.error is set), died, or didn't make it in time.
+        """
+        deadline = time.monotonic() + (timeout or self.limits.startup_timeout)
+        while not self._ready and self.error is None:
+            process, conn = self._child.process, self._child.conn
+            remaining = deadline - time.monotonic()
+            if process is None or remaining <= 0:
+                return False
+            try:
+                if conn.poll(min(remaining, 0.1)):
+                    self._poll_messages()
+                elif not process.is_alive():
+                    return False
+            except (EOFError, OSError):
+                return False
+        return self._ready
+
+    def update(self, dt):
+        if not self._finalizer.alive:
+            return  # exit()ed; the engine may still run one more frame
+        now = time.monotonic()
+        child = self._child
+        if child.process is None:
+            if self._restart_at is not None and now >= self._restart_at:
+                self.restarts += 1
+                try:
+                    self._spawn()
+                except Exception as e:
+                    logger.error(f"Failed to restart scene process for {self.filename}: {e}")
+                    self._schedule_restart(now)
+            return
+
+        self._poll_messages()
+        if child.process is None:
+            return
+
+        if not child.process.is_alive():
+            self._child_died(now)
+            return
+
+        # Watchdog: the child must keep publishing frames
+        frames = self.frames.header()[2]
+        if frames != self._last_frames:
+            self._last_frames = frames
+            self._last_progress = now
+            if now - self._started_at > HEALTHY_RUN_SECONDS:
+                self._failures = 0
+        else:
+            timeout = self.limits.stall_timeout if self._ready else self.limits.startup_timeout
+            if now - self._last_progress > timeout:
+                logger.error(f"Scene process for {self.filename} stalled for {timeout:.0f}s, restarting")
+                child.stop(timeout=0)
+                self._schedule_restart(now)
+                return
+
+        if now - self._last_push >= STATE_PUSH_INTERVAL:
+            self._last_push = now
+            self._push_state()
+
+    def _poll_messages(self):
+        conn = self._child.conn
+        try:
+            while conn.poll():
+                message = conn.recv()
+                if message[0] == "ready":
+                    self._ready = True
+                elif message[0] == "watch":
+                    # Home Assistant entities the scene reads: watched on its behalf
+                    service = getattr(self.state_manager, '_home_assistant', None)
+                    if service is not None:
+                        service.watch(message[1], message[2])
+                elif message[0] == "error":
+                    # Script failed to load or construct: restarting won't help until it changes
+                    self.error = message[1]
+                    logger.error(f"Scene process for {self.filename} failed: {self.error}")
+                    if self.on_error:
+                        self.on_error(self.error)
+                    self._child.stop()
+                    self._restart_at = None
+                    return
+        except (EOFError, OSError):
+            pass  # Child went away; is_alive() handles it
+
+    def _child_died(self, now):
+        exitcode = self._child.process.exitcode
+        if exitcode is not None and exitcode < 0:
+            sig = -exitcode
+            reason = {signal.SIGXCPU: "CPU time limit reached", signal.SIGKILL: "killed"}.get(sig, f"signal {sig}")
+        else:
+            reason = f"exit code {exitcode}"
+        logger.error(f"Scene process for {self.filename} exited ({reason}), restarting")
+        self._child.stop(timeout=0)
+        self._schedule_restart(now)
+
+    def _schedule_restart(self, now):
+        if now - self._started_at > HEALTHY_RUN_SECONDS:
+            self._failures = 0
+        delay = min(MAX_RESTART_DELAY, 0.5 * (2 ** self._failures))
+        self._failures += 1
+        self._restart_at = now + delay
+
+    def _push_state(self):
+        settings, data, palette_version = snapshot = self._state_snapshot()
+        pushed_settings, pushed_data, pushed_palette_version = self._pushed_state
+        if (settings.version == pushed_settings.version and data == pushed_data
+                and palette_version == pushed_palette_version):
+            return
+        try:
+            self._child.conn.send(("state",) + snapshot)
+            self._pushed_state = snapshot
+        except (OSError, ValueError, TypeError) as e:
+            logger.debug(f"Failed to push state to scene process {self.filename}: {e}")
+
+    def on_settings_changed(self, settings):
+        # Forward on the next update() rather than at the next push interval
+        self._last_push = 0.0
+
+    def draw(self, canvas):
+        if not self._finalizer.alive:
+            return
+        if isinstance(canvas, FrameBuffer):
+            self.frames.read_into(canvas.pixels)
+        else:
+            frame = FrameBuffer(self.width, self.height)
+            if self.frames.read_into(frame.pixels) is not None:
+                canvas.SetImage(frame.as_image())
+
+    def exit(self):
+        self._restart_at = None
+        self._finalizer()
+
+    def get_stats(self):
+        process = self._child.process
+        return {
+            "filename": self.filename,
+            "pid": process.pid if process is not None else None,
+            "running": process is not None and process.is_alive(),
+            "frames": self.frames.header()[2] if self._finalizer.alive else 0,
+            "restarts": self.restarts,
+            "error": self.error,
+        }
+
+
+class _ChildMatrix:
+    """What a scene sees as `matrix` inside the child process."""
+
+    def __init__(self, width, height, canvas):
+        self.width = width
+        self.height = height
+        self.canvas = canvas
+
+
+class _NoLock:
+    """The child is single-threaded."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _WatchProxy:
+    """Stands in for the server's HomeAssistantService: forwards watch() leases (rate-limited)."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._sent = {}  # (entity ids, interval) -> monotonic time last forwarded
+
+    def watch(self, entity_ids, interval=10.0):
+        key = (tuple(entity_ids), interval)
+        now = time.monotonic()
+        if now - self._sent.get(key, -LEASE_SECONDS) >= LEASE_SECONDS / 4:
+            self._sent[key] = now
+            self._conn.send(("watch", list(entity_ids), interval))
+
+
+class _ChildState(StateManager):
+    """StateManager fed from the server process: read-only settings, shared external data."""
+
+    def __init__(self, settings, data, palette_manager, palette_version=None, home_assistant=None):
+        self._lock = _NoLock()
+        self._settings = settings
+        self._persisted = dict(settings)
+        self._overrides = {}
+        self.external_data = data
+        self.active_scene = None
+        self._pending_scene = None
+        self._scene_lock = _NoLock()
+        self._palette_manager = palette_manager
+        self._palette_version = palette_version  # The server's PaletteManager.version
+        self._home_assistant = home_assistant
+
+    def update_setting(self, key, value):
+        logger.warning(f"Scene process cannot change setting {key}")
+        return False
+
+    def apply(self, settings, data, palette_version=None):
+        if palette_version != self._palette_version:
+            # Palettes were created/edited on the server (the selected one may have changed colors)
+            self._palette_manager.load_palettes()
+            self._palette_version = palette_version
+        self._settings = settings
+        self.external_data = data
+
+
+def _apply_limits(limits):
+    try:
+        os.nice(limits["nice"])
+    except OSError:
+        pass
+    if resource is None:
+        return
+    if limits["memory_mb"]:
+        memory = limits["memory_mb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    if limits["cpu_seconds"]:
+        cpu = limits["cpu_seconds"]
+        # Soft limit sends SIGXCPU (terminates); hard limit is the SIGKILL backstop
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 5))
+
+
+def _child_main(conn, shm_name, file_path, filename, width, height, state, limits):
+    # Runs in the child process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is the server's to handle
+    _apply_limits(limits)
+
+    # The server owns (and unlinks) the segment
+    try:
+        frames = SharedFrames(width, height, name=shm_name)
+    except FileNotFoundError:
+        return  # The scene was exited (server shutting down) before we got here
+    try:
+        _run_scene(conn, frames, file_path, filename, *state)
+    finally:
+        gc.collect()  # Release the scene's views into the segment before closing it
+        frames.close()
+
+
+def _run_scene(conn, frames, file_path, filename, settings, data, palette_version):
+    from app.core.palette_manager import PaletteManager
+    from app.core.loaders.script_loader import ScriptLoader
+
+    width, height = frames.width, frames.height
+    matrix = _ChildMatrix(width, height, frames.back())
+    state = _ChildState(settings, data, PaletteManager(), palette_version, _WatchProxy(conn))
+    loader = ScriptLoader(matrix, state, scripts_dir=os.path.dirname(file_path), runtime=RUNTIME_INPROCESS)
+    scene = loader.get_scene(filename)
+    if scene is None:
+        error = loader.get_load_errors().get(filename, {})
+        conn.send(("error", error.get("error", "Failed to load scene")))
+        return
+    try:
+        scene.enter(state)
+    except Exception as e:
+        logger.error(f"Error entering scene {filename}: {e}")
+    conn.send(("ready",))
+
+    interval = 1.0 / TARGET_FPS
+    last = time.monotonic()
+    deadline = last
+    errors = 0
+    seen_version = None
+    while True:
+        try:
+            while conn.poll():
+                message = conn.recv()
+                if message[0] == "stop":
+                    return
+                if message[0] == "state":
+                    state.apply(*message[1:])
+        except (EOFError, OSError):
+            return  # Server went away
+
+        now = time.monotonic()
+        dt = min(now - last, 1.0)
+        last = now
+        settings = state.settings
+        speed = max(0.1, min(2.0, settings.get("speed", 1.0)))
+        try:
+            if settings.version != seen_version:
+                seen_version = settings.version
+                scene.on_settings_changed(settings)
+            scene.update(dt * speed)
+            canvas = frames.back()
+            matrix.canvas = canvas
+            canvas.Clear()
+            scene.draw(canvas)
+            frames.publish(time.time())
+            errors = 0
+        except Exception as e:
+            errors += 1
+            logger.error(f"Error in scene {filename} ({errors}/{MAX_CONSECUTIVE_ERRORS}): {type(e).__name__}: {e}")
+            if errors >= MAX_CONSECUTIVE_ERRORS:
+                sys.exit(1)
+
+        deadline += interval
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -interval:
+            deadline = time.monotonic()  # Fell behind: don't try to catch up
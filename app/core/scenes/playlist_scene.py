@@ -1,10 +1,66 @@
 from app.core.base_scene import BaseScene
+import os
 import logging
-import time
+import threading
 
 logger = logging.getLogger(__name__)
 
+PREFETCH_ENV = "MATRIX_PLAYLIST_PREFETCH_S"
+DEFAULT_PREFETCH_SECONDS = 3.0
+# A prefetch still not ready this long after its item should have started is skipped
+PREFETCH_TIMEOUT = 30.0
+FAILED_ITEM_RETRY = 1.0
+
+
+def _prefetch_seconds(playlist_data):
+    """Lead time for building the next item: the playlist's settings.prefetch_seconds, else MATRIX_PLAYLIST_PREFETCH_S."""
+    value = (playlist_data.get("settings") or {}).get("prefetch_seconds")
+    if value is None:
+        value = os.environ.get(PREFETCH_ENV, DEFAULT_PREFETCH_SECONDS)
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid prefetch lead time {value!r}, using {DEFAULT_PREFETCH_SECONDS}s")
+        return DEFAULT_PREFETCH_SECONDS
+
+
+class _Prefetch:
+    """The next playlist item, being built on a worker thread."""
+
+    def __init__(self, index, item):
+        self.index = index
+        self.item = item
+        self.scene = None
+        self.done = threading.Event()
+        self.abandoned = False
+        self._lock = threading.Lock()
+
+    def finish(self, scene):
+        """Worker side: publish the built scene. Returns False if the playlist no longer wants it."""
+        with self._lock:
+            self.scene = scene
+            self.done.set()
+            return not self.abandoned
+
+    def abandon(self):
+        """
+        Playlist side: drop this prefetch. Returns the scene if it was already
+        built (the caller exits it); otherwise the worker exits it when done.
+        """
+        with self._lock:
+            self.abandoned = True
+            scene, self.scene = self.scene, None
+            return scene
+
+
 class PlaylistScene(BaseScene):
+    """
+    Plays playlist items in turn. The next item is built on a worker thread
+    `prefetch_seconds` before the current one ends (script constructors and
+    clip loading never run on the render thread) and swapped in between
+    frames once it is ready; until then the current item keeps playing.
+    """
+
     def __init__(self, matrix, state_manager, playlist_data, script_loader, clip_loader):
         super().__init__(matrix, state_manager)
         self.playlist_data = playlist_data
@@ -22,6 +78,11 @@ class PlaylistScene(BaseScene):
         self.current_scene_instance = None
         self.time_in_scene = 0
         self.current_item_duration = 0
+        self.prefetch_seconds = _prefetch_seconds(playlist_data)
+        self._prefetch = None
+        # Palette override for the current item; published only while the playlist is active
+        self._palette = None
+        self._active = False
         
         # Apply default palette if set
         if self.default_palette:
@@ -30,24 +91,31 @@ class PlaylistScene(BaseScene):
         # Start the first item
         self.advance_scene()
 
+    @property
+    def use_framebuffer(self):
+        # Follow the current item so framebuffer scenes work inside playlists
+        return getattr(self.current_scene_instance, "use_framebuffer", False)
+
+    @property
+    def batch_pixels(self):
+        return getattr(self.current_scene_instance, "batch_pixels", False)
+
     def advance_scene(self):
+        """Load the next item synchronously and switch to it (used for the first item)."""
         if not self.items:
             self.current_scene_instance = None
             return
 
-        # Advance index (looping)
-        self.current_index = (self.current_index + 1) % len(self.items)
-        item = self.items[self.current_index]
-        
+        index = (self.current_index + 1) % len(self.items)
+        item = self.items[index]
+        self._switch_to(index, item, self._load_item(item))
+
+    def _load_item(self, item):
+        """Build the scene for a playlist item, or None. Runs on the prefetch thread (or the caller's)."""
         filename = item.get("filename")
         item_type = item.get("type", "script")  # Default to script for backward compatibility
-        self.current_item_duration = item.get("duration", 10) # Default 10s
-        
-        logger.info(f"Playlist advancing to: {filename} (type: {item_type}) for {self.current_item_duration}s")
         
-        # Load the Scene based on type
         scene_instance = None
-        
         try:
             if item_type == "clip":
                 if self.clip_loader:
@@ -61,8 +129,18 @@ class PlaylistScene(BaseScene):
                     logger.error("Script loader not available")
         except Exception as e:
             logger.error(f"Error loading scene {filename} (type: {item_type}): {e}")
+        return scene_instance
+
+    def _switch_to(self, index, item, scene_instance):
+        """Make a loaded item current. Runs on the render thread, between frames."""
+        filename = item.get("filename")
+        item_type = item.get("type", "script")
+        self.current_index = index
+        self.current_item_duration = item.get("duration", 10) # Default 10s
         
         if scene_instance:
+            logger.info(f"Playlist advancing to: {filename} (type: {item_type}) for {self.current_item_duration}s")
+            
             # Lifecycle: Exit old
             if self.current_scene_instance and hasattr(self.current_scene_instance, 'exit'):
                 try:
@@ -87,24 +165,89 @@ class PlaylistScene(BaseScene):
                     self.current_scene_instance.enter(self.state_manager)
                 except Exception as e:
                     logger.error(f"Error enter sub-scene: {e}")
+            # The engine only tells the playlist about settings: bring the new item up to date
+            self._forward_settings(self.state_manager.settings)
                     
             # Reset Timer
             self.time_in_scene = 0
         else:
             logger.error(f"Playlist could not load scene: {filename} (type: {item_type})")
-            # Failsafe: Try next one immediately to avoid black screen hang
-            # But prevent infinite recursion if ALL are bad
-            # We'll just wait 1 sec then try again to be safe
-            self.current_scene_instance = None
-            self.current_item_duration = 1.0 
+            if self.current_scene_instance is None:
+                # Nothing to show: try the next item in a second
+                self.current_item_duration = FAILED_ITEM_RETRY
+                self.time_in_scene = 0
+            else:
+                # Keep the current item on screen and try the next one in a second.
+                # One attempt per second at most, even if every item is broken.
+                self.time_in_scene = self.current_item_duration - FAILED_ITEM_RETRY
+
+    def _start_prefetch(self):
+        index = (self.current_index + 1) % len(self.items)
+        prefetch = _Prefetch(index, self.items[index])
+        self._prefetch = prefetch
+        logger.debug(f"Playlist prefetching: {prefetch.item.get('filename')}")
+        threading.Thread(
+            target=self._run_prefetch, args=(prefetch,), name="playlist-prefetch", daemon=True
+        ).start()
+
+    def _run_prefetch(self, prefetch):
+        scene = self._load_item(prefetch.item)
+        if not prefetch.finish(scene):
+            # Abandoned while building: release it (a scene process, a clip stream)
+            logger.debug(f"Playlist dropping abandoned prefetch: {prefetch.item.get('filename')}")
+            _exit_scene(scene)
+
+    def _advance_prefetched(self):
+        """At the end of an item: switch to the prefetched one if it is ready. Never blocks."""
+        prefetch = self._prefetch
+        if prefetch is None:
+            self._start_prefetch()
+            return
+        
+        if not prefetch.done.is_set():
+            # Not built yet: keep the current item playing rather than stall the loop
+            overdue = self.time_in_scene - self.current_item_duration
+            if overdue >= PREFETCH_TIMEOUT:
+                logger.warning(f"Playlist gave up waiting for {prefetch.item.get('filename')}, skipping it")
+                # The worker finishes on its own and exits the scene it built
+                prefetch.abandon()
+                self.current_index = prefetch.index
+                self.time_in_scene = self.current_item_duration
+                self._start_prefetch()
+            return
+        
+        self._prefetch = None
+        self._switch_to(prefetch.index, prefetch.item, prefetch.scene)
+
+    def enter(self, state_manager):
+        self._active = True
+        if self._palette:
+            self.state_manager.set_overrides(self, selected_palette=self._palette)
+
+    def exit(self):
+        # Drop any in-flight prefetch and let the current item clean up (stop clip streams etc.)
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is not None:
+            _exit_scene(prefetch.abandon())
+        # The playlist's palette goes with it: the user's own selection shows again
+        self._active = False
+        self.state_manager.clear_overrides(self)
+        if self.current_scene_instance and hasattr(self.current_scene_instance, 'exit'):
+            try:
+                self.current_scene_instance.exit()
+            except Exception as e:
+                logger.error(f"Error exit sub-scene: {e}")
 
     def update(self, dt):
         # 1. Update Timer
         self.time_in_scene += dt
         
-        # 2. Check for switch
-        if self.time_in_scene >= self.current_item_duration:
-            self.advance_scene()
+        # 2. Start building the next item ahead of time, switch once it's ready
+        if self.items:
+            if self._prefetch is None and self.time_in_scene >= self.current_item_duration - self.prefetch_seconds:
+                self._start_prefetch()
+            if self.time_in_scene >= self.current_item_duration:
+                self._advance_prefetched()
             
         # 3. Update Sub-Scene
         if self.current_scene_instance:
@@ -113,6 +256,17 @@ class PlaylistScene(BaseScene):
             except Exception as e:
                 logger.error(f"Error updating sub-scene: {e}")
 
+    def on_settings_changed(self, settings):
+        self._forward_settings(settings)
+
+    def _forward_settings(self, settings):
+        on_settings_changed = getattr(self.current_scene_instance, "on_settings_changed", None)
+        if on_settings_changed:
+            try:
+                on_settings_changed(settings)
+            except Exception as e:
+                logger.error(f"Error in sub-scene on_settings_changed: {e}")
+
     def draw(self, canvas):
         if self.current_scene_instance:
             try:
@@ -121,12 +275,27 @@ class PlaylistScene(BaseScene):
                 logger.error(f"Error drawing sub-scene: {e}")
     
     def _apply_palette(self, palette_id):
-        """Apply a palette to the state manager."""
+        """
+        Show a palette while this playlist plays: a transient override, so
+        advancing items never rewrites config.json or the user's selection.
+        """
         if self.palette_manager:
             palette = self.palette_manager.get_palette(palette_id)
             if palette:
+                self._palette = palette_id
+                if not self._active:
+                    # Still being built (first item): applied by enter()
+                    return
                 try:
-                    self.state_manager.update_setting("selected_palette", palette_id)
+                    self.state_manager.set_overrides(self, selected_palette=palette_id)
                     logger.info(f"Applied palette '{palette_id}' to playlist scene")
                 except Exception as e:
                     logger.error(f"Failed to apply palette {palette_id}: {e}")
+
+
+def _exit_scene(scene):
+    if scene is not None and hasattr(scene, 'exit'):
+        try:
+            scene.exit()
+        except Exception as e:
+            logger.error(f"Error exit sub-scene: {e}")
@@ -1,12 +1,60 @@
 import threading
 import logging
 import os
+from types import MappingProxyType
+from collections.abc import Mapping
 from app.utils.file_ops import FileOps
 
 logger = logging.getLogger(__name__)
 
 CONFIG_PATH = "data/config.json"
 
+
+class SettingsSnapshot(Mapping):
+    """
+    Immutable view of the global settings at one version. A new snapshot is
+    published on every change, so readers (the engine, every frame) just
+    read StateManager.settings: no lock, no copy. Compare `version` to
+    detect changes.
+    """
+
+    __slots__ = ("version", "_data")
+
+    def __init__(self, data, version=0):
+        object.__setattr__(self, "_data", MappingProxyType(dict(data)))
+        object.__setattr__(self, "version", version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SettingsSnapshot is immutable")
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def get(self, key, default=None):
+        # Direct delegation: Mapping.get goes through __getitem__ and try/except
+        return self._data.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"SettingsSnapshot(v{self.version}, {dict(self._data)})"
+
+    def __reduce__(self):
+        # Picklable (sent to scene processes)
+        return (SettingsSnapshot, (dict(self._data), self.version))
+
+    def replace(self, **changes):
+        """A new snapshot with `changes` applied, one version later."""
+        return SettingsSnapshot({**self._data, **changes}, self.version + 1)
+
+
 class StateManager:
     def __init__(self):
         self._lock = threading.Lock()
@@ -18,46 +66,113 @@ class StateManager:
             "selected_palette": "aurora"  # Default color palette ID
         }
         loaded = FileOps.load_json(CONFIG_PATH, defaults)
-        # Merge loaded with defaults to ensure all keys exist
-        self.global_settings = {**defaults, **loaded}
+        # Merge loaded with defaults to ensure all keys exist.
+        # Two layers: the user's settings (persisted to config.json) and transient
+        # overrides (owner -> {key: value}, memory only, e.g. a playlist's palette).
+        # _settings is the effective result that scenes see.
+        self._persisted = {**defaults, **loaded}
+        self._overrides = {}
+        self._settings = SettingsSnapshot(self._persisted)
         
         # Core State
         self.active_scene = None  # The current Scene instance
+        self._pending_scene = None  # (scene, on_applied) waiting for the next frame boundary
+        # Serializes scene swaps; separate from _lock so exit()/enter() never block settings reads
+        self._scene_lock = threading.Lock()
         
         # External Data Store (Shared dictionary for integrations)
         self.external_data = {}
         
+    @property
+    def settings(self):
+        """The current SettingsSnapshot (immutable; lock-free to read)."""
+        return self._settings
+
+    @property
+    def global_settings(self):
+        return self._settings
+
     def get_settings(self):
-        with self._lock:
-            return self.global_settings.copy()
+        """The current settings as a plain (mutable) dict."""
+        return dict(self._settings)
             
     def update_setting(self, key, value):
+        """
+        An explicit (user) change: persisted, and it replaces any transient
+        override of the same key until that override is set again.
+        """
+        # Writers serialize on the lock and publish a new snapshot; readers never take it
         with self._lock:
-            if key not in self.global_settings:
+            if key not in self._persisted:
                 logger.warning(f"Attempted to update unknown setting: {key}")
                 return False
             
-            # Validate value ranges
-            if key == "brightness":
-                value = max(0, min(100, int(value)))
-            elif key == "speed":
-                value = max(0.1, min(2.0, float(value)))
+            value = self._validate(key, value)
             
             # Update value
-            old_value = self.global_settings[key]
-            self.global_settings[key] = value
+            old_value = self._persisted[key]
+            if value == old_value and self._settings[key] == value:
+                return True
+            self._persisted[key] = value
+            for layer in self._overrides.values():
+                layer.pop(key, None)
+            self._publish()
             logger.info(f"Setting updated: {key} = {old_value} -> {value}")
             
-            # Persist immediately (or could be debounced)
-            # For now, immediate save is fine for low frequency updates
-            try:
-                FileOps.save_json(CONFIG_PATH, self.global_settings)
-            except Exception as e:
-                logger.error(f"Failed to persist settings: {e}")
-                return False
+            # Persisted on the background writer: a slider drag sends dozens of updates
+            FileOps.schedule_save_json(CONFIG_PATH, self._persisted)
             
             return True
 
+    def set_overrides(self, owner, **values):
+        """
+        Transient settings on top of the user's, e.g. a playlist item's palette.
+        Scenes see them like any other change, but they are never written to
+        disk. Replaces `owner`'s previous overrides; the most recent owner wins.
+        """
+        with self._lock:
+            layer = {}
+            for key, value in values.items():
+                if key not in self._persisted:
+                    logger.warning(f"Attempted to override unknown setting: {key}")
+                    continue
+                layer[key] = self._validate(key, value)
+            self._overrides.pop(owner, None)
+            if layer:
+                self._overrides[owner] = layer
+            self._publish()
+
+    def clear_overrides(self, owner):
+        """Drop `owner`'s overrides (e.g. when a playlist stops): the user's settings show again."""
+        with self._lock:
+            if self._overrides.pop(owner, None) is not None:
+                self._publish()
+
+    def get_overrides(self):
+        """The settings currently overridden, with their effective values."""
+        with self._lock:
+            merged = {}
+            for layer in self._overrides.values():
+                merged.update(layer)
+            return merged
+
+    def _publish(self):
+        # Caller holds _lock. New snapshot only if the effective settings changed.
+        effective = dict(self._persisted)
+        for layer in self._overrides.values():
+            effective.update(layer)
+        if effective != dict(self._settings):
+            self._settings = SettingsSnapshot(effective, self._settings.version + 1)
+
+    @staticmethod
+    def _validate(key, value):
+        # Validate value ranges
+        if key == "brightness":
+            return max(0, min(100, int(value)))
+        if key == "speed":
+            return max(0.1, min(2.0, float(value)))
+        return value
+
     def get_data(self, key=None):
         with self._lock:
             if key:
@@ -70,25 +185,84 @@ class StateManager:
             logger.debug(f"External Data updated: {key} = {value}")
 
     def set_scene(self, scene_instance):
+        """
+        Swap the active scene immediately, from the calling thread. Supersedes
+        any scene waiting in request_scene(). exit()/enter() run outside the
+        settings lock, so a slow scene never stalls get_settings().
+        """
+        with self._scene_lock:
+            with self._lock:
+                pending, self._pending_scene = self._pending_scene, None
+            if pending is not None:
+                self._discard_pending(pending, scene_instance)
+            self._swap_scene(scene_instance)
+
+    def request_scene(self, scene_instance, on_applied=None):
+        """
+        Queue a scene for the engine to swap in at the next frame boundary
+        (see apply_pending_scene). A newer request or set_scene() supersedes
+        it. on_applied(True) is called once it is live, on_applied(False) if
+        it was superseded (and the superseded scene is exited).
+        """
         with self._lock:
-            if self.active_scene:
-                # Optional: Call an exit/cleanup method on the old scene if it exists
-                if hasattr(self.active_scene, "exit"):
-                    try:
-                        self.active_scene.exit()
-                    except Exception as e:
-                        logger.error(f"Error exiting previous scene: {e}")
-            
-            self.active_scene = scene_instance
-            
-            # Optional: Call an enter/setup method on the new scene
-            if hasattr(self.active_scene, "enter"):
+            superseded, self._pending_scene = self._pending_scene, (scene_instance, on_applied)
+        if superseded is not None:
+            self._discard_pending(superseded, scene_instance)
+
+    def apply_pending_scene(self):
+        """Called by the engine between frames: swap in the requested scene, if any."""
+        if self._pending_scene is None:
+            return False
+        with self._scene_lock:
+            with self._lock:
+                pending, self._pending_scene = self._pending_scene, None
+            if pending is None:
+                return False
+            self._swap_scene(pending[0])
+        self._notify_pending(pending, True)
+        return True
+
+    def _swap_scene(self, scene_instance):
+        # Caller holds _scene_lock (not _lock): exit/enter may take a while
+        old_scene = self.active_scene
+        if old_scene:
+            # Optional: Call an exit/cleanup method on the old scene if it exists
+            if hasattr(old_scene, "exit"):
                 try:
-                    self.active_scene.enter(self) # Pass self (StateManager) context if needed
+                    old_scene.exit()
                 except Exception as e:
-                    logger.error(f"Error entering new scene: {e}")
-                    
-            logger.info(f"Active scene set to: {scene_instance}")
+                    logger.error(f"Error exiting previous scene: {e}")
+        
+        # Optional: Call an enter/setup method on the new scene
+        if hasattr(scene_instance, "enter"):
+            try:
+                scene_instance.enter(self) # Pass self (StateManager) context if needed
+            except Exception as e:
+                logger.error(f"Error entering new scene: {e}")
+        
+        self.active_scene = scene_instance
+        logger.info(f"Active scene set to: {scene_instance}")
+
+    @classmethod
+    def _discard_pending(cls, pending, replacement):
+        # A superseded scene never became active: release what it holds (a scene
+        # process, a clip stream). Called outside _lock.
+        scene_instance = pending[0]
+        if scene_instance is not replacement and hasattr(scene_instance, "exit"):
+            try:
+                scene_instance.exit()
+            except Exception as e:
+                logger.error(f"Error exiting superseded scene: {e}")
+        cls._notify_pending(pending, False)
+
+    @staticmethod
+    def _notify_pending(pending, applied):
+        scene_instance, on_applied = pending
+        if on_applied is not None:
+            try:
+                on_applied(applied)
+            except Exception as e:
+                logger.error(f"Error in scene activation callback: {e}")
 
     def get_active_scene(self):
         # Determine if we need to lock here. 
@@ -101,27 +275,14 @@ class StateManager:
         Get colors from the selected palette.
         Returns a list of RGB tuples [(r, g, b), ...] or None if palette not found.
         """
-        with self._lock:
-            palette_id = self.global_settings.get("selected_palette", "aurora")
-        
-        if palette_manager:
-            palette = palette_manager.get_palette(palette_id)
-            if palette and "colors" in palette:
-                # Convert hex colors to RGB tuples
-                colors = []
-                for hex_color in palette["colors"]:
-                    try:
-                        # Remove # if present
-                        hex_color = hex_color.lstrip("#")
-                        # Convert to RGB
-                        r = int(hex_color[0:2], 16)
-                        g = int(hex_color[2:4], 16)
-                        b = int(hex_color[4:6], 16)
-                        colors.append((r, g, b))
-                    except (ValueError, IndexError):
-                        logger.warning(f"Invalid color format in palette: {hex_color}")
-                        continue
-                return colors if colors else None
-        
-        return None
+        lut = self.get_palette_lut(palette_manager)
+        return list(lut.colors) if lut else None
 
+    def get_palette_lut(self, palette_manager=None):
+        """
+        The selected palette compiled into gradient lookup tables (PaletteLUT),
+        or None. Cached by the palette manager: cheap enough to call per frame.
+        """
+        if not palette_manager:
+            return None
+        return palette_manager.get_lut(self._settings.get("selected_palette", "aurora"))
@@ -0,0 +1,286 @@
+"""
+Background sampling of system health for the dashboard.
+
+A single thread samples CPU, RAM, CPU temperature, engine FPS and the mean
+duration of each frame phase at a fixed cadence (MATRIX_STATS_INTERVAL_S,
+default 1 s) into fixed-size ring buffers:
+
+    recent:  one row per sample, the last hour
+    minutes: one row per minute (mean of its samples), the last day
+
+Requests never measure anything themselves: latest() is the last sample
+and history() downsamples a ring into at most `points` buckets.
+
+Rows are timestamped with time.monotonic(), so the rings stay ordered when the
+wall clock steps (NTP sync, a Pi without an RTC); times are converted to epoch
+seconds only when a response is built.
+"""
+import os
+import time
+import math
+import logging
+import threading
+import numpy as np
+
+try:
+    import psutil
+except ImportError:  # Stats read as unavailable (None)
+    psutil = None
+
+from app.core.frame_profiler import PHASES
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_ENV = "MATRIX_STATS_INTERVAL_S"
+DEFAULT_INTERVAL = 1.0
+MIN_INTERVAL = 0.1
+RECENT_SECONDS = 3600
+MINUTES_SECONDS = 24 * 3600
+# Temperature sensors are read from sysfs: slower than the other stats, and slow to change
+TEMP_INTERVAL = 5.0
+
+# Sampled fields (ring buffer columns); phase timings are the mean over the interval, in ms
+FIELDS = ("cpu_percent", "ram_percent", "ram_used_mb", "cpu_temp", "fps") + tuple(f"{phase}_ms" for phase in PHASES)
+
+# History ranges: window in seconds and the ring it is read from
+RANGES = {
+    "minute": (60, "recent"),
+    "hour": (3600, "recent"),
+    "day": (24 * 3600, "minutes"),
+}
+DEFAULT_POINTS = 120
+MAX_POINTS = 1440
+
+
+def _interval_from_env():
+    value = os.environ.get(INTERVAL_ENV, DEFAULT_INTERVAL)
+    try:
+        return max(MIN_INTERVAL, float(value))
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid {INTERVAL_ENV}={value!r}, using {DEFAULT_INTERVAL}s")
+        return DEFAULT_INTERVAL
+
+
+class _SeriesRing:
+    """
+    Fixed-size ring of timestamped float32 rows (NaN = no value). No allocation
+    after construction. Timestamps must be non-decreasing (monotonic clock).
+    """
+
+    def __init__(self, capacity, width):
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._rows = np.full((capacity, width), np.nan, dtype=np.float32)
+        self._capacity = capacity
+        self._index = 0
+        self._count = 0
+
+    def append(self, timestamp, row):
+        self._times[self._index] = timestamp
+        self._rows[self._index] = row
+        self._index = (self._index + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def since(self, start):
+        """(times, rows) at or after `start`, oldest first (copies)."""
+        if self._count < self._capacity:
+            times, rows = self._times[:self._count], self._rows[:self._count]
+        else:
+            order = np.r_[self._index:self._capacity, 0:self._index]
+            times, rows = self._times[order], self._rows[order]
+        first = int(np.searchsorted(times, start))
+        return times[first:].copy(), rows[first:].copy()
+
+    def nbytes(self):
+        return self._times.nbytes + self._rows.nbytes
+
+
+class SystemMonitor:
+    """
+    Samples system and engine stats on its own thread. `engine` is optional
+    (FPS and frame timings are NaN without it).
+    """
+
+    def __init__(self, engine=None, interval=None):
+        self.engine = engine
+        self.interval = interval or _interval_from_env()
+        width = len(FIELDS)
+        self._recent = _SeriesRing(max(1, int(math.ceil(RECENT_SECONDS / self.interval))), width)
+        self._minutes = _SeriesRing(MINUTES_SECONDS // 60, width)
+        self._lock = threading.Lock()
+        self._latest = None
+        self._ram_total_mb = None
+        self._cpu_temp = None
+        self._temp_checked = float("-inf")
+        self._temp_sensor = None
+        self._phase_totals = {}
+        # Samples of the minute being accumulated
+        self._minute_start = None
+        self._minute_sum = np.zeros(width, dtype=np.float64)
+        self._minute_count = np.zeros(width, dtype=np.int64)
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = 0
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if psutil is not None:
+            # The first cpu_percent() call has nothing to compare against: prime it
+            psutil.cpu_percent(interval=None)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _run(self):
+        logger.info(f"System monitor started (every {self.interval}s)")
+        next_due = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"System stats sample failed: {e}")
+            # Fixed cadence: a slow sample doesn't shift the ones after it
+            next_due += self.interval
+            delay = next_due - time.monotonic()
+            if delay < 0:
+                next_due = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+
+    # --- sampling (monitor thread) ---
+
+    def sample(self):
+        """Take one sample now and record it. Returns it as a dict."""
+        now = time.monotonic()
+        values = dict.fromkeys(FIELDS, None)
+        if psutil is not None:
+            # Non-blocking: CPU use since the previous call, i.e. over the last interval
+            values["cpu_percent"] = psutil.cpu_percent(interval=None)
+            memory = psutil.virtual_memory()
+            values["ram_percent"] = memory.percent
+            values["ram_used_mb"] = memory.used / (1024 * 1024)
+            self._ram_total_mb = memory.total / (1024 * 1024)
+            values["cpu_temp"] = self._read_temp(now)
+        if self.engine is not None:
+            values["fps"] = self.engine.get_current_fps()
+            values.update(self._phase_means())
+
+        row = np.array([np.nan if values[field] is None else values[field] for field in FIELDS], dtype=np.float32)
+        with self._lock:
+            self._recent.append(now, row)
+            self._roll_minute(now, row)
+            self._latest = (now, values)
+            self.samples += 1
+        return values
+
+    def _read_temp(self, now):
+        if now - self._temp_checked < TEMP_INTERVAL:
+            return self._cpu_temp
+        self._temp_checked = now
+        try:
+            temps = psutil.sensors_temperatures()
+        except (AttributeError, OSError):
+            # Temperature sensors not available
+            temps = {}
+        if self._temp_sensor is None:
+            # Raspberry Pi, then x86
+            self._temp_sensor = next((name for name in ("cpu_thermal", "coretemp") if name in temps), None)
+        readings = temps.get(self._temp_sensor) if self._temp_sensor else None
+        self._cpu_temp = readings[0].current if readings else None
+        return self._cpu_temp
+
+    def _phase_means(self):
+        # Mean duration of each phase over the frames since the previous sample,
+        # from the profiler's running totals (which restart when the scene changes)
+        totals = self.engine.get_phase_totals()
+        means = {}
+        for phase, (count, total_us) in totals.items():
+            prev_count, prev_total = self._phase_totals.get(phase, (0, 0))
+            if count < prev_count:
+                prev_count, prev_total = 0, 0
+            frames = count - prev_count
+            means[f"{phase}_ms"] = (total_us - prev_total) / frames / 1000 if frames else None
+        self._phase_totals = totals
+        return means
+
+    def _roll_minute(self, now, row):
+        # Caller holds _lock
+        minute = now - now % 60
+        if self._minute_start is not None and minute != self._minute_start:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = self._minute_sum / self._minute_count
+            self._minutes.append(self._minute_start, mean.astype(np.float32))
+            self._minute_sum[:] = 0
+            self._minute_count[:] = 0
+        self._minute_start = minute
+        valid = ~np.isnan(row)
+        self._minute_sum[valid] += row[valid]
+        self._minute_count += valid
+
+    # --- readers (any thread) ---
+
+    def latest(self):
+        """The last sample as {field: value (None if unavailable), "ram_total_mb", "time"}, or None."""
+        latest = self._latest
+        if latest is None:
+            return None
+        timestamp, values = latest
+        result = {field: _round(value) for field, value in values.items()}
+        result["ram_total_mb"] = _round(self._ram_total_mb)
+        result["time"] = timestamp + _epoch_offset()
+        return result
+
+    def history(self, range_name="hour", points=DEFAULT_POINTS):
+        """
+        Series for one of RANGES, downsampled by averaging into at most
+        `points` buckets: {"range", "interval_s", "series": {"time": [...], field: [...]}}.
+        """
+        window, ring_name = RANGES[range_name]
+        points = max(1, min(MAX_POINTS, int(points)))
+        with self._lock:
+            ring = self._recent if ring_name == "recent" else self._minutes
+            times, rows = ring.since(time.monotonic() - window)
+        step = max(1, int(math.ceil(len(times) / points)))
+        if step > 1:
+            starts = np.arange(0, len(times), step)
+            valid = ~np.isnan(rows)
+            sums = np.add.reduceat(np.where(valid, rows, 0).astype(np.float64), starts, axis=0)
+            counts = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rows = sums / counts
+            times = times[starts]
+        offset = _epoch_offset()
+        series = {"time": [round(float(t) + offset, 3) for t in times]}
+        for column, field in enumerate(FIELDS):
+            series[field] = [_round(value) for value in rows[:, column].tolist()]
+        base_interval = self.interval if ring_name == "recent" else 60.0
+        return {"range": range_name, "interval_s": base_interval * step, "series": series}
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "interval_s": self.interval,
+                "samples": self.samples,
+                "running": self._thread is not None,
+                "buffer_bytes": self._recent.nbytes() + self._minutes.nbytes(),
+            }
+
+
+def _epoch_offset():
+    # Monotonic -> epoch seconds, at the current wall clock
+    return time.time() - time.monotonic()
+
+
+def _round(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return round(float(value), 2)
@@ -17,6 +17,12 @@ from app.core.library_manager import LibraryManager
 from app.core.playlist_manager import PlaylistManager
 from app.core.palette_manager import PaletteManager
 from app.core.app_settings_manager import AppSettingsManager
+from app.core.scene_activator import SceneActivator
+from app.core.scene_catalog import SceneCatalog
+from app.core.home_assistant import HomeAssistantService
+from app.core.system_monitor import SystemMonitor
+from app.utils.file_watcher import FileWatcher
+from app.utils.file_ops import FileOps
 
 # Import Routers
 from app.routers import system, scenes, integrations, upload, playlists, palettes, settings
@@ -74,6 +80,11 @@ async def lifespan(app: FastAPI):
         # (using private attribute to avoid circular dependency)
         state_manager._palette_manager = palette_manager
         
+        # Sensor values for scenes are fetched in the background, never on the render thread
+        home_assistant = HomeAssistantService(state_manager, app_settings_manager)
+        state_manager._home_assistant = home_assistant
+        home_assistant.start()
+        
         # Store in app.state for routers to access
         app.state.matrix_driver = matrix
         app.state.state_manager = state_manager
@@ -84,6 +95,32 @@ async def lifespan(app: FastAPI):
         app.state.playlist_manager = playlist_manager
         app.state.palette_manager = palette_manager
         app.state.app_settings_manager = app_settings_manager
+        app.state.home_assistant = home_assistant
+        
+        # CPU/RAM/temperature/FPS history for the dashboard, sampled off the request path
+        system_monitor = SystemMonitor(engine)
+        system_monitor.start()
+        app.state.system_monitor = system_monitor
+        app.state.scene_activator = SceneActivator(loader, clip_loader, state_manager)
+        
+        scene_catalog = SceneCatalog(loader, clip_loader, library_manager)
+        app.state.scene_catalog = scene_catalog
+        
+        # Hot reload: recompile edited scripts as soon as they are saved.
+        # The catalog follows all three scene directories.
+        def on_script_changed(filename):
+            loader.on_file_changed(filename)
+            scene_catalog.update(filename)
+        
+        app.state.file_watchers = [
+            FileWatcher(loader.scripts_dir, on_script_changed, extensions=[".py"]),
+            FileWatcher(clip_loader.clips_dir, scene_catalog.update, extensions=[".gif", ".zip"]),
+            FileWatcher(scene_catalog.thumbnails_dir, scene_catalog.on_thumbnail_changed, extensions=[".png"]),
+        ]
+        for watcher in app.state.file_watchers:
+            watcher.start()
+        # Compiled clips of sources deleted or replaced while the server was down
+        clip_loader.start_cache_prune()
         
         # Load Initial Scene
         scripts = loader.list_available_scripts()
@@ -103,7 +140,22 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Engine...")
+    app.state.scene_activator.shutdown()
+    app.state.home_assistant.stop()
+    app.state.system_monitor.stop()
+    for watcher in app.state.file_watchers:
+        watcher.stop()
     app.state.engine.stop()
+    # Settings/library/playlist changes from the last moments are still on the writer
+    if not FileOps.flush_pending():
+        logger.error(f"Some data files could not be saved: {FileOps.get_write_status()['failed']}")
+    # Let the active scene clean up (stops its child process under MATRIX_SCENE_RUNTIME=process)
+    active_scene = app.state.state_manager.get_active_scene()
+    if active_scene is not None and hasattr(active_scene, "exit"):
+        try:
+            active_scene.exit()
+        except Exception as e:
+            logger.error(f"Error exiting active scene: {e}")
 
 app = FastAPI(title="Lajos Matrix Framework", lifespan=lifespan)
 
@@ -9,17 +9,25 @@ class SystemSettings(BaseModel):
     active_scene_filename: Optional[str] = None
     selected_palette: Optional[str] = None
     selected_palette_data: Optional[Dict[str, Any]] = None
+    overrides: Optional[Dict[str, Any]] = None  # Transient settings (e.g. a playlist's palette), not saved
     version: Optional[str] = None
     fps: Optional[float] = None
 
 class SceneItem(BaseModel):
     filename: str
     name: str
-    type: str # "script" or "clip"
+    type: str # "script", "live" or "clip"
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+    has_thumbnail: Optional[bool] = None
 
 class SceneList(BaseModel):
     scenes: List[SceneItem]
     active_scene: Optional[str] = None
+    total: Optional[int] = None  # Matching scenes across all pages
+    offset: int = 0
+    limit: Optional[int] = None
+    version: Optional[int] = None  # Catalog version; changes whenever any scene does
 
 class SetSceneRequest(BaseModel):
     filename: str
@@ -11,3 +11,8 @@ def update_data(request: Request, data: IntegrationData):
     state_manager.set_data(data.key, data.value)
     
     return {"status": "ok", "key": data.key, "value": data.value}
+
+@router.get("/home-assistant")
+def get_home_assistant_status(request: Request):
+    """Entities being polled for scenes, with fetch/failure counters."""
+    return request.app.state.home_assistant.get_stats()
@@ -99,37 +99,12 @@ async def play_playlist(request: Request, playlist_id: str):
 @router.post("/auto-generate-all")
 async def auto_generate_all_playlist(request: Request):
     """Automatically create/update a playlist with all available scenes"""
-    loader = request.app.state.script_loader
-    clip_loader = request.app.state.clip_loader
-    lib_mgr = request.app.state.library_manager
-    
-    scripts = loader.list_available_scripts()
-    clips = clip_loader.list_available_clips()
-    
-    scene_items = []
+    catalog = request.app.state.scene_catalog
     
-    # Add all scripts
-    for s in scripts:
-        meta = lib_mgr.get_metadata(s)
-        display_name = meta.get("title", s.replace(".py", "").replace("_", " ").title())
-        # Use metadata type if available (e.g., "live"), otherwise default to "script"
-        scene_type = meta.get("type", "script")
-        scene_items.append({
-            "filename": s,
-            "name": display_name,
-            "type": scene_type
-        })
-    
-    # Add all clips
-    for c in clips:
-        meta = lib_mgr.get_metadata(c)
-        clean_name = os.path.splitext(c)[0].replace("_", " ").title()
-        display_name = meta.get("title", clean_name)
-        scene_items.append({
-            "filename": c,
-            "name": display_name,
-            "type": "clip"
-        })
+    # Scripts (incl. "live") first, then clips, each by filename
+    scenes, _ = catalog.list(sort="filename")
+    scene_items = [scene for scene in scenes if scene["type"] != "clip"]
+    scene_items += [scene for scene in scenes if scene["type"] == "clip"]
     
     if not scene_items:
         raise HTTPException(status_code=400, detail="No scenes available")
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, HTTPException, Request, UploadFile, File
+from fastapi import APIRouter, HTTPException, Request, Response, UploadFile, File, Query
+from fastapi.responses import JSONResponse
+from typing import Optional
 from app.models.schemas import SceneList, SetSceneRequest
 from app.core.state_manager import StateManager
 from app.core.loaders.script_loader import ScriptLoader
-from app.core.loaders.clip_loader import ClipLoader
+from app.core.loaders.clip_loader import ClipLoader, GifScene
 from app.core.engine import Engine
 from app.core.library_manager import LibraryManager
 from app.core.playlist_manager import PlaylistManager
+from app.core.scene_activator import SceneActivator
+from app.core.scene_catalog import SceneCatalog, SORT_KEYS
+from app.utils.http_cache import HttpCache
 import os
+import time
+import zlib
 import logging
 import threading
 
@@ -14,40 +21,26 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/scenes", tags=["Scenes"])
 
+# Catalog versions restart with the process: scope listing ETags to this run
+_CATALOG_EPOCH = format(int(time.time()), "x")
+
 @router.get("/", response_model=SceneList)
-def list_scenes(request: Request):
-    loader: ScriptLoader = request.app.state.script_loader
-    clip_loader: ClipLoader = request.app.state.clip_loader
+def list_scenes(
+    request: Request,
+    response: Response,
+    type: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: str = Query("name", enum=list(SORT_KEYS)),
+    order: str = Query("asc", enum=["asc", "desc"]),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+):
+    """
+    Scenes from the catalog index. Optional filtering (type, q matches name
+    or filename), sorting and paging; without `limit` every match is returned.
+    """
+    catalog: SceneCatalog = request.app.state.scene_catalog
     state_manager: StateManager = request.app.state.state_manager
-    lib_mgr = request.app.state.library_manager
-    
-    scripts = loader.list_available_scripts()
-    clips = clip_loader.list_available_clips()
-    
-    scene_items = []
-    
-    for s in scripts:
-        meta = lib_mgr.get_metadata(s)
-        display_name = meta.get("title", s.replace(".py", "").replace("_", " ").title())
-        # Check if scene has a custom type (e.g., "live" for Home Assistant animations)
-        scene_type = meta.get("type", "script")
-        scene_items.append({
-            "filename": s,
-            "name": display_name,
-            "type": scene_type
-        })
-        
-    for c in clips:
-        meta = lib_mgr.get_metadata(c)
-        # For clips, default clean name is filename without ext
-        clean_name = os.path.splitext(c)[0].replace("_", " ").title()
-        display_name = meta.get("title", clean_name)
-        
-        scene_items.append({
-            "filename": c,
-            "name": display_name,
-            "type": "clip"
-        })
         
     active = state_manager.get_active_scene()
     active_name = None
@@ -57,107 +50,128 @@ def list_scenes(request: Request):
         # We might want to fix that in StateManager or BaseScene.
         active_name = active.__class__.__name__
 
+    # Same catalog version + same query + same active scene = same body
+    version = catalog.version
+    query_key = format(zlib.crc32(f"{request.url.query}|{active_name}".encode()), "x")
+    headers = HttpCache.headers(etag=HttpCache.etag("scenes", _CATALOG_EPOCH, version, query_key))
+    if HttpCache.is_not_modified(request, headers["ETag"]):
+        return HttpCache.not_modified(headers)
+    response.headers.update(headers)
+
+    try:
+        scene_items, total = catalog.list(
+            scene_type=type, query=q, sort=sort, descending=(order == "desc"), offset=offset, limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "scenes": scene_items,
-        "active_scene": active_name
+        "active_scene": active_name,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "version": version,
     }
 
+@router.get("/errors")
+def get_script_errors(request: Request):
+    """Scripts whose last load, reload or instantiation failed, with the error."""
+    loader: ScriptLoader = request.app.state.script_loader
+    return {"errors": loader.get_load_errors()}
+
+# Longest a request may block waiting for an activation job (?wait=)
+MAX_ACTIVATION_WAIT = 10.0
+
 @router.post("/activate")
-def activate_scene(request: Request, req: SetSceneRequest):
-    try:
-        loader: ScriptLoader = request.app.state.script_loader
-        clip_loader: ClipLoader = request.app.state.clip_loader
-        state_manager: StateManager = request.app.state.state_manager
-        
-        if not req.filename:
-            raise HTTPException(status_code=400, detail="Filename is required")
-        
-        # Security: Prevent directory traversal
-        if ".." in req.filename or "/" in req.filename or "\\" in req.filename:
-            raise HTTPException(status_code=400, detail="Invalid filename")
-        
-        scene_instance = None
-        
-        # Try to load as script first
-        try:
-            scene_class = loader.load_script(req.filename)
-            if scene_class:
-                scene_instance = loader.get_scene(req.filename)
-        except Exception as e:
-            logger.debug(f"Failed to load as script {req.filename}: {e}")
-        
-        # If script loading failed, try as clip
-        if not scene_instance:
-            try:
-                scene_instance = clip_loader.load_clip(req.filename)
-            except Exception as e:
-                logger.debug(f"Failed to load as clip {req.filename}: {e}")
-        
-        if not scene_instance:
-            raise HTTPException(status_code=404, detail=f"Scene '{req.filename}' not found or could not be loaded")
-        
-        # Set the scene
+async def activate_scene(request: Request, req: SetSceneRequest, wait: float = 0.0):
+    """
+    Start activating a scene in the background. Returns the job (200 once it
+    finished, with status active/failed/superseded; 202 while it is still
+    running); poll GET /activate/{job_id}, or pass ?wait=seconds to wait
+    until the scene is live. Waiting never holds a worker thread.
+    """
+    loader: ScriptLoader = request.app.state.script_loader
+    clip_loader: ClipLoader = request.app.state.clip_loader
+    activator: SceneActivator = request.app.state.scene_activator
+    
+    if not req.filename:
+        raise HTTPException(status_code=400, detail="Filename is required")
+    
+    # Security: Prevent directory traversal
+    if ".." in req.filename or "/" in req.filename or "\\" in req.filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    
+    # Cheap existence check up front; loading errors are reported by the job
+    if not (os.path.exists(os.path.join(loader.scripts_dir, req.filename))
+            or os.path.exists(os.path.join(clip_loader.clips_dir, req.filename))):
+        raise HTTPException(status_code=404, detail=f"Scene '{req.filename}' not found or could not be loaded")
+    
+    filename = req.filename
+    job = activator.submit(filename, on_live=lambda scene: _schedule_thumbnail_capture(request.app.state, filename, scene))
+    return await _job_response(job, wait)
+
+@router.get("/activate/{job_id}")
+async def get_activation_job(job_id: str, request: Request, wait: float = 0.0):
+    """Activation job status; ?wait=seconds blocks until it finishes (or the wait runs out)."""
+    job = request.app.state.scene_activator.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Activation job not found")
+    return await _job_response(job, wait)
+
+async def _job_response(job, wait):
+    if wait > 0 and not job.finished:
+        await job.wait_async(min(wait, MAX_ACTIVATION_WAIT))
+    return JSONResponse(job.to_dict(), status_code=200 if job.finished else 202)
+
+def _schedule_thumbnail_capture(app_state, filename, scene_instance):
+    """Schedule automatic thumbnail generation for scripts if no thumbnail exists."""
+    state_manager: StateManager = app_state.state_manager
+    lib_mgr: LibraryManager = app_state.library_manager
+    engine: Engine = app_state.engine
+    
+    # Check if this is a script (not a clip: GIF or image sequence) and has no thumbnail
+    if isinstance(scene_instance, GifScene) or lib_mgr.thumbnail_exists(filename):
+        return
+    logger.info(f"Scheduling thumbnail capture for script {filename} in 15 seconds")
+    
+    def capture_thumbnail():
+        """Capture thumbnail after 15 seconds if scene is still active."""
         try:
-            state_manager.set_scene(scene_instance)
-            logger.info(f"Activated scene: {req.filename}")
-            
-            # Schedule automatic thumbnail generation for scripts if no thumbnail exists
-            lib_mgr: LibraryManager = request.app.state.library_manager
-            engine: Engine = request.app.state.engine
-            
-            # Check if this is a script (not a clip) and has no thumbnail
-            if scene_instance.__class__.__name__ != "GifScene" and not lib_mgr.thumbnail_exists(req.filename):
-                logger.info(f"Scheduling thumbnail capture for script {req.filename} in 15 seconds")
-                
-                def capture_thumbnail():
-                    """Capture thumbnail after 15 seconds if scene is still active."""
-                    try:
-                        # Check if this scene is still active
-                        current_scene = state_manager.get_active_scene()
-                        if current_scene and hasattr(current_scene, 'filename') and current_scene.filename == req.filename:
-                            # Get preview frame from engine
-                            preview_frame = engine.get_preview_frame()
-                            if preview_frame:
-                                # Convert PNG bytes to PIL Image
-                                from PIL import Image
-                                import io
-                                img = Image.open(io.BytesIO(preview_frame))
-                                
-                                # Preview frames are scaled 4x (256x256), scale down to original 64x64
-                                if img.size == (256, 256):
-                                    # Scale down to 64x64 (original matrix size)
-                                    img = img.resize((64, 64), Image.Resampling.NEAREST)
-                                elif img.size != (64, 64):
-                                    # If unexpected size, resize to 64x64
-                                    img = img.resize((64, 64), Image.Resampling.LANCZOS)
-                                
-                                # Save thumbnail (LibraryManager will resize to 128x128 for thumbnail)
-                                if lib_mgr.save_thumbnail(req.filename, img):
-                                    logger.info(f"Auto-generated thumbnail for script {req.filename}")
-                                else:
-                                    logger.warning(f"Failed to save auto-generated thumbnail for {req.filename}")
-                            else:
-                                logger.debug(f"No preview frame available for thumbnail capture of {req.filename}")
-                        else:
-                            logger.debug(f"Scene {req.filename} is no longer active, skipping thumbnail capture")
-                    except Exception as e:
-                        logger.error(f"Error during automatic thumbnail capture for {req.filename}: {e}")
-                
-                # Schedule thumbnail capture after 15 seconds
-                timer = threading.Timer(15.0, capture_thumbnail)
-                timer.daemon = True  # Don't prevent shutdown
-                timer.start()
-            
+            # Check if this scene is still active
+            current_scene = state_manager.get_active_scene()
+            if current_scene and hasattr(current_scene, 'filename') and current_scene.filename == filename:
+                # Get preview frame from engine (capture is lazy: wait for a fresh one)
+                preview_frame = engine.get_preview_frame(wait=1.0)
+                if preview_frame:
+                    # Convert PNG bytes to PIL Image
+                    from PIL import Image
+                    import io
+                    img = Image.open(io.BytesIO(preview_frame))
+                    
+                    # Preview frames are scaled 4x (256x256), scale down to original 64x64
+                    if img.size == (256, 256):
+                        # Scale down to 64x64 (original matrix size)
+                        img = img.resize((64, 64), Image.Resampling.NEAREST)
+                    elif img.size != (64, 64):
+                        # If unexpected size, resize to 64x64
+                        img = img.resize((64, 64), Image.Resampling.LANCZOS)
+                    
+                    # Save thumbnail (LibraryManager will resize to 128x128 for thumbnail)
+                    if lib_mgr.save_thumbnail(filename, img):
+                        logger.info(f"Auto-generated thumbnail for script {filename}")
+                    else:
+                        logger.warning(f"Failed to save auto-generated thumbnail for {filename}")
+                else:
+                    logger.debug(f"No preview frame available for thumbnail capture of {filename}")
+            else:
+                logger.debug(f"Scene {filename} is no longer active, skipping thumbnail capture")
         except Exception as e:
-            logger.error(f"Failed to activate scene {req.filename}: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to activate scene: {str(e)}")
-        
-        return {"status": "ok", "active_scene": req.filename}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error activating scene: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+            logger.error(f"Error during automatic thumbnail capture for {filename}: {e}")
+    
+    # Schedule thumbnail capture after 15 seconds
+    timer = threading.Timer(15.0, capture_thumbnail)
+    timer.daemon = True  # Don't prevent shutdown
+    timer.start()
 
 @router.delete("/{filename}")
 def delete_scene(filename: str, request: Request):
@@ -179,6 +193,9 @@ def delete_scene(filename: str, request: Request):
         raise HTTPException(status_code=404, detail="File not found")
         
     try:
+        if target == clip_path_file:
+            # Before removing it: its compiled cache files are found by content hash
+            request.app.state.clip_loader.cache.purge(target)
         os.remove(target)
         
         # Cleanup thumbnail
@@ -188,6 +205,7 @@ def delete_scene(filename: str, request: Request):
             
         # Cleanup metadata
         request.app.state.library_manager.delete_entry(filename)
+        request.app.state.scene_catalog.update(filename)
         
         return {"status": "deleted", "filename": filename}
     except Exception as e:
@@ -230,6 +248,8 @@ def rename_scene(filename: str, request: Request, payload: dict):
     try:
         # 1. Rename File
         os.rename(src, dest)
+        if src == clip_path:
+            request.app.state.clip_loader.cache.invalidate(src)
         
         # 2. Rename Thumbnail if exists
         # Convention: thumbnails/{filename}.png
@@ -248,6 +268,7 @@ def rename_scene(filename: str, request: Request, payload: dict):
         # Or keep old title? User intent: "Rename". Usually implies changing display name too.
         clean_title = os.path.splitext(new_name)[0].replace("_", " ").title()
         lib_mgr.update_metadata(new_name, title=clean_title)
+        request.app.state.scene_catalog.update(filename, new_name)
         
         # 4. Update Playlists that reference this scene
         playlist_mgr: PlaylistManager = request.app.state.playlist_manager
@@ -274,6 +295,7 @@ def upload_thumbnail(filename: str, request: Request, file: UploadFile = File(..
     try:
         with open(target_path, "wb") as f:
             f.write(file.file.read())
+        request.app.state.scene_catalog.update(filename)
         return {"status": "uploaded", "thumbnail": f"{filename}.png"}
     except Exception as e:
          raise HTTPException(status_code=500, detail=str(e))
@@ -281,8 +303,15 @@ def upload_thumbnail(filename: str, request: Request, file: UploadFile = File(..
 from fastapi.responses import FileResponse
 
 @router.get("/thumbnails/{filename}")
-def get_thumbnail(filename: str):
+def get_thumbnail(filename: str, request: Request):
     thumb_path = os.path.join("scenes", "thumbnails", f"{filename}.png")
-    if os.path.exists(thumb_path):
-        return FileResponse(thumb_path)
-    raise HTTPException(status_code=404, detail="Thumbnail not found")
+    try:
+        st = os.stat(thumb_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    
+    # Validators keyed on mtime/size: unchanged thumbnails revalidate with a 304
+    headers = HttpCache.headers(etag=HttpCache.file_etag(st), last_modified=st.st_mtime)
+    if HttpCache.is_not_modified(request, headers["ETag"], st.st_mtime):
+        return HttpCache.not_modified(headers)
+    return FileResponse(thumb_path, headers=headers, stat_result=st)
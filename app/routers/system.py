@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Response, HTTPException
+from fastapi import APIRouter, Response, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from app.core.state_manager import StateManager
 from app.models.schemas import SystemSettings
 from app.core.engine import Engine
+from app.core.scene_runtime import ProcessScene, RuntimeLimits
+from app.core.system_monitor import RANGES, DEFAULT_POINTS
+from app.core.preview_stream import StreamSubscriber, KIND_WEBSOCKET, KIND_MJPEG
+from app.utils.http_cache import HttpCache
+from app.utils.file_ops import FileOps
 import logging
 import os
 import io
+import time
+import asyncio
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/system", tags=["System"])
 
+# Frame sequence numbers restart with the process: scope preview ETags to this run
+_PREVIEW_EPOCH = format(int(time.time()), "x")
+
 # Dependency injection for StateManager is a bit tricky in FastAPI without a global dependency override or singletons.
 # Since we created state_manager in main.py, we can pass it to the router or use a singleton pattern.
 # For simplicity in this scale, we will rely on a singleton-ish access or dependency injection from main. 
@@ -100,6 +111,7 @@ def get_status(request: Request):
         "active_scene_filename": active_scene_filename,
         "selected_palette": selected_palette_id,
         "selected_palette_data": selected_palette,
+        "overrides": state_manager.get_overrides(),
         "version": get_version(),
         "fps": round(current_fps, 1)
     }
@@ -122,8 +134,11 @@ def update_settings(request: Request, settings: SystemSettings):
     state_manager.update_setting("speed", settings.speed)
     
     # Selected Palette (if provided)
+    # (the dashboard posts back what it read, which may be a playlist's palette override:
+    # only a palette that differs from the one showing is a user choice)
     if hasattr(settings, 'selected_palette') and settings.selected_palette:
-        state_manager.update_setting("selected_palette", settings.selected_palette)
+        if settings.selected_palette != state_manager.settings.get("selected_palette"):
+            state_manager.update_setting("selected_palette", settings.selected_palette)
     
     return {"status": "ok", "settings": settings}
 
@@ -132,10 +147,14 @@ def get_preview(request: Request):
     """
     Get the latest preview frame as a PNG image.
     Returns a PNG image that can be displayed in the browser.
+    The ETag is the engine frame sequence number: polling with If-None-Match
+    gets a 304 (no body) until a new frame has been captured.
     """
     try:
         engine: Engine = request.app.state.engine
-        preview_frame = engine.get_preview_frame()
+        # Capture only runs while the preview is polled: after an idle period,
+        # wait briefly for the render thread to hand over a fresh frame
+        seq, preview_frame = engine.get_preview_png(wait=0.25)
         
         if preview_frame is None:
             # Return a placeholder/blank image if no frame available yet
@@ -143,9 +162,12 @@ def get_preview(request: Request):
             blank_img = Image.new('RGB', (64, 64), color='black')
             buffer = io.BytesIO()
             blank_img.resize((256, 256), Image.Resampling.NEAREST).save(buffer, format='PNG')
-            preview_frame = buffer.getvalue()
+            return Response(content=buffer.getvalue(), media_type="image/png", headers={"Cache-Control": "no-store"})
         
-        return Response(content=preview_frame, media_type="image/png")
+        headers = HttpCache.headers(etag=HttpCache.etag("preview", _PREVIEW_EPOCH, seq))
+        if HttpCache.is_not_modified(request, headers["ETag"]):
+            return HttpCache.not_modified(headers)
+        return Response(content=preview_frame, media_type="image/png", headers=headers)
     except Exception as e:
         logger.error(f"Error serving preview frame: {e}")
         # Return a small error image
@@ -156,38 +178,108 @@ def get_preview(request: Request):
         error_img.resize((256, 256), Image.Resampling.NEAREST).save(buffer, format='PNG')
         return Response(content=buffer.getvalue(), media_type="image/png")
 
-@router.get("/stats")
-def get_system_stats():
+@router.websocket("/preview/ws")
+async def preview_websocket(websocket: WebSocket):
     """
-    Get system performance statistics (CPU, RAM, temperature).
-    Returns metrics for monitoring system health.
+    Live preview stream at the engine frame rate.
+    Sends binary messages: a keyframe (b'K' + uint32 seq + uint16 width + uint16 height
+    + raw RGB) whenever the client may be out of sync, otherwise an XOR delta
+    (b'D' + uint32 seq + uint32 base_seq + zlib data) against the previous frame.
+    Slow clients drop frames instead of queueing them.
     """
-    try:
-        import psutil
-        
-        stats = {
-            "cpu_percent": round(psutil.cpu_percent(interval=0.1), 1),
-            "ram_percent": round(psutil.virtual_memory().percent, 1),
-            "ram_used_mb": round(psutil.virtual_memory().used / (1024 * 1024), 1),
-            "ram_total_mb": round(psutil.virtual_memory().total / (1024 * 1024), 1),
-        }
-        
-        # Try to get CPU temperature (Raspberry Pi specific)
+    await websocket.accept()
+    engine: Engine = websocket.app.state.engine
+    encoder = engine.preview_encoder
+    subscriber = StreamSubscriber(KIND_WEBSOCKET)
+    encoder.subscribe(subscriber)
+    
+    async def watch_disconnect():
+        # The client never sends anything: receive() returns when it goes away.
+        # Unsubscribe right then, even if no frames are being produced (no active scene).
         try:
-            temps = psutil.sensors_temperatures()
-            if 'cpu_thermal' in temps:
-                stats["cpu_temp"] = round(temps['cpu_thermal'][0].current, 1)
-            elif 'coretemp' in temps:
-                stats["cpu_temp"] = round(temps['coretemp'][0].current, 1)
-            else:
-                stats["cpu_temp"] = None
-        except (AttributeError, KeyError):
-            # Temperature sensors not available
-            stats["cpu_temp"] = None
-        
-        return stats
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        except Exception:
+            pass
+        encoder.unsubscribe(subscriber)  # Also wakes the send loop below
+    
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        last_sent_seq = None
+        while True:
+            frame = await subscriber.next()
+            if frame is None:
+                break  # Client disconnected
+            await websocket.send_bytes(frame.message_after(last_sent_seq))
+            last_sent_seq = frame.seq
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        logger.error(f"Error getting system stats: {e}")
+        logger.debug(f"Preview websocket closed: {e}")
+    finally:
+        watcher.cancel()
+        encoder.unsubscribe(subscriber)
+
+@router.get("/preview/mjpeg")
+async def preview_mjpeg(request: Request, fps: float = 30.0):
+    """
+    Live preview as an MJPEG stream (multipart/x-mixed-replace), for clients
+    without WebSocket support: works directly as an <img> src.
+    """
+    engine: Engine = request.app.state.engine
+    encoder = engine.preview_encoder
+    max_fps = max(1.0, min(fps, 60.0))
+    
+    async def stream():
+        # Subscribe once streaming starts; the generator is closed when the client disconnects
+        subscriber = StreamSubscriber(KIND_MJPEG, max_fps=max_fps)
+        encoder.subscribe(subscriber)
+        try:
+            while True:
+                frame = await subscriber.next()
+                if frame is None:
+                    return
+                jpeg = frame.jpeg()
+                yield (
+                    b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                    + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n"
+                )
+        finally:
+            encoder.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="multipart/x-mixed-replace; boundary=frame",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+@router.get("/caches")
+def get_cache_stats(request: Request):
+    """
+    Get in-memory cache statistics (entries, bytes vs budget, hits, misses, evictions).
+    """
+    return {
+        "clips": request.app.state.clip_loader.cache.get_stats(),
+    }
+
+@router.get("/persistence")
+def get_persistence_status():
+    """
+    Get the state of deferred data-file writes: files waiting to be written,
+    files whose last write failed (retried automatically), and counters.
+    """
+    return FileOps.get_write_status()
+
+@router.get("/stats")
+def get_system_stats(request: Request):
+    """
+    Get system performance statistics (CPU, RAM, temperature) plus engine FPS
+    and mean frame-phase timings, from the background sampler's latest sample.
+    Returns metrics for monitoring system health.
+    """
+    stats = request.app.state.system_monitor.latest()
+    if stats is None:
+        # Nothing sampled yet (first second after startup) or psutil unavailable
         return {
             "cpu_percent": 0,
             "ram_percent": 0,
@@ -195,4 +287,48 @@ def get_system_stats():
             "ram_total_mb": 0,
             "cpu_temp": None
         }
+    return stats
+
+@router.get("/stats/history")
+def get_system_stats_history(request: Request, range: str = "hour", points: int = DEFAULT_POINTS):
+    """
+    Get sampled stats over the last minute, hour or day for graphs, averaged
+    into at most `points` buckets. Series are aligned with series["time"];
+    a null means no value for that bucket.
+    """
+    if range not in RANGES:
+        raise HTTPException(status_code=400, detail=f"Unknown range '{range}', expected one of: {', '.join(RANGES)}")
+    return request.app.state.system_monitor.history(range, points)
+
+@router.get("/scheduler")
+def get_scheduler_stats(request: Request):
+    """
+    Get frame pacing statistics from the engine's frame scheduler.
+    Jitter values are in microseconds (lateness of each wake-up vs its deadline).
+    """
+    engine: Engine = request.app.state.engine
+    return engine.get_scheduler_stats()
 
+@router.get("/perf")
+def get_perf_stats(request: Request):
+    """
+    Get per-phase frame timings (update, clear, draw, preview, swap, total)
+    for the active scene as p50/p95/p99/max in milliseconds.
+    """
+    engine: Engine = request.app.state.engine
+    return engine.get_perf_stats()
+
+@router.get("/runtime")
+def get_runtime_stats(request: Request):
+    """
+    Get the scene runtime ("inprocess" or "process"), the child process
+    limits, and the active scene's process (pid, frames, restarts, error).
+    """
+    active = request.app.state.state_manager.get_active_scene()
+    # A playlist runs its items as sub-scenes
+    active = getattr(active, "current_scene_instance", None) or active
+    return {
+        "runtime": request.app.state.script_loader.runtime,
+        "limits": RuntimeLimits.from_env().to_dict(),
+        "process": active.get_stats() if isinstance(active, ProcessScene) else None,
+    }
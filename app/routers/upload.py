@@ -1,10 +1,13 @@
 from fastapi import APIRouter, File, UploadFile, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
 import shutil
 import os
 import aiofiles
 import logging
 from PIL import Image, ImageSequence
 import io
+import zipfile
+from app.core.loaders.zip_sequence import ZipSequence
 
 logger = logging.getLogger(__name__)
 
@@ -123,6 +126,11 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
         async with aiofiles.open(file_path, 'wb') as out_file:
             await out_file.write(content)
             logger.info(f"Successfully uploaded file: {filename}")
+        
+        # Zipped image sequences: reject archives without frames, thumbnail the first one
+        # (reads and decodes the archive: off the event loop)
+        if filename.lower().endswith('.zip'):
+            await run_in_threadpool(_prepare_image_sequence, filename, file_path)
     except HTTPException:
         raise
     except Exception as e:
@@ -143,5 +151,29 @@ async def upload_file(request: Request, file: UploadFile = File(...)):
     except Exception as e:
         logger.warning(f"Failed to update metadata for {filename}: {e}")
         # Don't fail the upload if metadata update fails
+    
+    # Index the new scene right away (the directory watcher would pick it up shortly)
+    request.app.state.scene_catalog.update(filename)
         
     return {"status": "ok", "filename": filename}
+
+
+def _prepare_image_sequence(filename, file_path):
+    try:
+        sequence = ZipSequence(file_path)
+    except (OSError, zipfile.BadZipFile) as e:
+        os.remove(file_path)
+        raise HTTPException(status_code=400, detail=f"Invalid ZIP file: {e}")
+    if not sequence.frames:
+        os.remove(file_path)
+        raise HTTPException(status_code=400, detail="ZIP contains no image frames (PNG, JPEG, BMP or WebP)")
+    
+    try:
+        thumbnail = sequence.first_frame((128, 128))
+        if thumbnail is not None:
+            thumb_dir = os.path.join("scenes", "thumbnails")
+            os.makedirs(thumb_dir, exist_ok=True)
+            thumbnail.save(os.path.join(thumb_dir, f"{filename}.png"), "PNG")
+            logger.info(f"Generated thumbnail for image sequence {filename} ({len(sequence)} frames)")
+    except Exception as e:
+        logger.warning(f"Failed to generate thumbnail for image sequence {filename}: {e}")
@@ -1,18 +1,31 @@
 import json
 import os
+import stat
+import time
+import atexit
 import logging
+import tempfile
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Deferred writes: wait this long after the last change to a file (a slider drag is one write),
+# but never hold a change back longer than SAVE_MAX_DELAY
+SAVE_DEBOUNCE = 0.5
+SAVE_MAX_DELAY = 2.0
+SAVE_RETRY_DELAY = 5.0
+
 class FileOps:
     @staticmethod
     def load_json(filepath, default=None):
+        # A deferred write of this file must land before we read it back
+        _writer.flush(filepath)
         if not os.path.exists(filepath):
             logger.info(f"File not found: {filepath}, creating with default.")
             if default is not None:
                 FileOps.save_json(filepath, default)
             return default or {}
-        
+
         try:
             with open(filepath, 'r') as f:
                 return json.load(f)
@@ -22,14 +35,180 @@ class FileOps:
 
     @staticmethod
     def save_json(filepath, data):
-        # Ensure directory exists
-        directory = os.path.dirname(filepath)
-        if directory and not os.path.exists(directory):
-            os.makedirs(directory)
-            
+        """Write `data` to `filepath` now, atomically. Supersedes a pending deferred write."""
         try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=4)
+            _writer.write_now(filepath, json.dumps(data, indent=4))
             logger.info(f"Saved data to {filepath}")
         except Exception as e:
             logger.error(f"Failed to save {filepath}: {e}")
+
+    @staticmethod
+    def schedule_save_json(filepath, data):
+        """
+        Save `data` to `filepath` on the background writer. Returns at once:
+        the data is serialized here (a consistent snapshot, so call it under
+        the owner's lock), repeated saves of one file within the debounce
+        window are written once, and the write itself is atomic.
+        """
+        _writer.schedule(filepath, json.dumps(data, indent=4))
+
+    @staticmethod
+    def flush_pending(timeout=5.0):
+        """Write every deferred save now (shutdown). Returns False if some are still pending or failed."""
+        return _writer.flush(timeout=timeout)
+
+    @staticmethod
+    def get_write_status():
+        return _writer.get_status()
+
+
+def _write_atomic(filepath, text):
+    # Ensure directory exists
+    directory = os.path.dirname(filepath)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    # Temp file in the same directory + rename: readers (and a crash or power
+    # cut mid-write) only ever see the old file or the complete new one
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{os.path.basename(filepath)}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600 and the rename keeps it: keep the file's mode (0644 if new),
+        # so a bind-mounted data dir stays readable by other users/containers
+        try:
+            mode = stat.S_IMODE(os.stat(filepath).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class _DeferredWriter:
+    """
+    Background thread that owns deferred JSON writes. Keeps only the newest
+    snapshot per file; a failed write stays pending and is retried.
+    """
+
+    def __init__(self):
+        self._pending = {}   # filepath -> {"text", "first", "due", "attempts"}
+        self._failed = {}    # filepath -> {"error", "time", "attempts"}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._writing = set()  # files being written right now
+        self.writes = 0
+        self.coalesced = 0
+
+    def schedule(self, filepath, text):
+        now = time.monotonic()
+        with self._cond:
+            entry = self._pending.get(filepath)
+            if entry is None:
+                self._pending[filepath] = {"text": text, "first": now, "due": now + SAVE_DEBOUNCE, "attempts": 0}
+            else:
+                self.coalesced += 1
+                entry["text"] = text
+                entry["due"] = min(now + SAVE_DEBOUNCE, entry["first"] + SAVE_MAX_DELAY)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def write_now(self, filepath, text):
+        """Synchronous write; replaces any pending snapshot of the file."""
+        return self._write(filepath, {"text": text, "first": time.monotonic(), "due": 0, "attempts": 0}, raise_errors=True)
+
+    def flush(self, filepath=None, timeout=5.0):
+        """Write pending saves (all, or one file) right away, from the calling thread."""
+        with self._cond:
+            if filepath is None:
+                paths = list(self._pending)
+            else:
+                paths = [filepath] if filepath in self._pending or filepath in self._writing else []
+        ok = all([self._write(path, timeout=timeout) for path in paths])
+        if filepath is None:
+            with self._cond:
+                ok = ok and not self._pending and not self._failed
+        return ok
+
+    def _ensure_thread(self):
+        # Caller holds the condition
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="json-writer", daemon=True)
+            self._thread.start()
+            # Also covers scripts/tools that never call flush_pending()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = [path for path, entry in self._pending.items() if entry["due"] <= now]
+                if not due:
+                    next_due = min((entry["due"] for entry in self._pending.values()), default=None)
+                    self._cond.wait(None if next_due is None else next_due - now)
+                    continue
+            for path in due:
+                self._write(path)
+
+    def _write(self, filepath, entry=None, raise_errors=False, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            # One write per file at a time, so an older snapshot can never land last
+            while filepath in self._writing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            pending = self._pending.pop(filepath, None)
+            if entry is None:
+                entry = pending
+            if entry is None:
+                return filepath not in self._failed
+            self._writing.add(filepath)
+        try:
+            _write_atomic(filepath, entry["text"])
+            error = None
+        except Exception as e:
+            error = e
+        with self._cond:
+            self._writing.discard(filepath)
+            if error is None:
+                self.writes += 1
+                self._failed.pop(filepath, None)
+                logger.debug(f"Saved data to {filepath}")
+            else:
+                entry["attempts"] += 1
+                self._failed[filepath] = {"error": str(error), "time": time.time(), "attempts": entry["attempts"]}
+                if filepath not in self._pending and not raise_errors:
+                    # Retry later, unless a newer snapshot arrived meanwhile
+                    entry["due"] = time.monotonic() + SAVE_RETRY_DELAY
+                    self._pending[filepath] = entry
+            self._cond.notify_all()
+        if error is not None:
+            if raise_errors:
+                raise error
+            logger.error(f"Failed to save {filepath} (attempt {entry['attempts']}): {error}")
+        return error is None
+
+    def get_status(self):
+        now = time.monotonic()
+        with self._cond:
+            return {
+                "pending": {
+                    path: {"age_s": round(now - entry["first"], 3), "attempts": entry["attempts"]}
+                    for path, entry in self._pending.items()
+                },
+                "failed": {path: dict(info) for path, info in self._failed.items()},
+                "writes": self.writes,
+                "coalesced": self.coalesced,
+            }
+
+
+_writer = _DeferredWriter()
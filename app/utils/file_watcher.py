@@ -0,0 +1,170 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+
+class FileWatcher:
+    """
+    Watches one directory and calls callback(filename) for every file that
+    was written, created, replaced, renamed or deleted there.
+
+    Uses inotify through ctypes on Linux and falls back to polling
+    mtimes/sizes everywhere else (or if inotify is unavailable). Events are
+    debounced: an editor's burst of writes produces one callback per file.
+    Callbacks run on the watcher thread.
+    """
+
+    def __init__(self, directory, callback, extensions=None, poll_interval=1.0, debounce=0.2):
+        self.directory = directory
+        self.callback = callback
+        self.extensions = tuple(extensions) if extensions else None
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        fd = self._inotify_open()
+        if fd is not None:
+            self.backend = "inotify"
+            target, args = self._run_inotify, (fd,)
+        else:
+            self.backend = "poll"
+            target, args = self._run_poll, ()
+        self._thread = threading.Thread(target=target, args=args, name="file-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.directory} for changes ({self.backend})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _wanted(self, filename):
+        if not filename or filename.startswith('.'):
+            return False
+        return self.extensions is None or filename.endswith(self.extensions)
+
+    def _emit(self, filenames):
+        for filename in sorted(filenames):
+            try:
+                self.callback(filename)
+            except Exception as e:
+                logger.error(f"File watcher callback failed for {filename}: {e}")
+
+    # --- inotify ---
+
+    def _inotify_open(self):
+        if not hasattr(os, "O_NONBLOCK") or not os.path.isdir(self.directory):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            wd = libc.inotify_add_watch(fd, os.fsencode(self.directory), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(err, "inotify_add_watch failed")
+            return fd
+        except (OSError, AttributeError) as e:
+            # Not Linux, no libc, or out of watches: poll instead
+            logger.debug(f"inotify unavailable ({e}), polling {self.directory}")
+            return None
+
+    def _run_inotify(self, fd):
+        pending = set()
+        deadline = None
+        try:
+            while not self._stop.is_set():
+                timeout = 0.5 if deadline is None else max(0.0, deadline - time.monotonic())
+                readable, _, _ = select.select([fd], [], [], timeout)
+                if readable:
+                    changed, overflow = self._read_events(fd)
+                    if overflow:
+                        # Kernel queue overflowed: we lost track, report everything
+                        changed = {f for f in os.listdir(self.directory) if self._wanted(f)}
+                    if changed:
+                        pending |= changed
+                        deadline = time.monotonic() + self.debounce
+                if pending and time.monotonic() >= deadline:
+                    batch, pending, deadline = pending, set(), None
+                    self._emit(batch)
+        except Exception as e:
+            logger.error(f"inotify watcher for {self.directory} failed, switching to polling: {e}")
+            self.backend = "poll"
+            self._run_poll()
+        finally:
+            os.close(fd)
+
+    def _read_events(self, fd):
+        changed, overflow = set(), False
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            if not data:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif self._wanted(name):
+                    changed.add(name)
+        return changed, overflow
+
+    # --- polling fallback ---
+
+    def _snapshot(self):
+        snapshot = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._wanted(entry.name):
+                        st = entry.stat()
+                        snapshot[entry.name] = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            logger.debug(f"Failed to scan {self.directory}: {e}")
+        return snapshot
+
+    def _run_poll(self):
+        previous = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            changed = {name for name in previous.keys() | current.keys() if previous.get(name) != current.get(name)}
+            previous = current
+            if changed:
+                self._emit(changed)
@@ -0,0 +1,62 @@
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request, Response
+
+logger = logging.getLogger(__name__)
+
+# Cache, but revalidate on every use (cheap 304 when nothing changed)
+REVALIDATE = "no-cache"
+
+
+class HttpCache:
+    """Helpers for conditional GETs: ETag / Last-Modified validators and 304 responses."""
+
+    @staticmethod
+    def etag(*parts):
+        """Strong ETag built from the given parts, e.g. etag("preview", 42) -> '"preview-42"'."""
+        return '"' + "-".join(str(part) for part in parts) + '"'
+
+    @staticmethod
+    def file_etag(stat_result):
+        """ETag keyed on a file's mtime (ns) and size."""
+        return HttpCache.etag(format(stat_result.st_mtime_ns, "x"), format(stat_result.st_size, "x"))
+
+    @staticmethod
+    def headers(etag=None, last_modified=None, cache_control=REVALIDATE):
+        """Validator headers; last_modified is a Unix timestamp."""
+        headers = {"Cache-Control": cache_control}
+        if etag:
+            headers["ETag"] = etag
+        if last_modified is not None:
+            headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+        return headers
+
+    @staticmethod
+    def is_not_modified(request: Request, etag=None, last_modified=None):
+        """
+        True if the client's cached copy is current. If-None-Match wins over
+        If-Modified-Since when both are sent (RFC 9110).
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            if etag is None:
+                return False
+            if if_none_match.strip() == "*":
+                return True
+            # Weak comparison: W/"x" matches "x"
+            candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return etag.removeprefix("W/") in candidates
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            # HTTP dates have one-second resolution
+            return int(last_modified) <= since
+        return False
+
+    @staticmethod
+    def not_modified(headers):
+        return Response(status_code=304, headers=headers)
@@ -281,6 +281,9 @@ class Vine:
                              canvas.SetPixel(cx+dx, cy+dy, *clr)
 
 class GrowingPlants(BaseScene):
+    # Per-pixel drawing: batch SetPixel calls into one SetImage per frame
+    batch_pixels = True
+    
     def __init__(self, matrix, state_manager):
         super().__init__(matrix, state_manager)
         self.reset()
@@ -10,6 +10,9 @@ class LiquidParticle:
         self.vy = 0.0
         
 class Liquid(BaseScene):
+    # Per-pixel drawing: batch SetPixel calls into one SetImage per frame
+    batch_pixels = True
+    
     def __init__(self, matrix, state_manager):
         super().__init__(matrix, state_manager)
         self.particles = []
@@ -1,6 +1,7 @@
 from app.core.base_scene import BaseScene
 import math
 import random
+import numpy as np
 
 
 class Nebula(BaseScene):
@@ -9,9 +10,15 @@ class Nebula(BaseScene):
     Features slow drift, morphing, and soft blended edges with depth layers.
     """
     
+    # Render the whole frame with NumPy into the framebuffer
+    use_framebuffer = True
+    
     def __init__(self, matrix, state_manager):
         super().__init__(matrix, state_manager)
         
+        # Pixel coordinate grids, shared by every layer and frame
+        self.grid_y, self.grid_x = np.mgrid[0:self.height, 0:self.width].astype(np.float64)
+        
         # Animation time
         self.time = 0.0
         
@@ -97,20 +104,20 @@ class Nebula(BaseScene):
     def _noise(self, x, y, time, scale, phase):
         """
         Simple 2D noise function using multiple sine waves.
-        Creates organic, cloud-like patterns.
+        Creates organic, cloud-like patterns. Works on scalars and NumPy arrays.
         """
         # Combine multiple sine waves for organic noise
-        n1 = math.sin(x * scale + time * 0.1 + phase) * 0.5
-        n2 = math.sin(y * scale * 0.7 + time * 0.08 + phase * 1.3) * 0.3
-        n3 = math.sin((x + y) * scale * 0.5 + time * 0.12 + phase * 0.7) * 0.2
+        n1 = np.sin(x * scale + time * 0.1 + phase) * 0.5
+        n2 = np.sin(y * scale * 0.7 + time * 0.08 + phase * 1.3) * 0.3
+        n3 = np.sin((x + y) * scale * 0.5 + time * 0.12 + phase * 0.7) * 0.2
         
         # Add some turbulence
-        n4 = math.sin((x * 1.3 - y * 0.8) * scale * 0.4 + time * 0.15 + phase * 2.1) * 0.15
+        n4 = np.sin((x * 1.3 - y * 0.8) * scale * 0.4 + time * 0.15 + phase * 2.1) * 0.15
         
         return (n1 + n2 + n3 + n4) / 1.15  # Normalize to roughly -1 to 1
     
     def _get_cloud_density(self, x, y, layer, time):
-        """Get cloud density at a point for a specific layer"""
+        """Get cloud density for a specific layer (x, y may be coordinate grids)"""
         # Apply layer offset and drift
         layer_x = x + layer['offset_x'] + time * layer['drift_x'] * 50
         layer_y = y + layer['offset_y'] + time * layer['drift_y'] * 50
@@ -124,11 +131,9 @@ class Nebula(BaseScene):
         
         # Apply threshold and smooth falloff for wispy edges
         threshold = 0.3
-        if density < threshold:
-            return 0.0
         
         # Smooth falloff from threshold to 1.0
-        t = (density - threshold) / (1.0 - threshold)
+        t = np.clip((density - threshold) / (1.0 - threshold), 0.0, 1.0)
         # Smooth curve for soft edges
         t = t * t * (3.0 - 2.0 * t)  # Smoothstep
         
@@ -141,68 +146,37 @@ class Nebula(BaseScene):
         pass
     
     def draw(self, canvas):
+        pixels = canvas.pixels
+        
         # Deep space background
-        canvas.Fill(5, 5, 15)
+        pixels[:, :] = (5, 5, 15)
         
         # Draw twinkling stars
         for star in self.stars:
             twinkle = (math.sin(self.time * star['twinkle_speed'] + star['twinkle_phase']) + 1.0) / 2.0
             brightness = star['brightness'] * (0.5 + twinkle * 0.5)
             
-            star_r = int(200 * brightness)
-            star_g = int(200 * brightness)
-            star_b = int(220 * brightness)
-            
-            canvas.SetPixel(star['x'], star['y'], star_r, star_g, star_b)
+            pixels[star['y'], star['x']] = (int(200 * brightness), int(200 * brightness), int(220 * brightness))
         
         # Build nebula by blending layers
-        # Use a buffer to accumulate colors with additive blending
-        nebula_buffer = {}
-        
-        for y in range(self.height):
-            for x in range(self.width):
-                # Accumulate colors from all layers
-                r, g, b = 0, 0, 0
-                
-                for layer in self.layers:
-                    density = self._get_cloud_density(x, y, layer, self.time)
-                    
-                    if density > 0.01:  # Only process if visible
-                        layer_r, layer_g, layer_b = layer['color']
-                        
-                        # Additive blending for ethereal glow
-                        r += int(layer_r * density)
-                        g += int(layer_g * density)
-                        b += int(layer_b * density)
-                
-                # Clamp and store
-                r = min(255, r)
-                g = min(255, g)
-                b = min(255, b)
-                
-                if r > 10 or g > 10 or b > 10:  # Only store if visible
-                    nebula_buffer[(x, y)] = (r, g, b)
-        
-        # Draw nebula with soft blending over stars
-        for (x, y), (r, g, b) in nebula_buffer.items():
-            # Get star color if present
-            star_r, star_g, star_b = 5, 5, 15  # Background color
-            
-            # Check if there's a star here
-            for star in self.stars:
-                if star['x'] == x and star['y'] == y:
-                    twinkle = (math.sin(self.time * star['twinkle_speed'] + star['twinkle_phase']) + 1.0) / 2.0
-                    brightness = star['brightness'] * (0.5 + twinkle * 0.5)
-                    star_r = int(200 * brightness)
-                    star_g = int(200 * brightness)
-                    star_b = int(220 * brightness)
-                    break
-            
-            # Blend nebula with star/background
-            # Nebula has some transparency for ethereal effect
-            nebula_alpha = 0.85
-            out_r = int(r * nebula_alpha + star_r * (1.0 - nebula_alpha))
-            out_g = int(g * nebula_alpha + star_g * (1.0 - nebula_alpha))
-            out_b = int(b * nebula_alpha + star_b * (1.0 - nebula_alpha))
+        # Accumulate colors from all layers with additive blending
+        nebula = np.zeros((self.height, self.width, 3), dtype=np.int32)
+        
+        for layer in self.layers:
+            density = self._get_cloud_density(self.grid_x, self.grid_y, layer, self.time)
+            density = np.where(density > 0.01, density, 0.0)  # Only where visible
             
-            canvas.SetPixel(x, y, out_r, out_g, out_b)
+            # Additive blending for ethereal glow
+            nebula += (density[:, :, None] * layer['color']).astype(np.int32)
+        
+        # Clamp
+        np.minimum(nebula, 255, out=nebula)
+        
+        # Only draw where the nebula is visible
+        visible = (nebula > 10).any(axis=2)
+        
+        # Blend nebula with star/background
+        # Nebula has some transparency for ethereal effect
+        nebula_alpha = 0.85
+        blended = (nebula * nebula_alpha + pixels * (1.0 - nebula_alpha)).astype(np.uint8)
+        pixels[visible] = blended[visible]
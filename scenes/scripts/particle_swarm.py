@@ -96,8 +96,9 @@ class ParticleSwarm(BaseScene):
         self.repulsion_strength = 500.0   # How strong particles repel at close range
         self.damping = 0.98  # Friction (0.98 = 2% energy loss per frame)
         
-        # Load palette colors
+        # Load palette colors (reloaded in on_settings_changed when the palette changes)
         self.palette_colors = None
+        self.palette_id = None
         self.load_palette_colors()
         
     def load_palette_colors(self):
@@ -136,11 +137,14 @@ class ParticleSwarm(BaseScene):
         for _ in range(self.num_particles):
             self.spawn_particle()
     
-    def update(self, dt):
-        # Reload palette colors occasionally in case it changed
-        if random.random() < 0.01:
+    def on_settings_changed(self, settings):
+        # Reload palette colors only when the selected palette actually changed
+        palette_id = settings.get("selected_palette")
+        if palette_id != self.palette_id:
+            self.palette_id = palette_id
             self.load_palette_colors()
-        
+    
+    def update(self, dt):
         # Update all particles
         for particle in self.particles:
             particle.update(dt, self.particles, self.width, self.height,
@@ -9,6 +9,9 @@ class Satellite(BaseScene):
     Features fading trails and varying orbit speeds.
     """
     
+    # Per-pixel drawing: batch SetPixel calls into one SetImage per frame
+    batch_pixels = True
+    
     def __init__(self, matrix, state_manager):
         super().__init__(matrix, state_manager)
         
@@ -1,10 +1,6 @@
 from app.core.base_scene import BaseScene
+from app.core.home_assistant import data_key
 import math
-import json
-import os
-import time
-import urllib.request
-import urllib.error
 import logging
 
 logger = logging.getLogger(__name__)
@@ -77,71 +73,27 @@ class ServerDashboard(BaseScene):
         self.transition_progress = 0.0
         self.is_transitioning = False
         
-        # Sensor data storage
-        self.sensor_data = {}  # {sensor_id: {"value": float, "unit": str, "timestamp": float}}
-        self.last_fetch_time = {}
+        # Sensor data, published by the Home Assistant service
+        self.sensor_data = {}  # {sensor_id: {"value": float, "unit": str, "updated": float, ...}}
         self.fetch_interval = 10.0  # Fetch every 10 seconds
+        self.sensor_ids = [sensor["id"] for sensor in self.sensors]
         
         # Animation
         self.time = 0.0
         self.pulse_phase = 0.0
-        
-        # Home Assistant settings
-        self.ha_url = None
-        self.ha_token = None
-        self.ha_enabled = False
-        
-        # Load HA settings
-        self._load_ha_settings()
-        
-        # Initial fetch for all sensors
-        for sensor in self.sensors:
-            self._fetch_sensor(sensor["id"])
-    
-    def _load_ha_settings(self):
-        """Load Home Assistant settings from settings file"""
-        try:
-            settings_path = "data/settings.json"
-            if os.path.exists(settings_path):
-                with open(settings_path, 'r') as f:
-                    settings = json.load(f)
-                    ha_settings = settings.get("home_assistant", {})
-                    self.ha_enabled = ha_settings.get("enabled", False)
-                    self.ha_url = ha_settings.get("url", "").strip().rstrip("/")
-                    self.ha_token = ha_settings.get("long_lived_token", "").strip()
-        except Exception as e:
-            logger.error(f"Failed to load HA settings: {e}")
-            self.ha_enabled = False
     
-    def _fetch_sensor(self, sensor_id):
-        """Fetch sensor value from Home Assistant"""
-        if not self.ha_enabled or not self.ha_url or not self.ha_token:
+    def _read_sensors(self):
+        """Pick up the latest values from the Home Assistant service (never blocks)"""
+        ha = getattr(self.state_manager, '_home_assistant', None)
+        if ha is None:
             return
-        
-        try:
-            api_url = f"{self.ha_url}/api/states/{sensor_id}"
-            req = urllib.request.Request(api_url)
-            req.add_header("Authorization", f"Bearer {self.ha_token}")
-            req.add_header("Content-Type", "application/json")
-            
-            with urllib.request.urlopen(req, timeout=5) as response:
-                data = json.loads(response.read().decode())
-                state = data.get("state", "unknown")
-                attributes = data.get("attributes", {})
-                
-                try:
-                    value = float(state)
-                    unit = attributes.get("unit_of_measurement", "")
-                    self.sensor_data[sensor_id] = {
-                        "value": value,
-                        "unit": unit,
-                        "timestamp": time.time()
-                    }
-                except (ValueError, TypeError):
-                    logger.warning(f"Invalid sensor state for {sensor_id}: {state}")
-        
-        except Exception as e:
-            logger.error(f"Error fetching sensor {sensor_id}: {e}")
+        # Renewing the watch every frame is cheap; fetching happens in the background
+        ha.watch(self.sensor_ids, self.fetch_interval)
+        for sensor_id in self.sensor_ids:
+            entry = self.state_manager.get_data(data_key(sensor_id))
+            # Keep showing the last good value while Home Assistant is unreachable
+            if entry and entry.get("value") is not None:
+                self.sensor_data[sensor_id] = entry
     
     def update(self, dt):
         self.time += dt
@@ -163,14 +115,7 @@ class ServerDashboard(BaseScene):
             self.is_transitioning = True
             self.transition_progress = 0.0
         
-        # Fetch sensor data periodically
-        current_time = time.time()
-        for sensor in self.sensors:
-            sensor_id = sensor["id"]
-            last_fetch = self.last_fetch_time.get(sensor_id, 0)
-            if current_time - last_fetch >= self.fetch_interval:
-                self._fetch_sensor(sensor_id)
-                self.last_fetch_time[sensor_id] = current_time
+        self._read_sensors()
     
     def _draw_bar(self, canvas, x, y, width, height, value, max_value, color, warn_threshold, critical_threshold):
         """Draw an animated bar chart"""
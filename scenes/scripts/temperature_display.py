@@ -1,10 +1,6 @@
 from app.core.base_scene import BaseScene
+from app.core.home_assistant import data_key
 import math
-import json
-import os
-import time
-import urllib.request
-import urllib.error
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +12,9 @@ class TemperatureDisplay(BaseScene):
     Shows temperature with animated background and smooth updates.
     """
     
+    # Per-pixel drawing: batch SetPixel calls into one SetImage per frame
+    batch_pixels = True
+    
     def __init__(self, matrix, state_manager):
         super().__init__(matrix, state_manager)
         
@@ -25,97 +24,35 @@ class TemperatureDisplay(BaseScene):
         # Current temperature value
         self.temperature = None
         self.unit = "°C"
-        self.last_fetch_time = 0
         self.fetch_interval = 30.0  # Fetch every 30 seconds
         self.fetch_error = None
         
         # Animation
         self.time = 0.0
         self.pulse_phase = 0.0
-        
-        # Home Assistant settings
-        self.ha_url = None
-        self.ha_token = None
-        self.ha_enabled = False
-        
-        # Load HA settings
-        self._load_ha_settings()
-        
-        # Try initial fetch
-        self._fetch_temperature()
     
-    def _load_ha_settings(self):
-        """Load Home Assistant settings from settings file"""
-        try:
-            settings_path = "data/settings.json"
-            if os.path.exists(settings_path):
-                with open(settings_path, 'r') as f:
-                    settings = json.load(f)
-                    ha_settings = settings.get("home_assistant", {})
-                    self.ha_enabled = ha_settings.get("enabled", False)
-                    self.ha_url = ha_settings.get("url", "").strip().rstrip("/")
-                    self.ha_token = ha_settings.get("long_lived_token", "").strip()
-        except Exception as e:
-            logger.error(f"Failed to load HA settings: {e}")
-            self.ha_enabled = False
-    
-    def _fetch_temperature(self):
-        """Fetch temperature from Home Assistant"""
-        if not self.ha_enabled or not self.ha_url or not self.ha_token:
-            self.fetch_error = "HA not configured"
+    def _read_temperature(self):
+        """Read the latest value published by the Home Assistant service (never blocks)"""
+        ha = getattr(self.state_manager, '_home_assistant', None)
+        if ha is None:
+            self.fetch_error = "HA not available"
             return
-        
-        try:
-            # Build API URL
-            api_url = f"{self.ha_url}/api/states/{self.sensor_id}"
-            
-            # Create request
-            req = urllib.request.Request(api_url)
-            req.add_header("Authorization", f"Bearer {self.ha_token}")
-            req.add_header("Content-Type", "application/json")
-            
-            # Fetch with timeout
-            with urllib.request.urlopen(req, timeout=5) as response:
-                data = json.loads(response.read().decode())
-                
-                # Extract temperature
-                state = data.get("state", "unknown")
-                attributes = data.get("attributes", {})
-                
-                try:
-                    self.temperature = float(state)
-                    self.unit = attributes.get("unit_of_measurement", "°C")
-                    self.fetch_error = None
-                except (ValueError, TypeError):
-                    self.fetch_error = "Invalid data"
-                    logger.warning(f"Invalid temperature state: {state}")
-        
-        except urllib.error.HTTPError as e:
-            if e.code == 401:
-                self.fetch_error = "Auth failed"
-            elif e.code == 404:
-                self.fetch_error = "Sensor not found"
-            else:
-                self.fetch_error = f"HTTP {e.code}"
-            logger.error(f"HA API error: {e}")
-        
-        except urllib.error.URLError as e:
-            self.fetch_error = "Connection error"
-            logger.error(f"HA connection error: {e}")
-        
-        except Exception as e:
-            self.fetch_error = "Fetch error"
-            logger.error(f"Error fetching temperature: {e}")
+        # Renewing the watch every frame is cheap; fetching happens in the background
+        ha.watch([self.sensor_id], self.fetch_interval)
+        
+        entry = self.state_manager.get_data(data_key(self.sensor_id))
+        if entry is None:
+            return  # First fetch still in flight
+        if entry.get("value") is not None:
+            # A failed refresh keeps the last good value
+            self.temperature = entry["value"]
+            self.unit = entry.get("unit") or "°C"
+        self.fetch_error = entry.get("error")
     
     def update(self, dt):
         self.time += dt
         self.pulse_phase += dt * 2.0  # Slow pulse animation
-        
-        # Fetch temperature periodically
-        current_time = time.time()
-        if current_time - self.last_fetch_time >= self.fetch_interval:
-            self._fetch_temperature()
-            self.last_fetch_time = current_time
+        self._read_temperature()
     
     def _draw_digit(self, canvas, digit, x, y, size, r, g, b):
         """Draw a single digit using a simple 7-segment style"""
@@ -1,12 +1,22 @@
 from app.core.base_scene import BaseScene
 import math
 import random
+import numpy as np
+
+LUT_SIZE = 1024
+
 
 class WaveInterference(BaseScene):
+    # Render the whole frame with NumPy into the framebuffer
+    use_framebuffer = True
+    
     def __init__(self, matrix, state_manager):
         super().__init__(matrix, state_manager)
         self.time = 0.0
         
+        # Pixel coordinate grids
+        self.grid_y, self.grid_x = np.mgrid[0:self.height, 0:self.width].astype(np.float64)
+        
         # Wave Sources
         # Each source: x, y, frequency (k), phase speed (w)
         # We make them move slowly to change the pattern
@@ -22,14 +32,13 @@ class WaveInterference(BaseScene):
                 'speed': random.uniform(4.0, 8.0) # Temporal speed (how fast ripples move out)
             })
 
-    def get_palette(self):
+    def get_palette_lut(self):
+        # Compiled once per palette change; a dict lookup per frame
+        palette_mgr = getattr(self.state_manager, '_palette_manager', None)
         try:
-            palette_mgr = getattr(self.state_manager, '_palette_manager', None)
-            if palette_mgr:
-                return self.state_manager.get_palette_colors(palette_mgr)
-        except:
-            pass
-        return None
+            return self.state_manager.get_palette_lut(palette_mgr)
+        except Exception:
+            return None
 
     def update(self, dt):
         self.time += dt
@@ -55,57 +64,35 @@ class WaveInterference(BaseScene):
                 s['vy'] *= -1
 
     def draw(self, canvas):
-        w = self.width
-        h = self.height
         t = self.time
         sources = self.sources
         
         # Fetch palette
-        colors = self.get_palette()
+        lut = self.get_palette_lut()
         
-        for y in range(h):
-            for x in range(w):
-                amplitude = 0.0
-                
-                # Sum waves from all sources
-                for s in sources:
-                    dx = x - s['x']
-                    dy = y - s['y']
-                    # Sqrt is somewhat expensive, but needed for circular ripples
-                    dist = math.sqrt(dx*dx + dy*dy)
-                    amplitude += math.sin(dist * s['freq'] - t * s['speed'])
-                
-                # Normalize amplitude (-N to N) -> (0 to 1)
-                norm_amp = (amplitude / len(sources) + 1.0) / 2.0
-                norm_amp = max(0.0, min(1.0, norm_amp))
-                
-                # Color Mapping
-                r, g, b = 0, 0, 0
-                
-                if colors and len(colors) >= 2:
-                    # Interpolate through palette
-                    # Map 0..1 to 0..(len-1)
-                    idx = norm_amp * (len(colors) - 1)
-                    i = int(idx)
-                    f = idx - i
-                    
-                    c1 = colors[i]
-                    c2 = colors[min(i + 1, len(colors) - 1)]
-                    
-                    r = int(c1[0] + (c2[0] - c1[0]) * f)
-                    g = int(c1[1] + (c2[1] - c1[1]) * f)
-                    b = int(c1[2] + (c2[2] - c1[2]) * f)
-                else:
-                    # Fallback Cyan/Blue scheme
-                    intensity = int(norm_amp * 255)
-                    r = 0
-                    g = intensity
-                    b = max(100, intensity)
-                    
-                    if norm_amp > 0.8:
-                        extra = int((norm_amp - 0.8) * 5 * 255)
-                        r = extra
-                        g = 255
-                        b = 255
-                
-                canvas.SetPixel(x, y, r, g, b)
+        # Sum waves from all sources
+        amplitude = np.zeros((self.height, self.width))
+        for s in sources:
+            dist = np.hypot(self.grid_x - s['x'], self.grid_y - s['y'])
+            amplitude += np.sin(dist * s['freq'] - t * s['speed'])
+        
+        # Normalize amplitude (-N to N) -> (0 to 1)
+        norm_amp = np.clip((amplitude / len(sources) + 1.0) / 2.0, 0.0, 1.0)
+        
+        # Color Mapping
+        if lut and len(lut.colors) >= 2:
+            # One lookup per pixel into the palette's 1024-entry gradient table
+            lut.map(norm_amp, size=LUT_SIZE, out=canvas.pixels)
+        else:
+            # Fallback Cyan/Blue scheme
+            intensity = (norm_amp * 255).astype(np.int32)
+            r = np.zeros_like(intensity)
+            g = intensity
+            b = np.maximum(100, intensity)
+            
+            bright = norm_amp > 0.8
+            r = np.where(bright, ((norm_amp - 0.8) * 5 * 255).astype(np.int32), r)
+            g = np.where(bright, 255, g)
+            b = np.where(bright, 255, b)
+            
+            canvas.pixels[:, :] = np.stack((r, g, b), axis=-1).astype(np.uint8)
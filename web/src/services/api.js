@@ -20,8 +20,12 @@ export default {
   getScenes() {
     return apiClient.get('/scenes/');
   },
-  activateScene(filename) {
-    return apiClient.post('/scenes/activate', { filename });
+  // Activation runs as a background job; `wait` (seconds) blocks until it is live
+  activateScene(filename, wait = 0) {
+    return apiClient.post('/scenes/activate', { filename }, { params: { wait } });
+  },
+  getActivationJob(jobId, wait = 0) {
+    return apiClient.get(`/scenes/activate/${jobId}`, { params: { wait } });
   },
   deleteScene(filename) {
     return apiClient.delete(`/scenes/${filename}`);
@@ -48,9 +52,14 @@ export default {
   getThumbnailUrl(filename) {
      return `/api/scenes/thumbnails/${filename}`;
   },
-  getPreviewUrl() {
-    // Add timestamp to prevent caching
-    return `/api/system/preview?t=${Date.now()}`;
+  getPreviewUrl(cacheBust = true) {
+    // Add timestamp to prevent caching (pass false to revalidate via ETag instead)
+    return cacheBust ? `/api/system/preview?t=${Date.now()}` : "/api/system/preview";
+  },
+  getPreviewStreamUrl() {
+    // Live preview WebSocket (binary keyframes + XOR deltas)
+    const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+    return `${protocol}//${window.location.host}/api/system/preview/ws`;
   },
   // Playlists
   getPlaylists() {